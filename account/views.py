@@ -3,6 +3,7 @@ import random
 from datetime import timedelta
 
 from django.conf import settings
+from django.contrib.auth.signals import user_logged_in
 from django.shortcuts import render
 from django.utils import timezone
 from django.views import View
@@ -343,6 +344,7 @@ class VerifyOTP(APIView):
                 is_profile_complete=False,
             )
 
+        user_logged_in.send(sender=user.__class__, request=request, user=user)
         refresh = RefreshToken.for_user(user)
         return Response({
             'refresh': str(refresh),
@@ -1,9 +1,82 @@
+import logging
 from decimal import Decimal
 
+import redis
 from django.conf import settings
+from django.db import transaction
 
 from .models import Cart as CartModel, CartItem
 
+logger = logging.getLogger(__name__)
+
+# Operations accepted by ``Cart.apply``.
+OP_ADD = 'add'
+OP_SET = 'set'
+OP_REMOVE = 'remove'
+
+
+class CartSnapshot:
+    """
+    The contents of a cart loaded in a single joined query, with totals,
+    item count and discount computed once.
+    """
+
+    def __init__(self, items, coupon=None):
+        self.items = items
+        self.coupon = coupon
+        self.total_price = sum((item['total_price'] for item in items), Decimal(0))
+        self.count = sum(item['quantity'] for item in items)
+        if coupon:
+            self.discount = (coupon.discount / Decimal(100)) * self.total_price
+        else:
+            self.discount = Decimal(0)
+
+    @classmethod
+    def load(cls, cart):
+        items = []
+        for item in cart.items.select_related('product').order_by('pk'):
+            items.append({
+                'product': item.product,
+                'quantity': item.quantity,
+                'price': item.product.price,
+                'total_price': item.product.price * item.quantity,
+            })
+        return cls(items, cart.coupon)
+
+    def with_coupon(self, coupon):
+        return CartSnapshot(self.items, coupon)
+
+
+def get_cart(request, durable=False):
+    """
+    Return the cart of ``request``, built once per request so that every
+    consumer shares the same snapshot.
+
+    With ``CART_REDIS_ENABLED`` live carts are served from Redis, falling back
+    to the database when Redis is unavailable. ``durable=True`` returns the
+    database cart, moving a Redis cart into it first; order creation reads
+    from it.
+    """
+    cart = getattr(request, '_cart', None)
+    if cart is not None and (cart.durable or not durable):
+        return cart
+    if settings.CART_REDIS_ENABLED:
+        from .store import RedisCart, flush_cart
+
+        try:
+            if cart is None:
+                cart = RedisCart(request)
+            if durable:
+                flush_cart(cart.owner, evict=True)
+                cart = None
+        except redis.RedisError:
+            logger.warning("Redis cart unavailable, using the database cart.", exc_info=True)
+            cart = None
+    if cart is None:
+        cart = Cart(request)
+    request._cart = cart
+    return cart
+
 
 class Cart:
     """
@@ -11,13 +84,16 @@ class Cart:
     and authenticated users.
     """
 
+    durable = True
+
     def __init__(self, request):
         """
         Initializes the cart.
         - The cart is always stored in the database.
         - For anonymous users, the cart is associated with their session key.
         - For authenticated users, the cart is associated with their user account.
-        - It handles the merging of a session-based cart into a user's cart upon login.
+        - A session-based cart is merged into the user's cart once, on login
+          (see ``cart.services.merge_session_cart``).
         """
         self.session = request.session
         self.user = request.user
@@ -25,24 +101,6 @@ class Cart:
 
         if self.user.is_authenticated:
             cart, created = CartModel.objects.get_or_create(user=self.user)
-            session_key = self.session.get(settings.CART_SESSION_ID)
-            if session_key:
-                try:
-                    session_cart = CartModel.objects.get(session_key=session_key)
-                    for item in session_cart.items.all():
-                        cart_item, item_created = CartItem.objects.get_or_create(
-                            cart=cart,
-                            product=item.product,
-                            defaults={'quantity': item.quantity}
-                        )
-                        if not item_created:
-                            cart_item.quantity += item.quantity
-                            cart_item.save()
-                    session_cart.delete()
-                    del self.session[settings.CART_SESSION_ID]
-                    self.session.modified = True
-                except CartModel.DoesNotExist:
-                    pass
         else:
             session_key = self.session.get(settings.CART_SESSION_ID)
             if not session_key:
@@ -52,6 +110,18 @@ class Cart:
             cart, created = CartModel.objects.get_or_create(session_key=session_key)
 
         self.cart = cart
+        self._snapshot = None
+
+    @property
+    def snapshot(self):
+        """
+        The cart contents, loaded on first use and reloaded after changes.
+        """
+        if self._snapshot is None:
+            self._snapshot = CartSnapshot.load(self.cart)
+        elif self._snapshot.coupon != self.coupon:
+            self._snapshot = self._snapshot.with_coupon(self.coupon)
+        return self._snapshot
 
     def add(self, product, quantity=1, override_quantity=False):
         """
@@ -69,36 +139,73 @@ class Cart:
             else:
                 cart_item.quantity += quantity
             cart_item.save()
+        self._snapshot = None
 
     def remove(self, product):
         """
         Removes a product from the cart.
         """
         CartItem.objects.filter(cart=self.cart, product=product).delete()
+        self._snapshot = None
 
     def __iter__(self):
         """
         Iterates over the items in the cart, yielding product details.
         """
-        for item in self.cart.items.prefetch_related('product'):
-            yield {
-                'product': item.product,
-                'quantity': item.quantity,
-                'price': item.product.price,
-                'total_price': item.product.price * item.quantity,
-            }
+        return iter(self.snapshot.items)
 
     def __len__(self):
         """
         Returns the total number of items in the cart.
         """
-        return sum(item.quantity for item in self.cart.items.all())
+        return self.snapshot.count
 
     def get_total_price(self):
         """
         Calculates the total price of all items in the cart.
         """
-        return sum(item.product.price * item.quantity for item in self.cart.items.all())
+        return self.snapshot.total_price
+
+    def apply(self, changes):
+        """
+        Applies ``(product_id, op, quantity)`` changes in one transaction.
+        ``OP_ADD`` adds to the quantity, ``OP_SET`` replaces it (zero removes
+        the item) and ``OP_REMOVE`` removes the item.
+        """
+        product_ids = {product_id for product_id, _, _ in changes}
+        with transaction.atomic():
+            existing = {
+                item.product_id: item
+                for item in self.cart.items.filter(product_id__in=product_ids)
+            }
+            quantities = {product_id: item.quantity for product_id, item in existing.items()}
+            for product_id, op, quantity in changes:
+                if op == OP_ADD:
+                    quantities[product_id] = quantities.get(product_id, 0) + quantity
+                elif op == OP_SET:
+                    quantities[product_id] = quantity
+                else:
+                    quantities[product_id] = 0
+
+            removed = []
+            changed = []
+            created = []
+            for product_id, quantity in quantities.items():
+                item = existing.get(product_id)
+                if quantity <= 0:
+                    if item is not None:
+                        removed.append(product_id)
+                elif item is None:
+                    created.append(CartItem(cart=self.cart, product_id=product_id, quantity=quantity))
+                elif item.quantity != quantity:
+                    item.quantity = quantity
+                    changed.append(item)
+
+            if removed:
+                self.cart.items.filter(product_id__in=removed).delete()
+            CartItem.objects.bulk_update(changed, ['quantity'])
+            CartItem.objects.bulk_create(created)
+        self._snapshot = None
 
     def clear(self):
         """
@@ -108,6 +215,7 @@ class Cart:
         if not self.user.is_authenticated:
             self.cart.coupon = None
             self.cart.save()
+        self._snapshot = CartSnapshot([], self.coupon)
 
     @property
     def coupon(self):
@@ -120,9 +228,7 @@ class Cart:
         """
         Calculates the discount amount based on the currently applied coupon.
         """
-        if self.coupon:
-            return (self.coupon.discount / Decimal(100)) * self.get_total_price()
-        return Decimal(0)
+        return self.snapshot.discount
 
     def get_total_price_after_discount(self):
         """
@@ -3,7 +3,9 @@ import decimal
 from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
+from shop.models import Product
 from shop.serializers import ProductSerializer
+from .cart import OP_ADD, OP_REMOVE, OP_SET
 
 
 class CartSerializer(serializers.Serializer):
@@ -52,3 +54,31 @@ class CartSerializer(serializers.Serializer):
 class AddToCartSerializer(serializers.Serializer):
     quantity = serializers.IntegerField(min_value=1, default=1)
     override = serializers.BooleanField(default=False)
+
+
+class CartChangeSerializer(serializers.Serializer):
+    product_id = serializers.UUIDField()
+    op = serializers.ChoiceField(choices=[OP_ADD, OP_SET, OP_REMOVE], default=OP_SET)
+    quantity = serializers.IntegerField(min_value=0, default=1)
+
+    def validate(self, data):
+        if data['op'] == OP_ADD and data['quantity'] < 1:
+            raise serializers.ValidationError({'quantity': 'Ensure this value is greater than or equal to 1.'})
+        return data
+
+
+class CartBatchSerializer(serializers.Serializer):
+    items = CartChangeSerializer(many=True, allow_empty=False, max_length=100)
+
+    def validate_items(self, value):
+        """
+        Check that every product exists, in a single query.
+        """
+        product_ids = {change['product_id'] for change in value}
+        found = set(Product.objects.filter(product_id__in=product_ids).values_list('product_id', flat=True))
+        missing = product_ids - found
+        if missing:
+            raise serializers.ValidationError(
+                f"Products not found: {', '.join(sorted(str(product_id) for product_id in missing))}"
+            )
+        return value
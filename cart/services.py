@@ -1,25 +1,27 @@
+import logging
+
+import redis
+from django.conf import settings
+from django.db import connection, transaction
 from django.shortcuts import get_object_or_404
 from shop.models import Product
-from .cart import Cart
+from .cart import get_cart
+from .models import Cart as CartModel, CartItem
+
+logger = logging.getLogger(__name__)
 
 
 def get_cart_data(request):
-    cart = Cart(request)
+    cart = get_cart(request)
+    snapshot = cart.snapshot
     return {
-        'items': [
-            {
-                'product': item['product'],
-                'quantity': item['quantity'],
-                'total_price': item['total_price'],
-            }
-            for item in cart
-        ],
-        'total_price': cart.get_total_price(),
+        'items': snapshot.items,
+        'total_price': snapshot.total_price,
     }
 
 
 def add_to_cart(request, product_id, quantity=1, override_quantity=False):
-    cart = Cart(request)
+    cart = get_cart(request)
     product = get_object_or_404(Product, product_id=product_id)
     cart.add(
         product=product,
@@ -29,11 +31,69 @@ def add_to_cart(request, product_id, quantity=1, override_quantity=False):
 
 
 def remove_from_cart(request, product_id):
-    cart = Cart(request)
+    cart = get_cart(request)
     product = get_object_or_404(Product, product_id=product_id)
     cart.remove(product)
 
 
+def batch_update_cart(request, changes):
+    cart = get_cart(request)
+    cart.apply([
+        (change['product_id'], change['op'], change['quantity'])
+        for change in changes
+    ])
+
+
 def clear_cart(request):
-    cart = Cart(request)
+    cart = get_cart(request)
     cart.clear()
+
+
+@transaction.atomic
+def merge_carts(session_key, user):
+    """
+    Add the items of the anonymous carts of ``session_key`` to the cart of
+    ``user`` in one statement, summing quantities of products in both, and
+    delete the anonymous carts.
+    """
+    source = CartModel.objects.filter(session_key=session_key)
+    if not source.exists():
+        return
+    target = CartModel.objects.filter(user=user).first() or CartModel.objects.create(user=user)
+    table = connection.ops.quote_name(CartItem._meta.db_table)
+    carts = connection.ops.quote_name(CartModel._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"""
+            INSERT INTO {table} (cart_id, product_id, quantity)
+            SELECT %s, product_id, SUM(quantity) FROM {table}
+            WHERE cart_id IN (SELECT id FROM {carts} WHERE session_key = %s)
+            GROUP BY product_id
+            ON CONFLICT (cart_id, product_id)
+            DO UPDATE SET quantity = {table}.quantity + EXCLUDED.quantity
+            """,
+            [target.pk, session_key],
+        )
+    source.delete()
+
+
+def merge_session_cart(request, user):
+    """
+    Merge the anonymous cart of the session into the user's cart on login.
+    """
+    session_key = request.session.get(settings.CART_SESSION_ID)
+    if not session_key:
+        return
+    merged = False
+    if settings.CART_REDIS_ENABLED:
+        from . import store
+
+        try:
+            store.merge_carts(f"session:{session_key}", f"user:{user.pk}")
+            merged = True
+        except redis.RedisError:
+            logger.warning("Could not merge Redis carts, merging database carts.", exc_info=True)
+    if not merged:
+        merge_carts(session_key, user)
+    del request.session[settings.CART_SESSION_ID]
+    request.session.modified = True
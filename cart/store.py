@@ -0,0 +1,266 @@
+"""
+Redis-backed hot cart.
+
+Live carts are kept as Redis hashes of ``product_id -> quantity`` so adding,
+removing and reading items never touches the database. Every change marks the
+cart dirty and ``cart.tasks.flush_carts`` writes dirty carts behind to
+``Cart``/``CartItem``. Checkout moves the cart into the database first
+(``flush_cart(owner, evict=True)``), so order creation keeps reading the
+database cart.
+"""
+import logging
+
+import redis
+from django.conf import settings
+from django.db import transaction
+
+from shop.models import Product
+from .cart import OP_ADD, OP_SET, Cart, CartSnapshot
+from .models import Cart as CartModel, CartItem
+
+logger = logging.getLogger(__name__)
+
+r = redis.from_url(settings.REDIS_URL)
+
+# Owners of carts changed since they were last written to the database.
+DIRTY_SET = "cart:dirty"
+# Marks a hash as loaded, so an empty cart is not reloaded from the database
+# on every request. Never a product id.
+LOADED_FIELD = "_loaded"
+FLUSH_BATCH_SIZE = 500
+EVICT_ATTEMPTS = 3
+
+
+def cart_key(owner):
+    return f"cart:{owner}"
+
+
+def _db_lookup(owner):
+    kind, ident = owner.split(":", 1)
+    if kind == "user":
+        return {"user_id": ident}
+    return {"session_key": ident}
+
+
+def _quantities(data):
+    return {
+        key.decode(): int(value)
+        for key, value in data.items()
+        if key.decode() != LOADED_FIELD
+    }
+
+
+def _load(owner):
+    """
+    Refresh the TTL of a cart hash, copying the database cart into Redis the
+    first time it is used.
+    """
+    key = cart_key(owner)
+    pipe = r.pipeline()
+    pipe.exists(key)
+    pipe.expire(key, settings.SESSION_COOKIE_AGE)
+    exists, _ = pipe.execute()
+    if exists:
+        return
+    lookup = {f"cart__{field}": value for field, value in _db_lookup(owner).items()}
+    mapping = {
+        str(product_id): quantity
+        for product_id, quantity in CartItem.objects.filter(**lookup).values_list("product_id", "quantity")
+    }
+    mapping[LOADED_FIELD] = 1
+    pipe = r.pipeline()
+    pipe.hset(key, mapping=mapping)
+    pipe.expire(key, settings.SESSION_COOKIE_AGE)
+    pipe.execute()
+
+
+def merge_carts(source, target):
+    """
+    Add the quantities of the cart of owner ``source`` to the cart of
+    ``target`` and delete the source cart.
+    """
+    _load(source)
+    _load(target)
+    source_key = cart_key(source)
+    pipe = r.pipeline()
+    for product_id, quantity in _quantities(r.hgetall(source_key)).items():
+        pipe.hincrby(cart_key(target), product_id, quantity)
+    pipe.delete(source_key)
+    pipe.srem(DIRTY_SET, source)
+    pipe.sadd(DIRTY_SET, target)
+    pipe.execute()
+    # The flush skips carts without a hash, so the source's database cart
+    # is removed here.
+    CartModel.objects.filter(**_db_lookup(source)).delete()
+
+
+class RedisCart(Cart):
+    """
+    Cart stored in Redis with the same interface as the database ``Cart``.
+    Coupons are applied at checkout on the database cart, so none is set here.
+    """
+
+    durable = False
+
+    def __init__(self, request):
+        self.session = request.session
+        self.user = request.user
+        self._snapshot = None
+
+        if self.user.is_authenticated:
+            self.owner = f"user:{self.user.pk}"
+        else:
+            session_key = self.session.get(settings.CART_SESSION_ID)
+            if not session_key:
+                self.session.cycle_key()
+                session_key = self.session.session_key
+                self.session[settings.CART_SESSION_ID] = session_key
+            self.owner = f"session:{session_key}"
+        self.key = cart_key(self.owner)
+        _load(self.owner)
+
+    def _write(self, *commands):
+        pipe = r.pipeline()
+        for name, *args in commands:
+            getattr(pipe, name)(*args)
+        pipe.expire(self.key, settings.SESSION_COOKIE_AGE)
+        pipe.sadd(DIRTY_SET, self.owner)
+        pipe.execute()
+        self._snapshot = None
+
+    @property
+    def snapshot(self):
+        if self._snapshot is None:
+            quantities = _quantities(r.hgetall(self.key))
+            products = {
+                str(product_id): product
+                for product_id, product in Product.objects.in_bulk(list(quantities)).items()
+            }
+            items = []
+            for product_id, quantity in quantities.items():
+                product = products.get(product_id)
+                if product is None:
+                    continue
+                items.append({
+                    'product': product,
+                    'quantity': quantity,
+                    'price': product.price,
+                    'total_price': product.price * quantity,
+                })
+            self._snapshot = CartSnapshot(items)
+        return self._snapshot
+
+    @property
+    def coupon(self):
+        return None
+
+    def add(self, product, quantity=1, override_quantity=False):
+        field = str(product.product_id)
+        if override_quantity:
+            self._write(("hset", self.key, field, quantity))
+        else:
+            self._write(("hincrby", self.key, field, quantity))
+
+    def remove(self, product):
+        self._write(("hdel", self.key, str(product.product_id)))
+
+    def apply(self, changes):
+        # Sent as one MULTI/EXEC, so the changes are applied atomically.
+        commands = []
+        for product_id, op, quantity in changes:
+            field = str(product_id)
+            if op == OP_ADD:
+                commands.append(("hincrby", self.key, field, quantity))
+            elif op == OP_SET and quantity > 0:
+                commands.append(("hset", self.key, field, quantity))
+            else:
+                commands.append(("hdel", self.key, field))
+        self._write(*commands)
+
+    def clear(self):
+        self._write(("delete", self.key), ("hset", self.key, LOADED_FIELD, 1))
+        self._snapshot = CartSnapshot([])
+
+
+def flush_cart(owner, evict=False):
+    """
+    Write the Redis cart of ``owner`` to the database.
+
+    With ``evict`` the hash is deleted afterwards, unless it changed in the
+    meantime, so the database cart becomes the one in use.
+    """
+    key = cart_key(owner)
+    if not evict:
+        data = r.hgetall(key)
+        # A cart evicted at checkout or expired has no hash, and the
+        # database cart is already the current one.
+        if data:
+            _write_cart(owner, _quantities(data))
+        return
+    for _ in range(EVICT_ATTEMPTS):
+        with r.pipeline() as pipe:
+            try:
+                pipe.watch(key)
+                data = pipe.hgetall(key)
+                if data:
+                    _write_cart(owner, _quantities(data))
+                pipe.multi()
+                pipe.delete(key)
+                pipe.srem(DIRTY_SET, owner)
+                pipe.execute()
+                return
+            except redis.WatchError:
+                continue
+    raise redis.WatchError(f"Cart {owner} kept changing during checkout.")
+
+
+@transaction.atomic
+def _write_cart(owner, quantities):
+    lookup = _db_lookup(owner)
+    if not quantities and "session_key" in lookup:
+        CartModel.objects.filter(**lookup).delete()
+        return
+    cart = CartModel.objects.filter(**lookup).first()
+    if cart is None:
+        cart = CartModel.objects.create(**lookup)
+
+    # Products deleted since they were added are dropped.
+    quantities = {
+        str(product_id): quantities[str(product_id)]
+        for product_id in Product.all_objects.filter(
+            product_id__in=list(quantities)
+        ).values_list("product_id", flat=True)
+    }
+    existing = {str(item.product_id): item for item in cart.items.all()}
+    cart.items.exclude(product_id__in=list(quantities)).delete()
+    changed = []
+    for product_id, quantity in quantities.items():
+        item = existing.get(product_id)
+        if item is not None and item.quantity != quantity:
+            item.quantity = quantity
+            changed.append(item)
+    CartItem.objects.bulk_update(changed, ["quantity"])
+    CartItem.objects.bulk_create([
+        CartItem(cart=cart, product_id=product_id, quantity=quantity)
+        for product_id, quantity in quantities.items()
+        if product_id not in existing
+    ])
+
+
+def flush_dirty_carts():
+    """
+    Write a batch of changed carts to the database. Carts that fail are
+    marked dirty again for the next run.
+
+    :return: The number of carts written.
+    """
+    flushed = 0
+    for owner in r.spop(DIRTY_SET, FLUSH_BATCH_SIZE) or []:
+        owner = owner.decode()
+        try:
+            flush_cart(owner)
+            flushed += 1
+        except Exception:
+            logger.exception("Could not write cart %s to the database.", owner)
+            r.sadd(DIRTY_SET, owner)
+    return flushed
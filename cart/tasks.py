@@ -0,0 +1,20 @@
+from celery import shared_task
+from django.conf import settings
+
+from . import store
+
+
+@shared_task
+def flush_carts():
+    """
+    Write Redis carts changed since the last run to the database, batch by
+    batch until none are left.
+    """
+    if not settings.CART_REDIS_ENABLED:
+        return 0
+    flushed = 0
+    while True:
+        count = store.flush_dirty_carts()
+        flushed += count
+        if count < store.FLUSH_BATCH_SIZE:
+            return flushed
@@ -2,11 +2,14 @@ from decimal import Decimal
 from django.test import TestCase, RequestFactory
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.signals import user_logged_in
+from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
 from shop.models import Product, Category
 from coupons.models import Coupon
-from cart.cart import Cart
+from cart.cart import Cart, get_cart
+from cart.models import Cart as CartModel, CartItem
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
@@ -116,6 +119,21 @@ class CartClassTests(TestCase):
         self.assertEqual(cart.get_discount(), Decimal('1.00'))
         self.assertEqual(cart.get_total_price_after_discount(), Decimal('9.00'))
 
+    def test_cart_contents_are_loaded_once(self):
+        request = self.factory.get('/')
+        request.user = self.user
+        request.session = self.client.session
+        cart = get_cart(request)
+        cart.add(product=self.product, quantity=2)
+        cart.cart.coupon = self.coupon
+
+        with self.assertNumQueries(1):
+            self.assertEqual(len(cart), 2)
+            self.assertEqual(cart.get_total_price(), Decimal('20.00'))
+            self.assertEqual(cart.get_discount(), Decimal('2.00'))
+            self.assertEqual([item['quantity'] for item in cart], [2])
+        self.assertIs(get_cart(request), cart)
+
     def test_merge_cart_on_login(self):
         # 1. Create a cart as an anonymous user
         request = self.factory.get('/')
@@ -125,13 +143,20 @@ class CartClassTests(TestCase):
         anonymous_cart.add(product=self.product, quantity=1)
         self.assertEqual(len(anonymous_cart), 1)
 
-        # 2. "Log in" the user and initialize the cart again
+        # 2. The user already has the same product in their cart
+        user_cart = CartModel.objects.create(user=self.user)
+        CartItem.objects.create(cart=user_cart, product=self.product, quantity=2)
+
+        # 3. "Log in" the user and initialize the cart again
         request.user = self.user
+        user_logged_in.send(sender=User, request=request, user=self.user)
         authenticated_cart = Cart(request)
 
-        # 3. Verify the item from the anonymous cart is now in the authenticated cart
-        self.assertEqual(len(authenticated_cart), 1)
+        # 4. Verify the quantities of both carts were added together
+        self.assertEqual(len(authenticated_cart), 3)
         self.assertEqual(authenticated_cart.cart.user, self.user)
+        self.assertFalse(CartModel.objects.filter(session_key__isnull=False).exists())
+        self.assertNotIn(settings.CART_SESSION_ID, request.session)
 
 
 class CartViewSetTests(APITestCase):
@@ -197,3 +222,35 @@ class CartViewSetTests(APITestCase):
     def test_list_cart(self):
         response = self.client.get(self.list_url)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_batch_update(self):
+        other = Product.objects.create(
+            name='Other Product', slug='other-product', price=Decimal('5.00'),
+            category=self.category, stock=10, user=self.user
+        )
+        gone = Product.objects.create(
+            name='Gone Product', slug='gone-product', price=Decimal('1.00'),
+            category=self.category, stock=10, user=self.user
+        )
+        self.client.force_authenticate(user=self.user)
+        self.client.post(self.add_url, {'quantity': 1}, format='json')
+        self.client.post(reverse('api-v1:cart-add', kwargs={'product_id': gone.product_id}), {'quantity': 1}, format='json')
+
+        response = self.client.patch(self.list_url, {'items': [
+            {'product_id': str(self.product.product_id), 'op': 'add', 'quantity': 2},
+            {'product_id': str(other.product_id), 'quantity': 4},
+            {'product_id': str(gone.product_id), 'op': 'remove'},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        quantities = {item['product']['name']: item['quantity'] for item in response.data['items']}
+        self.assertEqual(quantities, {'Test Product': 3, 'Other Product': 4})
+
+    def test_batch_update_rejects_unknown_products(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.patch(self.list_url, {'items': [
+            {'product_id': str(self.product.product_id), 'quantity': 1},
+            {'product_id': '00000000-0000-0000-0000-000000000000', 'quantity': 1},
+        ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(CartItem.objects.exists())
@@ -3,6 +3,7 @@ from decimal import Decimal
 from django.test import RequestFactory
 from django.contrib.sessions.middleware import SessionMiddleware
 from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.signals import user_logged_in
 
 from cart.cart import Cart
 from cart.models import Cart as DbCart, CartItem
@@ -114,7 +115,8 @@ class TestCartLogic:
         db_cart = DbCart.objects.create(user=user)
         CartItem.objects.create(cart=db_cart, product=product_b, quantity=1)
 
-        # 4. Instantiate the cart for the authenticated user, which should trigger the merge
+        # 4. Logging in triggers the merge
+        user_logged_in.send(sender=type(user), request=auth_request, user=user)
         final_cart = Cart(auth_request)
 
         # 5. Verify the merge logic
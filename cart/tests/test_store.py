@@ -0,0 +1,103 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.signals import user_logged_in
+from django.test import RequestFactory, TestCase, override_settings
+from fakeredis import FakeRedis
+
+from account.factories import UserFactory
+from cart import store
+from cart.cart import OP_ADD, OP_SET, Cart, get_cart
+from cart.models import Cart as DbCart, CartItem
+from shop.factories import ProductFactory
+
+
+@override_settings(CART_REDIS_ENABLED=True)
+class RedisCartTest(TestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        patcher = patch('cart.store.r', self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.product = ProductFactory(price=Decimal('10.00'))
+        self.other = ProductFactory(price=Decimal('5.00'))
+        self.user = UserFactory()
+        self.session = self.client.session
+
+    def request(self, user=None):
+        request = RequestFactory().get('/')
+        request.session = self.session
+        request.user = user or AnonymousUser()
+        return request
+
+    def test_changes_stay_in_redis_until_flushed(self):
+        cart = get_cart(self.request(self.user))
+        cart.add(self.product, 2)
+        cart.add(self.other, 1)
+        cart.add(self.product, 1)
+        cart.remove(self.other)
+
+        self.assertEqual(len(cart), 3)
+        self.assertEqual(cart.get_total_price(), Decimal('30.00'))
+        self.assertFalse(CartItem.objects.exists())
+
+        self.assertEqual(store.flush_dirty_carts(), 1)
+        item = CartItem.objects.get(cart__user=self.user)
+        self.assertEqual((item.product, item.quantity), (self.product, 3))
+
+        cart.add(self.product, 1, override_quantity=True)
+        store.flush_dirty_carts()
+        self.assertEqual(CartItem.objects.get(cart__user=self.user).quantity, 1)
+
+    def test_anonymous_cart_is_merged_on_login(self):
+        get_cart(self.request()).add(self.product, 1)
+        get_cart(self.request(self.user)).add(self.product, 1)
+
+        request = self.request(self.user)
+        user_logged_in.send(sender=type(self.user), request=request, user=self.user)
+        user_cart = get_cart(request)
+
+        self.assertEqual([(item['product'], item['quantity']) for item in user_cart], [(self.product, 2)])
+        self.assertEqual(self.redis.keys('cart:session:*'), [])
+
+    def test_database_cart_is_loaded_on_first_use(self):
+        db_cart = DbCart.objects.create(user=self.user)
+        CartItem.objects.create(cart=db_cart, product=self.other, quantity=4)
+
+        self.assertEqual(len(get_cart(self.request(self.user))), 4)
+
+    def test_durable_cart_moves_redis_cart_to_database(self):
+        request = self.request(self.user)
+        get_cart(request).add(self.product, 2)
+
+        cart = get_cart(request, durable=True)
+
+        self.assertIsInstance(cart, Cart)
+        self.assertTrue(cart.durable)
+        self.assertEqual(len(cart), 2)
+        self.assertEqual(self.redis.keys('cart:user:*'), [])
+
+    def test_failed_checkout_keeps_the_database_cart(self):
+        request = self.request(self.user)
+        get_cart(request).add(self.product, 2)
+        get_cart(request).add(self.other, 1)
+        get_cart(request, durable=True)
+        # Checkout fails here, e.g. on stock, and the request ends.
+
+        self.assertFalse(self.redis.sismember(store.DIRTY_SET, f"user:{self.user.pk}"))
+        store.flush_dirty_carts()
+        store.flush_cart(f"user:{self.user.pk}")
+
+        self.assertEqual(CartItem.objects.filter(cart__user=self.user).count(), 2)
+        self.assertEqual(len(get_cart(self.request(self.user))), 3)
+
+    def test_apply_batch(self):
+        cart = get_cart(self.request(self.user))
+        cart.add(self.product, 1)
+        cart.add(self.other, 1)
+        cart.apply([
+            (self.product.product_id, OP_ADD, 2),
+            (self.other.product_id, OP_SET, 0),
+        ])
+        self.assertEqual([(item['product'], item['quantity']) for item in cart], [(self.product, 3)])
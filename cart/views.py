@@ -9,7 +9,7 @@ from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 
-from .serializers import CartSerializer, AddToCartSerializer
+from .serializers import CartSerializer, AddToCartSerializer, CartBatchSerializer
 from . import services
 
 logger = getLogger(__name__)
@@ -38,6 +38,16 @@ logger = getLogger(__name__)
             404: OpenApiResponse(description="Product not found."),
         },
     ),
+    batch_update=extend_schema(
+        operation_id="cart_batch_update",
+        description="Add, set or remove several cart items at once.",
+        tags=["Cart"],
+        request=CartBatchSerializer,
+        responses={
+            200: OpenApiResponse(response=CartSerializer, description="Cart updated."),
+            400: OpenApiResponse(description="Invalid changes or unknown products."),
+        },
+    ),
     remove_from_cart=extend_schema(
         operation_id="cart_remove_product",
         description="Remove a product from the cart.",
@@ -85,6 +95,25 @@ class CartViewSet(viewsets.ViewSet):
         serializer = CartSerializer(cart_data, context={'request': request})
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    def batch_update(self, request, *args, **kwargs):
+        """
+        Apply a list of {product_id, op, quantity} changes to the cart in one
+        transaction. ``op`` is ``add``, ``set`` (the default) or ``remove``.
+
+        Args:
+            request: The HTTP request object containing the changes.
+
+        Returns:
+            Response: A JSON response containing the updated cart.
+        """
+        serializer = CartBatchSerializer(data=request.data)
+        if not serializer.is_valid():
+            logger.error(f"Invalid data provided in cart batch update: {serializer.errors}")
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        services.batch_update_cart(request, serializer.validated_data['items'])
+        cart_data = services.get_cart_data(request)
+        return Response(CartSerializer(cart_data, context={'request': request}).data, status=status.HTTP_200_OK)
+
     @action(detail=True, methods=['post'], url_path='add')
     @extend_schema(
         operation_id="cart_add_product",
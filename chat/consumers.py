@@ -5,13 +5,16 @@ from channels.generic.websocket import AsyncWebsocketConsumer
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 
-
+from ecommerce_api.core.throttling import AsyncTokenBucketThrottle
 from .models import Message
 
 
 class ChatConsumer(AsyncWebsocketConsumer):
     """WebSocket consumer for handling private product chats between sellers and buyers."""
 
+    # One message per second per user, with bursts of five.
+    throttle = AsyncTokenBucketThrottle('chat', rate=1, capacity=5)
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.user = None
@@ -97,6 +100,12 @@ class ChatConsumer(AsyncWebsocketConsumer):
         :param text_data:
         :param bytes_data:
         """
+        if not await self.throttle.allow(self.user.pk):
+            await self.send(text_data=json.dumps({
+                'error': 'Too many messages. Please slow down.'
+            }))
+            return
+
         try:
             text_data_json = json.loads(text_data)
         except json.JSONDecodeError:
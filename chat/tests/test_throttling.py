@@ -0,0 +1,57 @@
+from unittest.mock import patch
+
+import redis
+from asgiref.sync import async_to_sync
+from django.test import TestCase, override_settings
+
+from ecommerce_api.core.throttling import AsyncTokenBucketThrottle, LocalTokenBucket
+
+
+class LocalTokenBucketTest(TestCase):
+    def test_allows_burst_then_refills(self):
+        bucket = LocalTokenBucket(rate=1, capacity=2)
+        with patch('ecommerce_api.core.throttling.time.monotonic', return_value=100.0):
+            self.assertTrue(bucket.consume('a'))
+            self.assertTrue(bucket.consume('a'))
+            self.assertFalse(bucket.consume('a'))
+            self.assertTrue(bucket.consume('b'))
+        with patch('ecommerce_api.core.throttling.time.monotonic', return_value=101.0):
+            self.assertTrue(bucket.consume('a'))
+            self.assertFalse(bucket.consume('a'))
+
+    def test_evicts_least_recently_used_buckets(self):
+        bucket = LocalTokenBucket(rate=1, capacity=1)
+        bucket.max_buckets = 2
+        for key in ('a', 'b', 'c'):
+            bucket.consume(key)
+        self.assertEqual(list(bucket._buckets), ['b', 'c'])
+
+
+class AsyncTokenBucketThrottleTest(TestCase):
+    def test_uses_local_bucket_when_redis_disabled(self):
+        throttle = AsyncTokenBucketThrottle('test', rate=0.001, capacity=1)
+        self.assertTrue(async_to_sync(throttle.allow)('user'))
+        self.assertFalse(async_to_sync(throttle.allow)('user'))
+
+    @override_settings(WEBSOCKET_THROTTLE_USE_REDIS=True)
+    def test_falls_back_to_local_bucket_on_redis_errors(self):
+        async def unavailable(*args, **kwargs):
+            raise redis.ConnectionError('down')
+
+        throttle = AsyncTokenBucketThrottle('test', rate=0.001, capacity=1)
+        with patch('ecommerce_api.core.throttling._get_token_bucket_script', return_value=unavailable):
+            self.assertTrue(async_to_sync(throttle.allow)('user'))
+            self.assertFalse(async_to_sync(throttle.allow)('user'))
+
+    @override_settings(WEBSOCKET_THROTTLE_USE_REDIS=True)
+    def test_uses_redis_script_result(self):
+        calls = []
+
+        async def script(keys, args):
+            calls.append((keys, args))
+            return 0
+
+        throttle = AsyncTokenBucketThrottle('test', rate=2, capacity=3)
+        with patch('ecommerce_api.core.throttling._get_token_bucket_script', return_value=script):
+            self.assertFalse(async_to_sync(throttle.allow)('user'))
+        self.assertEqual(calls, [(['throttle:ws:test:user'], [2, 3, 1])])
@@ -1,9 +1,9 @@
-from cart.cart import Cart
+from cart.cart import get_cart
 from .models import Coupon
 
 
 def apply_coupon(request, code):
-    cart = Cart(request)
+    cart = get_cart(request)
     try:
         coupon = Coupon.objects.get(code__iexact=code, active=True)
     except Coupon.DoesNotExist:
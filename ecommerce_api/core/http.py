@@ -0,0 +1,218 @@
+"""
+Shared outbound HTTP clients for third-party providers (Zibal, Postex, SMS.ir).
+
+Each provider gets one process-wide ``requests.Session`` with a keep-alive
+connection pool, its own timeouts and a circuit breaker, configured in
+``settings.OUTBOUND_HTTP``. Reusing the pool saves a TCP and TLS handshake on
+every call made from the request path.
+"""
+import logging
+import os
+import threading
+import time
+
+import requests
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "timeout": (3.05, 10),  # (connect, read) seconds
+    "retries": 0,
+    "pool_maxsize": 10,
+    "failure_threshold": 5,
+    "reset_timeout": 30,  # seconds an open circuit waits before a trial call
+}
+
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+    """
+    Raised instead of calling a provider whose circuit is open. Subclasses
+    ``ConnectionError`` so callers handle it like an unreachable host.
+    """
+
+
+class CircuitBreaker:
+    """
+    Stops calling a provider after ``failure_threshold`` consecutive
+    failures, then lets one trial call through every ``reset_timeout``
+    seconds until it succeeds.
+    """
+
+    def __init__(self, name, failure_threshold, reset_timeout):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+
+    @property
+    def is_open(self):
+        return self._opened_at is not None
+
+    def before_call(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_timeout:
+                raise CircuitOpenError(f"Circuit for {self.name} is open.")
+            # Half-open: let this call through and keep the others out
+            # until it reports back.
+            self._opened_at = time.monotonic()
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning(f"Opening circuit for {self.name} after {self._failures} failures.")
+                self._opened_at = time.monotonic()
+
+
+class HttpClient:
+    """
+    Pooled HTTP client for one provider.
+
+    Args:
+        name: Provider name, used in logs and errors.
+        base_url: Prefix for the paths passed to ``request``.
+        timeout: Default ``(connect, read)`` timeout in seconds.
+        retries: Retries on connection errors and 429/5xx responses.
+        pool_maxsize: Keep-alive connections kept per host.
+        failure_threshold: Consecutive failures that open the circuit.
+        reset_timeout: Seconds before an open circuit allows a trial call.
+    """
+
+    def __init__(self, name, base_url, timeout, retries, pool_maxsize, failure_threshold, reset_timeout):
+        self.name = name
+        self.base_url = base_url.rstrip("/")
+        self.timeout = tuple(timeout) if isinstance(timeout, (list, tuple)) else timeout
+        self.breaker = CircuitBreaker(name, failure_threshold, reset_timeout)
+        retry_strategy = Retry(
+            total=retries,
+            # A read timeout means the provider may have acted on the
+            # request; never resend it.
+            read=False,
+            backoff_factor=1,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["HEAD", "GET", "POST", "DELETE", "OPTIONS"],
+            # Hand the last response back instead of raising once exhausted.
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=retry_strategy)
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method, path, **kwargs):
+        """
+        Send a request through the shared pool. Connection errors, timeouts
+        and 5xx responses count as failures of the provider.
+
+        :raises CircuitOpenError: If the provider is failing.
+        :raises requests.exceptions.RequestException: On network errors.
+        """
+        self.breaker.before_call()
+        kwargs.setdefault("timeout", self.timeout)
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", **kwargs)
+        except requests.exceptions.RequestException:
+            self.breaker.record_failure()
+            raise
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request("DELETE", path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncHttpClient:
+    """
+    Awaitable interface to an ``HttpClient`` for consumers and other async
+    code. Calls run in worker threads and share the client's connection pool
+    and circuit breaker.
+    """
+
+    def __init__(self, client):
+        self.client = client
+
+    async def request(self, method, path, **kwargs):
+        return await sync_to_async(self.client.request, thread_sensitive=False)(method, path, **kwargs)
+
+    async def get(self, path, **kwargs):
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path, **kwargs):
+        return await self.request("POST", path, **kwargs)
+
+    async def delete(self, path, **kwargs):
+        return await self.request("DELETE", path, **kwargs)
+
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_client(name):
+    """
+    Return the process-wide client for the provider ``name`` configured in
+    ``settings.OUTBOUND_HTTP``.
+    """
+    client = _clients.get(name)
+    if client is None:
+        with _lock:
+            client = _clients.get(name)
+            if client is None:
+                options = {**DEFAULTS, **settings.OUTBOUND_HTTP[name]}
+                client = HttpClient(name, **options)
+                _clients[name] = client
+    return client
+
+
+def get_async_client(name):
+    return AsyncHttpClient(get_client(name))
+
+
+def reset_clients():
+    """
+    Close all pooled connections; clients are rebuilt on next use.
+    """
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+@receiver(setting_changed)
+def _reset_on_setting_change(setting, **kwargs):
+    if setting == "OUTBOUND_HTTP":
+        reset_clients()
+
+
+if hasattr(os, "register_at_fork"):
+    # Sockets inherited from the parent (e.g. Celery prefork workers) must
+    # not be shared with it.
+    os.register_at_fork(after_in_child=_clients.clear)
@@ -1,4 +1,4 @@
-from ..utils.pagination import CustomPageNumberPagination
+from ..utils.pagination import CustomPageNumberPagination, KeysetCursorPagination
 
 
 class PaginationMixin:
@@ -6,3 +6,23 @@ class PaginationMixin:
     Mixin to provide custom pagination for viewsets
     """
     pagination_class = CustomPageNumberPagination
+
+
+class CursorPaginationMixin(PaginationMixin):
+    """
+    Mixin that lets the 'list' action switch to keyset cursor pagination
+    when the client asks for it (``?pagination=cursor`` or a ``cursor`` param).
+    Page-number pagination stays the default.
+    """
+    cursor_pagination_class = KeysetCursorPagination
+    # Unique column appended to the ordering so cursors are stable.
+    cursor_tiebreaker = 'pk'
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            if self.action == 'list' and self.cursor_pagination_class.is_requested(self.request):
+                self._paginator = self.cursor_pagination_class(tiebreaker=self.cursor_tiebreaker)
+            else:
+                self._paginator = self.pagination_class() if self.pagination_class else None
+        return self._paginator
@@ -0,0 +1,79 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.conf import settings
+from django.test import override_settings
+
+
+class StubServer:
+    """
+    Local HTTP server standing in for a third-party API in tests.
+
+    Routes answer with canned JSON responses; every request is recorded with
+    its headers, parsed JSON body and the client address it came from.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw = self.rfile.read(length) if length else b""
+                server.requests.append({
+                    "method": self.command,
+                    "path": self.path,
+                    "json": json.loads(raw) if raw else None,
+                    "client": self.client_address,
+                    "headers": dict(self.headers),
+                })
+                status, body, delay, headers = server.routes.get((self.command, self.path), (404, {}, 0, {}))
+                if delay:
+                    time.sleep(delay)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            do_GET = do_POST = do_DELETE = _handle
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+
+    def respond(self, method, path, status=200, json=None, delay=0, headers=None):
+        self.routes[(method, path)] = (status, json if json is not None else {}, delay, headers or {})
+
+    def start(self):
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def stub_provider(testcase, name):
+    """
+    Start a ``StubServer`` and point the ``OUTBOUND_HTTP`` provider ``name``
+    at it for the rest of ``testcase``'s test. Returns the server.
+    """
+    server = StubServer().start()
+    testcase.addCleanup(server.stop)
+    http_settings = override_settings(OUTBOUND_HTTP={**settings.OUTBOUND_HTTP, name: {"base_url": server.url}})
+    http_settings.enable()
+    testcase.addCleanup(http_settings.disable)
+    return server
@@ -0,0 +1,64 @@
+import requests
+from asgiref.sync import async_to_sync
+from django.test import TestCase
+
+from ecommerce_api.core.http import AsyncHttpClient, CircuitOpenError, HttpClient
+
+from .stub_server import StubServer
+
+
+class HttpClientTest(TestCase):
+    def setUp(self):
+        self.server = StubServer().start()
+        self.addCleanup(self.server.stop)
+
+    def make_client(self, **options):
+        defaults = {
+            "timeout": (1, 1), "retries": 0, "pool_maxsize": 2,
+            "failure_threshold": 2, "reset_timeout": 60,
+        }
+        client = HttpClient("stub", self.server.url, **{**defaults, **options})
+        self.addCleanup(client.close)
+        return client
+
+    def test_connections_are_reused(self):
+        self.server.respond("POST", "/echo", json={"ok": True})
+        client = self.make_client()
+
+        for _ in range(3):
+            self.assertEqual(client.post("/echo", json={"n": 1}).json(), {"ok": True})
+
+        self.assertEqual(len({request["client"] for request in self.server.requests}), 1)
+
+    def test_circuit_opens_after_consecutive_failures(self):
+        self.server.respond("GET", "/down", status=503)
+        client = self.make_client()
+
+        self.assertEqual(client.get("/down").status_code, 503)
+        self.assertEqual(client.get("/down").status_code, 503)
+        with self.assertRaises(CircuitOpenError):
+            client.get("/down")
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_circuit_closes_after_successful_trial_call(self):
+        self.server.respond("GET", "/flaky", status=503)
+        client = self.make_client(reset_timeout=0)
+        client.get("/flaky")
+        client.get("/flaky")
+        self.assertTrue(client.breaker.is_open)
+
+        self.server.respond("GET", "/flaky", json={"ok": True})
+        self.assertEqual(client.get("/flaky").status_code, 200)
+        self.assertFalse(client.breaker.is_open)
+
+    def test_read_timeout(self):
+        self.server.respond("GET", "/slow", json={}, delay=0.5)
+        client = self.make_client(timeout=(1, 0.1))
+        with self.assertRaises(requests.exceptions.Timeout):
+            client.get("/slow")
+
+    def test_async_client(self):
+        self.server.respond("GET", "/echo", json={"ok": True})
+        client = AsyncHttpClient(self.make_client())
+        response = async_to_sync(client.get)("/echo")
+        self.assertEqual(response.json(), {"ok": True})
@@ -0,0 +1,132 @@
+import asyncio
+import logging
+import time
+import weakref
+from collections import OrderedDict
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Atomic token bucket. Uses the Redis clock so workers with skewed clocks
+# share one view of time, and expires idle buckets once they would be full.
+TOKEN_BUCKET_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1]) or capacity
+local ts = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000) + 1000)
+return allowed
+"""
+
+# redis.asyncio clients are bound to the event loop that created them.
+_clients = weakref.WeakKeyDictionary()
+_scripts = weakref.WeakKeyDictionary()
+
+
+def get_async_redis():
+    """
+    Return the shared asyncio Redis client for the running event loop.
+    Socket timeouts are kept short so a slow Redis degrades throttling
+    instead of stalling every socket served by the loop.
+    """
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = aioredis.from_url(
+            settings.REDIS_URL,
+            socket_timeout=settings.WEBSOCKET_THROTTLE_TIMEOUT,
+            socket_connect_timeout=settings.WEBSOCKET_THROTTLE_TIMEOUT,
+        )
+        _clients[loop] = client
+    return client
+
+
+def _get_token_bucket_script():
+    # Registered scripts run with EVALSHA and reload themselves on NOSCRIPT.
+    loop = asyncio.get_running_loop()
+    script = _scripts.get(loop)
+    if script is None:
+        script = get_async_redis().register_script(TOKEN_BUCKET_SCRIPT)
+        _scripts[loop] = script
+    return script
+
+
+class LocalTokenBucket:
+    """
+    In-process token bucket, used when Redis is disabled or unreachable.
+    Limits are then enforced per worker rather than globally.
+    """
+
+    max_buckets = 10000
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._buckets = OrderedDict()
+
+    def consume(self, key, cost=1):
+        now = time.monotonic()
+        tokens, ts = self._buckets.pop(key, (self.capacity, now))
+        tokens = min(self.capacity, tokens + (now - ts) * self.rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+        return allowed
+
+
+class AsyncTokenBucketThrottle:
+    """
+    Non-blocking token-bucket rate limiter for websocket consumers.
+
+    Each check is a single atomic Lua call on the asyncio Redis client, so the
+    event loop is never blocked. When Redis fails or times out the check falls
+    back to a per-process bucket instead of rejecting or stalling the socket.
+
+    Args:
+        scope: Namespace for the bucket keys, e.g. ``"search"``.
+        rate: Tokens added per second.
+        capacity: Maximum burst size.
+    """
+
+    def __init__(self, scope, rate, capacity):
+        self.scope = scope
+        self.rate = rate
+        self.capacity = capacity
+        self.local = LocalTokenBucket(rate, capacity)
+
+    def get_key(self, ident):
+        return f"throttle:ws:{self.scope}:{ident}"
+
+    async def allow(self, ident, cost=1):
+        """
+        Take ``cost`` tokens from the bucket of ``ident``.
+
+        :return: True if the request may proceed, False if it is throttled.
+        """
+        key = self.get_key(ident)
+        if settings.WEBSOCKET_THROTTLE_USE_REDIS:
+            try:
+                allowed = await _get_token_bucket_script()(
+                    keys=[key], args=[self.rate, self.capacity, cost]
+                )
+                return bool(allowed)
+            except (redis.RedisError, OSError, asyncio.TimeoutError):
+                logger.warning("Websocket throttle falling back to local bucket.", exc_info=True)
+        return self.local.consume(key, cost)
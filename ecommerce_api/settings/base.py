@@ -33,6 +33,19 @@ CORS_ALLOW_CREDENTIALS = env.bool('CORS_ALLOW_CREDENTIALS', default=True)
 DATABASES = {'default': env.db('DATABASE_URL')}
 REDIS_URL = env('REDIS_URL')
 CACHES = {'default': env.cache('REDIS_URL')}
+# Broadcast product name changes to the websocket workers' autocomplete indexes
+AUTOCOMPLETE_PUBSUB_ENABLED = env.bool('AUTOCOMPLETE_PUBSUB_ENABLED', default=True)
+# Websocket consumers throttle through an atomic Redis token bucket; on errors
+# or timeouts (seconds) they fall back to a per-process bucket.
+WEBSOCKET_THROTTLE_USE_REDIS = env.bool('WEBSOCKET_THROTTLE_USE_REDIS', default=True)
+WEBSOCKET_THROTTLE_TIMEOUT = env.float('WEBSOCKET_THROTTLE_TIMEOUT', default=0.1)
+# Keep live carts in Redis and write them behind to the database.
+CART_REDIS_ENABLED = env.bool('CART_REDIS_ENABLED', default=False)
+# Buffer order events in Redis and bulk-insert them from a periodic task.
+ORDER_EVENTS_BUFFERED = env.bool('ORDER_EVENTS_BUFFERED', default=False)
+# Months of order partitions created ahead of time (PostgreSQL, see
+# orders.partitioning).
+ORDER_PARTITIONS_AHEAD = env.int('ORDER_PARTITIONS_AHEAD', default=3)
 
 # Email
 EMAIL_CONFIG = env.email_url('EMAIL_URL', default='consolemail://')
@@ -122,6 +135,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'orders.events.OrderEventMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django_prometheus.middleware.PrometheusAfterMiddleware',
@@ -261,6 +275,34 @@ POSTEX_SENDER_ADDRESS = env('POSTEX_SENDER_ADDRESS', default='Your Company Addre
 POSTEX_SENDER_POSTAL_CODE = env('POSTEX_SENDER_POSTAL_CODE', default='Your Company Postal Code')
 POSTEX_FROM_CITY_CODE = env.int('POSTEX_FROM_CITY_CODE', default=1)
 POSTEX_SERVICE_TYPE = env('POSTEX_SERVICE_TYPE', default='standard')
+# Shared secret Postex sends in the X-Postex-Secret header of tracking
+# webhooks; webhooks are rejected while it is unset.
+POSTEX_WEBHOOK_SECRET = env('POSTEX_WEBHOOK_SECRET', default='')
+# Largest parcel Postex accepts, in the units of the product fields (cm, grams).
+POSTEX_PARCEL_LIMITS = {
+    'length': env.int('POSTEX_PARCEL_MAX_LENGTH', default=100),
+    'width': env.int('POSTEX_PARCEL_MAX_WIDTH', default=60),
+    'height': env.int('POSTEX_PARCEL_MAX_HEIGHT', default=60),
+    'weight': env.int('POSTEX_PARCEL_MAX_WEIGHT', default=30000),
+}
+
+# Outbound HTTP clients (see ecommerce_api.core.http). Timeouts are
+# (connect, read) seconds; unset options use the module defaults.
+OUTBOUND_HTTP = {
+    'zibal': {
+        'base_url': env('ZIBAL_API_URL', default='https://gateway.zibal.ir/v1'),
+        'timeout': (3.05, 5),
+        'retries': 3,
+    },
+    'postex': {
+        'base_url': env('POSTEX_API_URL', default='https://api.postex.ir'),
+        'timeout': (3.05, 10),
+    },
+    'sms_ir': {
+        'base_url': env('SMS_IR_API_URL', default='https://api.sms.ir/v1'),
+        'timeout': (3.05, 10),
+    },
+}
 
 AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
@@ -314,6 +356,10 @@ TAGGIT_CASE_INSENSITIVE = True
 ZIBAL_MERCHANT_ID = env('ZIBAL_MERCHANT_ID')
 ZIBAL_WEBHOOK_SECRET = env('ZIBAL_WEBHOOK_SECRET')
 ZIBAL_ALLOWED_IPS = env.list('ZIBAL_ALLOWED_IPS', default=['127.0.0.1'])
+# Verify callbacks in a Celery task and let the client poll the payment status.
+PAYMENT_VERIFY_ASYNC = env.bool('PAYMENT_VERIFY_ASYNC', default=False)
+# Pending payments older than this are re-verified by the reconciliation sweep.
+PAYMENT_RECONCILE_AFTER_MINUTES = env.int('PAYMENT_RECONCILE_AFTER_MINUTES', default=10)
 
 # Celery Configuration
 CELERY_BROKER_URL = env('CELERY_BROKER_URL')
@@ -327,6 +373,42 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'orders.tasks.cancel_pending_orders',
         'schedule': env.float('CANCEL_PENDING_ORDERS_INTERVAL', 600.0),  # Default to 10 minutes
     },
+    'rebuild-product-listings': {
+        'task': 'shop.tasks.rebuild_product_listings',
+        'schedule': env.float('REBUILD_PRODUCT_LISTINGS_INTERVAL', 3600.0),  # Default to 1 hour
+    },
+    'rebuild-recommendations': {
+        'task': 'shop.tasks.rebuild_recommendations',
+        'schedule': env.float('REBUILD_RECOMMENDATIONS_INTERVAL', 21600.0),  # Default to 6 hours
+    },
+    'rebuild-related-products': {
+        'task': 'shop.tasks.rebuild_related_products',
+        'schedule': env.float('REBUILD_RELATED_PRODUCTS_INTERVAL', 21600.0),  # Default to 6 hours
+    },
+    'reconcile-pending-payments': {
+        'task': 'payment.tasks.reconcile_pending_payments',
+        'schedule': env.float('RECONCILE_PENDING_PAYMENTS_INTERVAL', 300.0),  # Default to 5 minutes
+    },
+    'refresh-postex-cities': {
+        'task': 'shipping.tasks.refresh_postex_cities',
+        'schedule': env.float('REFRESH_POSTEX_CITIES_INTERVAL', 86400.0),  # Default to 1 day
+    },
+    'poll-shipments': {
+        'task': 'shipping.tasks.poll_shipments',
+        'schedule': env.float('POLL_SHIPMENTS_INTERVAL', 600.0),  # Default to 10 minutes
+    },
+    'flush-carts': {
+        'task': 'cart.tasks.flush_carts',
+        'schedule': env.float('FLUSH_CARTS_INTERVAL', 60.0),  # Default to 1 minute
+    },
+    'flush-order-events': {
+        'task': 'orders.tasks.flush_order_events',
+        'schedule': env.float('FLUSH_ORDER_EVENTS_INTERVAL', 30.0),  # Default to 30 seconds
+    },
+    'create-order-partitions': {
+        'task': 'orders.tasks.create_order_partitions',
+        'schedule': env.float('CREATE_ORDER_PARTITIONS_INTERVAL', 86400.0),  # Default to 1 day
+    },
 }
 
 # Session cookie settings
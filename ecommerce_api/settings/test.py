@@ -32,6 +32,10 @@ CACHES = {
     }
 }
 
+# Keep autocomplete index changes in-process
+AUTOCOMPLETE_PUBSUB_ENABLED = False
+WEBSOCKET_THROTTLE_USE_REDIS = False
+
 # Use in-memory channel layer for tests
 CHANNEL_LAYERS = {
     'default': {
@@ -1,4 +1,11 @@
-from rest_framework.pagination import PageNumberPagination
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.utils.urls import replace_query_param
 
 from ecommerce_api.core.api_standard_response import ApiResponse
 
@@ -37,3 +44,211 @@ class CustomPageNumberPagination(PageNumberPagination):
                 }
             }
         )
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    Keyset (seek) pagination driven by opaque cursors.
+
+    Instead of ``OFFSET`` scans and a ``COUNT(*)`` per page, each page is fetched with a
+    ``WHERE (key, tiebreaker) > (last_key, last_tiebreaker)`` predicate on the queryset's
+    primary ordering field plus a unique tiebreaker column, so page 500 costs the same as
+    page 1 when ``(key, tiebreaker)`` is indexed.
+
+    The total count is omitted unless requested with ``?count=exact`` or ``?count=estimate``.
+    Estimates come from ``pg_class.reltuples`` for unfiltered querysets and from the planner's
+    row estimate otherwise (PostgreSQL only).
+    """
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    # Unique column used to break ties between rows sharing the same ordering value.
+    tiebreaker = 'pk'
+
+    def __init__(self, tiebreaker=None):
+        if tiebreaker:
+            self.tiebreaker = tiebreaker
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering_field, self.descending = self.get_ordering(queryset)
+        self.count = self.get_count(queryset.order_by(), request)
+
+        cursor = self.decode_cursor(request)
+        self.is_reverse = cursor['r'] if cursor else False
+
+        # Walking backwards means flipping the ordering and the comparison operator,
+        # then restoring the natural order once the page has been fetched.
+        descending = self.descending != self.is_reverse
+        queryset = queryset.order_by(*self._order_by(descending))
+        if cursor:
+            queryset = queryset.filter(self._seek_filter(cursor, descending))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if self.is_reverse:
+            results.reverse()
+
+        self.page = results
+        if self.is_reverse:
+            self.has_next = cursor is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+        return results
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def get_ordering(self, queryset):
+        """
+        Return the primary ordering field of the queryset and whether it is descending.
+        Only the first ordering term is used as the seek key; the tiebreaker is appended.
+        """
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering) or [self.tiebreaker]
+        field = ordering[0]
+        if not isinstance(field, str):
+            raise ValueError('Keyset pagination requires a plain field ordering.')
+        return field.lstrip('-'), field.startswith('-')
+
+    def _order_by(self, descending):
+        prefix = '-' if descending else ''
+        if self.ordering_field == self.tiebreaker:
+            return [f'{prefix}{self.tiebreaker}']
+        return [f'{prefix}{self.ordering_field}', f'{prefix}{self.tiebreaker}']
+
+    def _seek_filter(self, cursor, descending):
+        lookup = 'lt' if descending else 'gt'
+        tiebreak = Q(**{f'{self.tiebreaker}__{lookup}': cursor['t']})
+        if self.ordering_field == self.tiebreaker:
+            return tiebreak
+        return Q(**{f'{self.ordering_field}__{lookup}': cursor['v']}) | (
+            Q(**{self.ordering_field: cursor['v']}) & tiebreak
+        )
+
+    def get_count(self, queryset, request):
+        mode = request.query_params.get(self.count_query_param)
+        if mode == 'exact':
+            return queryset.count()
+        if mode == 'estimate':
+            return self.estimate_count(queryset)
+        return None
+
+    def estimate_count(self, queryset):
+        """
+        Return an approximate row count without scanning the table, or ``None`` when the
+        database cannot provide one cheaply.
+        """
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        if not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            return max(int(row[0]), 0) if row else None
+        plan = json.loads(queryset.explain(format='json'))
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def encode_cursor(self, obj, reverse):
+        position = {
+            'v': str(self._value(obj, self.ordering_field)),
+            't': str(self._value(obj, self.tiebreaker)),
+            'r': reverse,
+        }
+        return urlsafe_b64encode(json.dumps(position).encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            return {'v': cursor['v'], 't': cursor['t'], 'r': bool(cursor['r'])}
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound('Invalid cursor.')
+
+    @staticmethod
+    def _value(obj, field):
+        # Rows may be model instances or values() dicts.
+        if isinstance(obj, dict):
+            return obj[field]
+        if field == 'pk':
+            return obj.pk
+        return getattr(obj, field)
+
+    def get_next_cursor(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_cursor(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_paginated_response(self, data):
+        """
+        Generate a cursor-paginated response using the standardized API response format.
+        """
+        next_cursor = self.get_next_cursor()
+        previous_cursor = self.get_previous_cursor()
+        return ApiResponse.success(
+            data=data,
+            meta={
+                'pagination': {
+                    'next': self._link(next_cursor),
+                    'previous': self._link(previous_cursor),
+                    'next_cursor': next_cursor,
+                    'previous_cursor': previous_cursor,
+                    'count': self.count,  # None unless ?count=exact|estimate
+                    'page_size': self.page_size,
+                }
+            }
+        )
+
+    @classmethod
+    def is_requested(cls, request):
+        """
+        Cursor mode is opted into with ``?pagination=cursor`` or by following a cursor link.
+        """
+        params = request.query_params
+        return params.get('pagination') == 'cursor' or cls.cursor_query_param in params
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Opaque cursor returned in the previous response.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.count_query_param,
+                'required': False,
+                'in': 'query',
+                'description': "Include a total count: 'exact' or 'estimate'.",
+                'schema': {'type': 'string', 'enum': ['exact', 'estimate']},
+            },
+        ]
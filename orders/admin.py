@@ -1,6 +1,7 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 
 from .models import Order, OrderItem
+from .services import recompute_order_totals
 
 
 class OrderItemInline(admin.TabularInline):
@@ -25,4 +26,14 @@ class OrderAdmin(admin.ModelAdmin):
     search_fields = ('user__username', 'order_id')
     ordering = ('-order_date',)
     inlines = [OrderItemInline]
-    readonly_fields = ('total_payable', 'order_id', 'order_date')  # Make these fields read-only
+    readonly_fields = ('subtotal', 'discount_amount', 'total_payable', 'order_id', 'order_date')  # Make these fields read-only
+
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        if not any(formset.has_changed() for formset in formsets):
+            return
+        # Items were edited inline; keep the stored totals in step.
+        try:
+            recompute_order_totals(form.instance)
+        except ValueError as e:
+            self.message_user(request, f"Totals were not recomputed: {e}", messages.WARNING)
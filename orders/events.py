@@ -0,0 +1,159 @@
+"""
+Append-only order event log.
+
+Every ``Order.save()`` records only the fields it changed, with their old
+and new values, and the user behind the request (``OrderEventMiddleware``).
+Events are written once the surrounding transaction commits, so rolled-back
+changes are never logged. With ``ORDER_EVENTS_BUFFERED`` they are pushed to a
+Redis list instead and ``orders.tasks.flush_order_events`` bulk-inserts them,
+so an order write costs one RPUSH rather than an extra INSERT. If Redis is
+unavailable, events are inserted directly.
+
+``order_timeline`` replays an order's events into its state after each
+change. Buffered events show up once they are flushed.
+"""
+import contextvars
+import json
+import logging
+
+import redis
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import OrderEvent
+
+logger = logging.getLogger(__name__)
+
+r = redis.from_url(settings.REDIS_URL)
+
+BUFFER_KEY = "orders:events"
+FLUSH_BATCH_SIZE = 1000
+
+_current_request = contextvars.ContextVar("order_event_request", default=None)
+
+
+class OrderEventMiddleware:
+    """
+    Makes the current request's user the actor of the order events it
+    causes. The user is read only when an event is recorded, so users
+    authenticated later by DRF are picked up too.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _current_request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _current_request.reset(token)
+
+
+def current_actor_id():
+    user = getattr(_current_request.get(), 'user', None)
+    if user is not None and user.is_authenticated:
+        return user.pk
+    return None
+
+
+def record_event(order_id, changes, kind=OrderEvent.Kind.CHANGED):
+    """
+    Log ``changes`` (``{attname: [old, new]}``) to order ``order_id``.
+    """
+    record_events([(order_id, changes)], kind)
+
+
+def record_events(changes, kind=OrderEvent.Kind.CHANGED):
+    """
+    Log several orders' changes, given as ``(order_id, changes)`` pairs,
+    after the current transaction commits.
+    """
+    actor_id = current_actor_id()
+    created = timezone.now()
+    # Encoded now, so the values logged are the ones saved.
+    rows = [
+        json.dumps({
+            "order_id": order_id,
+            "kind": kind,
+            "changes": order_changes,
+            "actor_id": actor_id,
+            "created": created,
+        }, cls=DjangoJSONEncoder)
+        for order_id, order_changes in changes
+    ]
+    if rows:
+        transaction.on_commit(lambda: _write(rows))
+
+
+def _write(rows):
+    if settings.ORDER_EVENTS_BUFFERED:
+        try:
+            r.rpush(BUFFER_KEY, *rows)
+            return
+        except redis.RedisError:
+            logger.warning("Could not buffer order events; writing them directly.", exc_info=True)
+    _insert(rows)
+
+
+def _insert(rows):
+    events = []
+    for row in rows:
+        data = json.loads(row)
+        data["created"] = parse_datetime(data["created"])
+        events.append(OrderEvent(**data))
+    OrderEvent.objects.bulk_create(events)
+
+
+def flush_events(batch_size=FLUSH_BATCH_SIZE):
+    """
+    Insert a batch of buffered events. A batch that fails is put back at
+    the head of the buffer for the next run.
+
+    :return: The number of events inserted.
+    """
+    rows = r.lpop(BUFFER_KEY, batch_size) or []
+    if not rows:
+        return 0
+    try:
+        _insert(rows)
+    except Exception:
+        logger.exception("Could not insert %s buffered order events.", len(rows))
+        r.lpush(BUFFER_KEY, *reversed(rows))
+        return 0
+    return len(rows)
+
+
+def order_timeline(order_id):
+    """
+    The order's events, oldest first, each with the order's logged fields
+    as they were right after it (``state``).
+    """
+    state = {}
+    timeline = []
+    for event in OrderEvent.objects.filter(order_id=order_id).order_by('created', 'id'):
+        state.update((name, new) for name, (old, new) in event.changes.items())
+        timeline.append({
+            "created": event.created,
+            "kind": event.kind,
+            "actor_id": event.actor_id,
+            "changes": event.changes,
+            "state": dict(state),
+        })
+    return timeline
+
+
+def order_state_at(order_id, when):
+    """
+    The order's logged fields as they were at ``when``, or ``None`` if it
+    had not been created yet.
+    """
+    state = None
+    for entry in order_timeline(order_id):
+        if entry["created"] > when:
+            break
+        state = entry["state"]
+    return state
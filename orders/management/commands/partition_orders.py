@@ -0,0 +1,61 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import NotSupportedError
+
+from orders import partitioning
+
+
+def month(value):
+    try:
+        return datetime.strptime(value, '%Y-%m').replace(tzinfo=dt_timezone.utc)
+    except ValueError:
+        raise CommandError(f'Expected a month as YYYY-MM, got "{value}".')
+
+
+class Command(BaseCommand):
+    help = (
+        'Manage the monthly partitions of the order tables (PostgreSQL only). '
+        'By default, creates the partitions of the coming months.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead',
+            type=int,
+            help='Months of partitions to create ahead of the current one (default: ORDER_PARTITIONS_AHEAD)',
+        )
+        parser.add_argument(
+            '--convert',
+            action='store_true',
+            help='Move existing, unpartitioned order tables to monthly partitions. Blocks writes while rows are copied.',
+        )
+        parser.add_argument(
+            '--keep-legacy',
+            action='store_true',
+            help='With --convert, keep the old tables as <table>_legacy instead of dropping them',
+        )
+        parser.add_argument(
+            '--detach-before',
+            type=month,
+            metavar='YYYY-MM',
+            help='Detach the partitions of months before this one',
+        )
+        parser.add_argument(
+            '--archive-schema',
+            help='With --detach-before, move detached partitions into this schema',
+        )
+
+    def handle(self, *args, **options):
+        try:
+            if options['convert']:
+                converted = partitioning.convert_to_partitioned(options['months_ahead'], options['keep_legacy'])
+                self.stdout.write(self.style.SUCCESS(f"Partitioned tables: {', '.join(converted) or 'none'}"))
+            if options['detach_before']:
+                detached = partitioning.detach_partitions(options['detach_before'], options['archive_schema'])
+                self.stdout.write(self.style.SUCCESS(f"Detached partitions: {', '.join(detached) or 'none'}"))
+            else:
+                created = partitioning.create_partitions(options['months_ahead'])
+                self.stdout.write(self.style.SUCCESS(f"Created partitions: {', '.join(created) or 'none'}"))
+        except (NotSupportedError, ValueError) as e:
+            raise CommandError(str(e))
@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0005_merge_20241215_0001'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='order',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(('payment_track_id', ''), _negated=True),
+                fields=('payment_track_id',),
+                name='unique_order_payment_track_id',
+            ),
+        ),
+    ]
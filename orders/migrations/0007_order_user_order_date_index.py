@@ -0,0 +1,20 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_order_unique_order_payment_track_id'),
+    ]
+
+    operations = [
+        # The composite index also covers lookups by user alone.
+        migrations.RemoveIndex(
+            model_name='order',
+            name='orders_orde_user_id_a87c6f_idx',
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-order_date'], name='orders_orde_user_id_304132_idx'),
+        ),
+    ]
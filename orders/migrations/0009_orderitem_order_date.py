@@ -0,0 +1,26 @@
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_order_dates(apps, schema_editor):
+    Order = apps.get_model('orders', 'Order')
+    OrderItem = apps.get_model('orders', 'OrderItem')
+    OrderItem.objects.filter(order_date__isnull=True).update(
+        order_date=Subquery(Order.objects.filter(pk=OuterRef('order_id')).values('order_date')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0008_orderevent'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='orderitem',
+            name='order_date',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.RunPython(copy_order_dates, migrations.RunPython.noop),
+    ]
@@ -2,17 +2,24 @@ import uuid
 from decimal import Decimal
 
 from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models import F, Sum
+from django.utils import timezone
 from django_prometheus.models import ExportModelOperationsMixin
-from simple_history.models import HistoricalRecords
 
 from coupons.models import Coupon
 from shop.models import Product
 from account.models import Address
 from django.core.exceptions import ValidationError
 
+from .reservations import release_stock
+
 User = get_user_model()
 
+# Tax charged on the items' subtotal.
+TAX_RATE = Decimal('0.09')
+
 
 class Order(ExportModelOperationsMixin('order'), models.Model):
     class Status(models.TextChoices):
@@ -50,7 +57,6 @@ class Order(ExportModelOperationsMixin('order'), models.Model):
     subtotal = models.DecimalField(max_digits=10, decimal_places=2, default=0.0)
     tax_amount = models.DecimalField(max_digits=10, decimal_places=2, default=0.0)
     total_payable = models.DecimalField(max_digits=10, decimal_places=2, default=0.0)
-    history = HistoricalRecords()
 
     # Define valid state transitions
     _transitions = {
@@ -66,14 +72,48 @@ class Order(ExportModelOperationsMixin('order'), models.Model):
         verbose_name = "Order"
         verbose_name_plural = "Orders"
         indexes = [
-            models.Index(fields=['user']),
+            # Serves a user's order list, newest first, without a sort.
+            models.Index(fields=['user', '-order_date']),
             models.Index(fields=['-order_date']),
         ]
+        constraints = [
+            # Gateway callbacks look orders up by trackId; orders that never
+            # reached the gateway keep a blank one and stay out of the index.
+            models.UniqueConstraint(
+                fields=['payment_track_id'],
+                condition=~models.Q(payment_track_id=''),
+                name='unique_order_payment_track_id',
+            ),
+        ]
         ordering = ["-order_date"]
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self._original_status = self.status
+        self._logged_values = self.get_logged_values()
+
+    def get_logged_values(self):
+        """
+        The values of the fields recorded in the order event log, leaving out
+        fields deferred by ``.only()``/``.defer()``.
+        """
+        return {
+            field.attname: self.__dict__[field.attname]
+            for field in self._meta.concrete_fields
+            if field.name not in OrderEvent.UNLOGGED_FIELDS and field.attname in self.__dict__
+        }
+
+    def get_changes(self):
+        """
+        Fields changed since the order was loaded or last saved, as
+        ``{attname: [old, new]}``.
+        """
+        old = self._logged_values
+        return {
+            name: [old.get(name), value]
+            for name, value in self.get_logged_values().items()
+            if name not in old or old[name] != value
+        }
 
     def clean(self):
         """
@@ -93,9 +133,20 @@ class Order(ExportModelOperationsMixin('order'), models.Model):
             self.restore_stock()
 
         self.clean()
+        adding = self._state.adding
         super().save(*args, **kwargs)
         self._original_status = self.status
 
+        from .events import record_event
+
+        if adding:
+            # A new order's event carries all of its initial values.
+            self._logged_values = {}
+        changes = self.get_changes()
+        if changes:
+            record_event(self.pk, changes, OrderEvent.Kind.CREATED if adding else OrderEvent.Kind.CHANGED)
+        self._logged_values = self.get_logged_values()
+
     def restore_stock(self):
         """
         Restore the stock for all items in a canceled order,
@@ -106,30 +157,39 @@ class Order(ExportModelOperationsMixin('order'), models.Model):
             # For now, we just prevent stock restoration
             return
 
-        for item in self.items.all():
-            product = item.product
-            # Use atomic update to prevent race conditions
-            product.stock = models.F('stock') + item.quantity
-            product.save(update_fields=['stock'])
+        release_stock(self.items.values_list('product_id', 'quantity'))
 
-    def get_total_cost_before_discount(self):
+    def get_total_cost_before_discount(self, items=None):
         """
         Calculate the total cost of all items in the order before applying any discounts.
 
+        Args:
+            items: The order items, when they are already in memory. Otherwise
+                the total is computed with a single SUM query.
+
         Returns:
             Decimal: The total cost of all order items.
         """
-        return sum(item.get_cost() for item in self.items.all())
+        if items is not None:
+            return sum((item.get_cost() for item in items), Decimal(0))
+        total = self.items.aggregate(
+            total=Sum(F('price') * F('quantity'), output_field=models.DecimalField(max_digits=12, decimal_places=2))
+        )['total']
+        return total or Decimal(0)
 
-    def get_discount(self):
+    def get_discount(self, total_cost=None):
         """
         Calculate the discount amount for the order based on the associated coupon.
 
+        Args:
+            total_cost: The items' total, if already known.
+
         Returns:
             Decimal: The discount amount. Returns 0 if no coupon is applied.
         """
-        total_cost = self.get_total_cost_before_discount()
         if self.coupon:
+            if total_cost is None:
+                total_cost = self.get_total_cost_before_discount()
             return total_cost * (self.coupon.discount / Decimal(100))
         return Decimal(0)
 
@@ -142,14 +202,19 @@ class Order(ExportModelOperationsMixin('order'), models.Model):
             Decimal: The total price, which is the total cost of all order items minus the discount.
         """
         total_cost = self.get_total_cost_before_discount()
-        return total_cost - self.get_discount()
+        return total_cost - self.get_discount(total_cost)
 
-    def calculate_total_payable(self):
+    def calculate_total_payable(self, subtotal=None):
         """
-        Calculates the final amount to be paid by the user.
+        Calculates the final amount to be paid by the user and stores the
+        totals on the order. Reads should use the stored fields.
+
+        Args:
+            subtotal: The items' total, if already known; otherwise it is
+                computed with a single SUM query.
         """
-        self.subtotal = self.get_total_cost_before_discount()
-        self.discount_amount = self.get_discount()
+        self.subtotal = self.get_total_cost_before_discount() if subtotal is None else subtotal
+        self.discount_amount = self.get_discount(self.subtotal)
         total = self.subtotal - self.discount_amount + self.shipping_cost + self.tax_amount
         self.total_payable = total
         return self.total_payable
@@ -165,6 +230,9 @@ class OrderItem(models.Model):
     product_sku = models.CharField(max_length=100, blank=True, null=True)
     price = models.DecimalField(max_digits=10, decimal_places=2)
     quantity = models.PositiveSmallIntegerField(default=1)
+    # A copy of the order's date, the partition key of the items table on
+    # PostgreSQL (see orders.partitioning).
+    order_date = models.DateTimeField(editable=False)
 
     class Meta:
         verbose_name = "Order Item"
@@ -175,8 +243,49 @@ class OrderItem(models.Model):
         ]
         ordering = ["order"]
 
+    def save(self, *args, **kwargs):
+        if self.order_date is None:
+            self.order_date = self.order.order_date
+        super().save(*args, **kwargs)
+
     def get_cost(self):
         return self.price * self.quantity
 
     def __str__(self):
         return f"Order Item: {self.product.name} (Order ID: {self.order.order_id})"
+
+
+class OrderEvent(models.Model):
+    """
+    One entry of an order's append-only change log: the fields a save
+    changed, as ``{attname: [old, new]}``, and the user behind it. Rows
+    outlive the order and the user, so neither is a database constraint.
+    """
+    class Kind(models.TextChoices):
+        CREATED = 'created', 'Created'
+        CHANGED = 'changed', 'Changed'
+
+    # ``updated`` changes on every save and says nothing the event time does not.
+    UNLOGGED_FIELDS = {'updated'}
+
+    order = models.ForeignKey(
+        Order, related_name='events', on_delete=models.DO_NOTHING, db_constraint=False
+    )
+    kind = models.CharField(max_length=10, choices=Kind.choices, default=Kind.CHANGED)
+    changes = models.JSONField(encoder=DjangoJSONEncoder)
+    actor = models.ForeignKey(
+        User, related_name='+', on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True
+    )
+    # Set when the change is made, not when a buffered event is inserted.
+    created = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        verbose_name = "Order Event"
+        verbose_name_plural = "Order Events"
+        indexes = [
+            models.Index(fields=['order', 'created']),
+        ]
+        ordering = ['created', 'id']
+
+    def __str__(self):
+        return f"Order Event: {self.kind} {', '.join(self.changes)} (Order ID: {self.order_id})"
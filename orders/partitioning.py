@@ -0,0 +1,331 @@
+"""
+Monthly range partitioning of the order tables on PostgreSQL.
+
+``orders_order`` and ``orders_orderitem`` are partitioned by ``order_date``
+(order items keep a copy of their order's date), one partition per calendar
+month in UTC, named ``<table>_pYYYY_MM``. Queries that filter or sort on
+``order_date`` (order lists, ``cancel_pending_orders``, reports) only read
+the months they need, and old months can be detached, and archived, whole.
+
+``convert_to_partitioned`` moves existing tables to this layout once
+(``manage.py partition_orders --convert``, in a maintenance window: it
+copies every row). Afterwards ``create_partitions``, run daily by
+``orders.tasks.create_order_partitions``, keeps ``ORDER_PARTITIONS_AHEAD``
+months ready, and ``detach_partitions`` takes old months out of both tables.
+Rows outside every monthly partition land in ``<table>_default``, so writes
+never fail for lack of a partition. ``create_partitions`` moves them into
+their month's partition when it creates it.
+
+Primary keys and unique indexes of a partitioned table must include the
+partition key, so on converted tables:
+
+* the primary keys become ``(<pk>, order_date)``. Order ids are random UUIDs
+  and item ids come from one sequence, so they stay unique.
+* the unique ``payment_track_id`` index becomes a plain one, kept for
+  lookups. Uniqueness is enforced by the primary key of
+  ``orders_order_track_id``, which a trigger keeps in step with the orders.
+  Its rows outlive detached partitions, so archived trackIds stay taken.
+* foreign keys pointing at ``orders_order`` (order items, shipments) are
+  dropped; Django still cascades deletes. New foreign keys to ``Order`` need
+  ``db_constraint=False``.
+"""
+import re
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import NotSupportedError, connection, transaction
+from django.utils import timezone
+
+from .models import Order, OrderItem
+
+PARTITIONED_MODELS = (Order, OrderItem)
+PARTITION_KEY = 'order_date'
+TRACK_ID_TABLE = 'orders_order_track_id'
+
+_PARTITION_SUFFIX = re.compile(r"_p(\d{4})_(\d{2})$")
+
+
+def month_start(value):
+    """The first instant, in UTC, of the month ``value`` falls in."""
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y_%m}"
+
+
+def default_partition_name(table):
+    return f"{table}_default"
+
+
+def _check_backend():
+    if connection.vendor != 'postgresql':
+        raise NotSupportedError("Order table partitioning requires PostgreSQL.")
+
+
+def _quote(name):
+    return connection.ops.quote_name(name)
+
+
+def is_partitioned(table):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(%s)", [table])
+        return cursor.fetchone() is not None
+
+
+def partitions(table):
+    """
+    The table's monthly partitions, as ``{month: name}``, oldest first.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(%s)",
+            [table],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    months = {}
+    for name in names:
+        match = _PARTITION_SUFFIX.search(name)
+        if match:
+            months[datetime(int(match[1]), int(match[2]), 1, tzinfo=dt_timezone.utc)] = name
+    return dict(sorted(months.items()))
+
+
+def _create_partition(cursor, table, month):
+    name = partition_name(table, month)
+    key = _quote(PARTITION_KEY)
+    default = _quote(default_partition_name(table))
+    # Bounds are built here, never taken from input.
+    lower, upper = month.isoformat(), add_months(month, 1).isoformat()
+    bounds = f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+    cursor.execute(f"SELECT 1 FROM {default} WHERE {key} >= '{lower}' AND {key} < '{upper}' LIMIT 1")
+    if cursor.fetchone() is None:
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {_quote(name)} PARTITION OF {_quote(table)} {bounds}")
+        return name
+    # Rows written while the month had no partition move out of the default
+    # one before the new partition takes their range.
+    cursor.execute(f"CREATE TABLE {_quote(name)} (LIKE {_quote(table)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+    cursor.execute(
+        f"WITH moved AS (DELETE FROM {default} WHERE {key} >= '{lower}' AND {key} < '{upper}' RETURNING *) "
+        f"INSERT INTO {_quote(name)} SELECT * FROM moved"
+    )
+    cursor.execute(f"ALTER TABLE {_quote(table)} ATTACH PARTITION {_quote(name)} {bounds}")
+    return name
+
+
+def _enforce_unique_track_ids(cursor):
+    """
+    Keep trackIds unique across partitions with a lookup table that a
+    trigger on ``orders_order`` fills; a duplicate raises a unique violation
+    from the trigger, as the old index did.
+    """
+    table = _quote(Order._meta.db_table)
+    lookup = _quote(TRACK_ID_TABLE)
+    function = _quote(f"{TRACK_ID_TABLE}_sync")
+    cursor.execute(
+        f"CREATE TABLE {lookup} (payment_track_id varchar(100) PRIMARY KEY, order_id uuid NOT NULL)"
+    )
+    cursor.execute(
+        f"INSERT INTO {lookup} SELECT payment_track_id, order_id FROM {table} WHERE payment_track_id <> ''"
+    )
+    cursor.execute(f"""
+        CREATE OR REPLACE FUNCTION {function}() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.payment_track_id <> '' THEN
+                DELETE FROM {lookup} WHERE payment_track_id = OLD.payment_track_id AND order_id = OLD.order_id;
+            END IF;
+            IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.payment_track_id <> '' THEN
+                INSERT INTO {lookup} (payment_track_id, order_id) VALUES (NEW.payment_track_id, NEW.order_id);
+            END IF;
+            RETURN NULL;
+        END
+        $$
+    """)
+    cursor.execute(
+        f"CREATE TRIGGER {_quote(TRACK_ID_TABLE + '_insert_delete')} AFTER INSERT OR DELETE ON {table} "
+        f"FOR EACH ROW EXECUTE FUNCTION {function}()"
+    )
+    # Django saves every column, so only actual changes touch the lookup.
+    cursor.execute(
+        f"CREATE TRIGGER {_quote(TRACK_ID_TABLE + '_update')} AFTER UPDATE OF payment_track_id ON {table} "
+        f"FOR EACH ROW WHEN (OLD.payment_track_id IS DISTINCT FROM NEW.payment_track_id) "
+        f"EXECUTE FUNCTION {function}()"
+    )
+
+
+def create_partitions(months_ahead=None, start=None):
+    """
+    Create the missing monthly partitions from the month of ``start``
+    (default: now) to ``months_ahead`` months after it, on the tables that
+    are partitioned.
+
+    :return: The names of the partitions created.
+    """
+    _check_backend()
+    if months_ahead is None:
+        months_ahead = settings.ORDER_PARTITIONS_AHEAD
+    first = month_start(start or timezone.now())
+    created = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        for model in PARTITIONED_MODELS:
+            table = model._meta.db_table
+            if not is_partitioned(table):
+                continue
+            existing = partitions(table)
+            for offset in range(months_ahead + 1):
+                month = add_months(first, offset)
+                if month not in existing:
+                    created.append(_create_partition(cursor, table, month))
+    return created
+
+
+def _convert_table(cursor, model, months_ahead):
+    table = model._meta.db_table
+    legacy = f"{table}_legacy"
+    pk = model._meta.pk.column
+
+    # Read before the rename, so the definitions name the new table.
+    cursor.execute(
+        "SELECT conrelid::regclass::text, conname FROM pg_constraint "
+        "WHERE contype = 'f' AND confrelid = %s::regclass",
+        [table],
+    )
+    referencing = cursor.fetchall()
+    cursor.execute(
+        "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+        "WHERE contype = 'f' AND conrelid = %s::regclass",
+        [table],
+    )
+    foreign_keys = cursor.fetchall()
+    cursor.execute(
+        "SELECT conname FROM pg_constraint WHERE contype = 'p' AND conrelid = %s::regclass",
+        [table],
+    )
+    primary_key = cursor.fetchone()[0]
+    cursor.execute(
+        "SELECT indexrelid::regclass::text, pg_get_indexdef(indexrelid) FROM pg_index "
+        "WHERE indrelid = %s::regclass "
+        "AND NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conindid = indexrelid)",
+        [table],
+    )
+    indexes = cursor.fetchall()
+    cursor.execute("SELECT pg_get_serial_sequence(%s, %s)", [table, pk])
+    sequence = cursor.fetchone()[0]
+
+    # A partitioned table cannot be referenced by a key that leaves out the
+    # partition key.
+    for other, name in referencing:
+        cursor.execute(f"ALTER TABLE {other} DROP CONSTRAINT {_quote(name)}")
+
+    # Free the names the new table takes over.
+    cursor.execute(f"ALTER TABLE {_quote(table)} RENAME TO {_quote(legacy)}")
+    cursor.execute(f"ALTER TABLE {_quote(legacy)} RENAME CONSTRAINT {_quote(primary_key)} TO {_quote(legacy + '_pkey')}")
+    for name, _ in foreign_keys:
+        cursor.execute(f"ALTER TABLE {_quote(legacy)} DROP CONSTRAINT {_quote(name)}")
+    for name, _ in indexes:
+        cursor.execute(f"DROP INDEX {name}")
+    if sequence:
+        cursor.execute(f"ALTER SEQUENCE {sequence} RENAME TO {_quote(f'{legacy}_{pk}_seq')}")
+
+    cursor.execute(
+        f"CREATE TABLE {_quote(table)} (LIKE {_quote(legacy)} "
+        f"INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING STORAGE INCLUDING COMMENTS) "
+        f"PARTITION BY RANGE ({_quote(PARTITION_KEY)})"
+    )
+    cursor.execute(f"CREATE TABLE {_quote(default_partition_name(table))} PARTITION OF {_quote(table)} DEFAULT")
+    cursor.execute(f"SELECT min({_quote(PARTITION_KEY)}), max({_quote(PARTITION_KEY)}) FROM {_quote(legacy)}")
+    oldest, newest = cursor.fetchone()
+    now = month_start(timezone.now())
+    month = month_start(oldest) if oldest else now
+    last = add_months(max(month_start(newest), now) if newest else now, months_ahead)
+    while month <= last:
+        _create_partition(cursor, table, month)
+        month = add_months(month, 1)
+
+    cursor.execute(f"INSERT INTO {_quote(table)} SELECT * FROM {_quote(legacy)}")
+
+    cursor.execute(
+        f"ALTER TABLE {_quote(table)} ADD CONSTRAINT {_quote(primary_key)} "
+        f"PRIMARY KEY ({_quote(pk)}, {_quote(PARTITION_KEY)})"
+    )
+    for _, definition in indexes:
+        cursor.execute(definition.replace("CREATE UNIQUE INDEX", "CREATE INDEX", 1))
+    for name, definition in foreign_keys:
+        cursor.execute(f"ALTER TABLE {_quote(table)} ADD CONSTRAINT {_quote(name)} {definition}")
+    if sequence:
+        # Identity columns are not allowed on partitioned tables before
+        # PostgreSQL 17, so ids come from a plain sequence instead.
+        sequence = _quote(f"{table}_{pk}_seq")
+        cursor.execute(f"CREATE SEQUENCE {sequence} OWNED BY {_quote(table)}.{_quote(pk)}")
+        cursor.execute(f"SELECT setval('{sequence}', COALESCE(max({_quote(pk)}), 0) + 1, false) FROM {_quote(table)}")
+        cursor.execute(f"ALTER TABLE {_quote(table)} ALTER COLUMN {_quote(pk)} SET DEFAULT nextval('{sequence}')")
+    cursor.execute(f"ANALYZE {_quote(table)}")
+    return legacy
+
+
+def convert_to_partitioned(months_ahead=None, keep_legacy=False):
+    """
+    Move the order tables that are not partitioned yet to monthly
+    partitions, in one transaction. Every row is copied, so writes to the
+    tables are blocked until it commits.
+
+    :param keep_legacy: Keep the old tables as ``<table>_legacy`` instead of
+        dropping them.
+    :return: The names of the tables converted.
+    """
+    _check_backend()
+    if months_ahead is None:
+        months_ahead = settings.ORDER_PARTITIONS_AHEAD
+    converted = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Tables with pending deferred foreign key checks cannot be altered.
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        for model in PARTITIONED_MODELS:
+            table = model._meta.db_table
+            if is_partitioned(table):
+                continue
+            legacy = _convert_table(cursor, model, months_ahead)
+            if model is Order:
+                _enforce_unique_track_ids(cursor)
+            if not keep_legacy:
+                cursor.execute(f"DROP TABLE {_quote(legacy)}")
+            converted.append(table)
+        cursor.execute("SET CONSTRAINTS ALL DEFERRED")
+    return converted
+
+
+def detach_partitions(before, archive_schema=None):
+    """
+    Detach the monthly partitions of months before the month of ``before``
+    from the order tables. Their rows leave the tables but are kept, in the
+    ``archive_schema`` schema when one is given.
+
+    :raises ValueError: If ``before`` is later than the current month.
+    :return: The names of the partitions detached.
+    """
+    _check_backend()
+    before = month_start(before)
+    if before > month_start(timezone.now()):
+        raise ValueError("Only partitions of past months can be detached.")
+    detached = []
+    with transaction.atomic(), connection.cursor() as cursor:
+        if archive_schema:
+            cursor.execute(f"CREATE SCHEMA IF NOT EXISTS {_quote(archive_schema)}")
+        for model in PARTITIONED_MODELS:
+            table = model._meta.db_table
+            for month, name in partitions(table).items():
+                if month >= before:
+                    break
+                cursor.execute(f"ALTER TABLE {_quote(table)} DETACH PARTITION {_quote(name)}")
+                if archive_schema:
+                    cursor.execute(f"ALTER TABLE {_quote(name)} SET SCHEMA {_quote(archive_schema)}")
+                detached.append(name)
+    return detached
@@ -0,0 +1,87 @@
+"""
+Stock reservation for checkout.
+
+Stock is taken with one conditional ``UPDATE ... SET stock = stock - n WHERE
+stock >= n`` per SKU. The row lock lasts for that statement only, so
+concurrent checkouts of a hot product no longer queue behind each other's
+order-creation transactions, and stock can never go negative.
+
+A reservation lives as long as its pending order: ``cancel_pending_orders``
+cancels orders still unpaid after ``RESERVATION_TIMEOUT`` and cancelling an
+order hands its stock back through ``release_stock``.
+"""
+from collections import Counter
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Value, When
+
+from shop.models import Product
+
+# How long a pending order may hold its stock before it is cancelled.
+RESERVATION_TIMEOUT = timedelta(minutes=20)
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_id):
+        super().__init__(f"Not enough stock for product {product_id}.")
+        self.product_id = product_id
+
+
+def _merge(quantities):
+    merged = Counter()
+    for product_id, quantity in quantities:
+        merged[product_id] += quantity
+    # A fixed order keeps concurrent callers inside an outer transaction from
+    # deadlocking on each other's rows.
+    return sorted(merged.items(), key=lambda pair: str(pair[0]))
+
+
+def reserve_stock(quantities):
+    """
+    Atomically take stock for ``(product_id, quantity)`` pairs.
+
+    Either every SKU is reserved or none is: when one of them runs short the
+    ones already taken are released and ``InsufficientStock`` is raised.
+
+    :return: The reserved ``(product_id, quantity)`` pairs, to be passed to
+        ``release_stock`` if the order cannot be completed.
+    """
+    reserved = []
+    for product_id, quantity in _merge(quantities):
+        updated = Product.objects.filter(
+            product_id=product_id, stock__gte=quantity
+        ).update(stock=F("stock") - quantity)
+        if not updated:
+            release_stock(reserved)
+            raise InsufficientStock(product_id)
+        reserved.append((product_id, quantity))
+    return reserved
+
+
+def release_stock(quantities):
+    """
+    Give reserved stock back for ``(product_id, quantity)`` pairs, with one
+    aggregated statement however many orders the pairs come from.
+    """
+    merged = _merge(quantities)
+    if not merged:
+        return
+    # Soft-deleted products get their stock back too.
+    if connection.vendor == "postgresql":
+        table = connection.ops.quote_name(Product._meta.db_table)
+        values = ", ".join(["(%s::uuid, %s)"] * len(merged))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {table} SET stock = {table}.stock + released.quantity "
+                f"FROM (VALUES {values}) AS released (product_id, quantity) "
+                f"WHERE {table}.product_id = released.product_id",
+                [value for product_id, quantity in merged for value in (str(product_id), quantity)],
+            )
+    else:
+        Product.all_objects.filter(
+            product_id__in=[product_id for product_id, _ in merged]
+        ).update(stock=F("stock") + Case(
+            *[When(product_id=product_id, then=Value(quantity)) for product_id, quantity in merged],
+            output_field=IntegerField(),
+        ))
@@ -1,13 +1,14 @@
 from decimal import Decimal
 from django.db import transaction
+from django.db.models import F
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 
 from account.models import Address
-from cart.cart import Cart
+from cart.cart import get_cart
 from coupons.models import Coupon
-from orders.models import Order, OrderItem
-from shop.models import Product
+from orders.models import TAX_RATE, Order, OrderItem
+from orders.reservations import InsufficientStock, release_stock, reserve_stock
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
@@ -45,6 +46,29 @@ class OrderSerializer(serializers.ModelSerializer):
         )
 
 
+class OrderSummarySerializer(serializers.ModelSerializer):
+    """
+    Lean serializer for order lists. Items are left out unless the view
+    passes ``expand_items`` in the context (``?expand=items``).
+    """
+    items = OrderItemSerializer(many=True, read_only=True)
+    status = serializers.CharField(source='get_status_display')
+    payment_status = serializers.CharField(source='get_payment_status_display')
+
+    class Meta:
+        model = Order
+        fields = (
+            'order_id', 'order_date', 'updated', 'status', 'payment_status',
+            'currency', 'shipping_status', 'total_payable', 'items'
+        )
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.context.get('expand_items'):
+            fields.pop('items')
+        return fields
+
+
 class OrderCreateSerializer(serializers.Serializer):
     """
     Serializer for creating a new order.
@@ -68,7 +92,7 @@ class OrderCreateSerializer(serializers.Serializer):
         """
         Validate coupon against cart details.
         """
-        cart = Cart(self.context['request'])
+        cart = get_cart(self.context['request'])
         coupon_code = data.get('coupon_code')
 
         if not coupon_code:
@@ -96,7 +120,7 @@ class OrderCreateSerializer(serializers.Serializer):
         """
         Create and save the order and its items from the cart.
         """
-        cart = Cart(self.context['request'])
+        cart = get_cart(self.context['request'], durable=True)
         if len(cart) == 0:
             raise ValidationError('Your cart is empty.')
 
@@ -105,80 +129,74 @@ class OrderCreateSerializer(serializers.Serializer):
         coupon = validated_data.get('coupon')
         user = self.context['request'].user
 
-        with transaction.atomic():
-            # Lock products before processing to prevent race conditions.
-            product_ids = [item['product'].product_id for item in cart]
-            locked_products = list(Product.objects.select_for_update().filter(product_id__in=product_ids))
+        items = cart.snapshot.items
+        products = {
+            item['product'].product_id: item['product']
+            for item in items if item['product'].deleted_at is None
+        }
+        if len(products) != len(items):
+            raise ValidationError("Some products in your cart could not be found or are no longer available.")
 
-            if len(locked_products) != len(product_ids):
-                raise ValidationError("Some products in your cart could not be found or are no longer available.")
-
-            locked_products_map = {p.product_id: p for p in locked_products}
-
-            # Re-validate coupon inside the transaction to prevent race conditions
-            if coupon:
-                locked_coupon = Coupon.objects.select_for_update().get(pk=coupon.pk)
-                if not locked_coupon.is_valid() or locked_coupon.usage_count >= locked_coupon.max_usage:
-                    raise ValidationError({'coupon_code': 'This coupon is no longer valid.'})
-
-                # Set coupon on the cart model for discount calculation
-                cart.cart.coupon = locked_coupon
-                cart.cart.save()
-
-            # Create the order
-            order = Order.objects.create(
-                user=user,
-                address=address,
-                coupon=coupon,
-                discount_amount=cart.get_discount() if coupon else 0
+        # Take the stock first, one short conditional update per product, so
+        # the transaction below holds no product locks.
+        try:
+            reserved = reserve_stock(
+                (item['product'].product_id, item['quantity']) for item in items
             )
+        except InsufficientStock as e:
+            raise ValidationError(f"Not enough stock for {products[e.product_id].name}.")
 
-            if coupon:
-                # Increment usage count on the locked instance
-                locked_coupon.increment_usage_count()
-
-            # Create order items and update product stock
-            items_to_create = []
-            products_to_update = []
-
-            for item in cart:
-                # Use the locked product instance for fresh data
-                product = locked_products_map.get(item['product'].product_id)
-
-                # Re-validate stock and price at the moment of purchase
-                if product.stock < item['quantity']:
-                    raise ValidationError(f"Not enough stock for {product.name}.")
-                if item['price'] != product.price:
-                    raise ValidationError(
-                        f"The price of {product.name} has changed. Please review your cart and try again."
-                    )
-
-                product.stock -= item['quantity']
-                products_to_update.append(product)
-
-                items_to_create.append(
-                    OrderItem(
-                        order=order,
-                        product=product,
-                        product_name=product.name,
-                        product_sku=product.sku,
-                        quantity=item['quantity'],
-                        price=product.price
-                    )
+        try:
+            with transaction.atomic():
+                if coupon:
+                    # Claim a use of the coupon only while it is under its limit.
+                    claimed = Coupon.objects.filter(
+                        pk=coupon.pk, usage_count__lt=F('max_usage')
+                    ).update(usage_count=F('usage_count') + 1)
+                    if not claimed or not coupon.is_valid():
+                        raise ValidationError({'coupon_code': 'This coupon is no longer valid.'})
+
+                    # Set coupon on the cart model for discount calculation
+                    cart.cart.coupon = coupon
+                    cart.cart.save()
+
+                # Create the order
+                order = Order.objects.create(
+                    user=user,
+                    address=address,
+                    coupon=coupon,
+                    discount_amount=cart.get_discount() if coupon else 0
                 )
 
-            OrderItem.objects.bulk_create(items_to_create)
-            Product.objects.bulk_update(products_to_update, ['stock'])
+                items_to_create = []
+                for item in items:
+                    product = products[item['product'].product_id]
+                    items_to_create.append(
+                        OrderItem(
+                            order=order,
+                            product=product,
+                            product_name=product.name,
+                            product_sku=product.sku,
+                            quantity=item['quantity'],
+                            price=product.price,
+                            order_date=order.order_date,
+                        )
+                    )
+                OrderItem.objects.bulk_create(items_to_create)
 
-            # Set shipping and tax (assuming fixed values for now)
-            order.shipping_cost = Decimal('15.00')
-            order.tax_amount = order.get_total_cost_before_discount() * Decimal('0.09')
+                # Set shipping and tax (assuming fixed values for now)
+                subtotal = order.get_total_cost_before_discount(items_to_create)
+                order.shipping_cost = Decimal('15.00')
+                order.tax_amount = subtotal * TAX_RATE
 
-            # Calculate final order total
-            order.calculate_total_payable()
-            order.save()
+                # Calculate final order total
+                order.calculate_total_payable(subtotal)
+                order.save()
 
-            # Clear the cart
-            cart.clear()
+                # Clear the cart
+                cart.clear()
+        except Exception:
+            release_stock(reserved)
+            raise
 
-            return order
+        return order
@@ -1,23 +1,52 @@
 import logging
 import sys
 
-from django.db import transaction
-
-from .models import Order
-from .serializers import OrderCreateSerializer
+from .models import TAX_RATE, Order
+from .serializers import OrderCreateSerializer, OrderSummarySerializer
 from .tasks import send_order_confirmation_email
 
 logger = logging.getLogger(__name__)
 
 
 def get_user_orders(user):
+    # Items carry their own product snapshot, so products are not loaded.
+    orders = Order.objects.select_related("user", "address", "coupon").prefetch_related("items")
     if user.is_staff:
-        return Order.objects.prefetch_related("items__product", "user", "address", "coupon")
-    return Order.objects.filter(user=user).prefetch_related(
-        "items__product", "user", "address", "coupon"
-    )
+        return orders
+    return orders.filter(user=user)
+
+
+def get_order_summaries(user, expand_items=False):
+    """
+    Orders for the list endpoint: only the columns ``OrderSummarySerializer``
+    reads, plus the items when they are expanded.
+    """
+    fields = [name for name in OrderSummarySerializer.Meta.fields if name != 'items']
+    orders = Order.objects.only(*fields)
+    if not user.is_staff:
+        orders = orders.filter(user=user)
+    if expand_items:
+        orders = orders.prefetch_related("items")
+    return orders
+
+
+def recompute_order_totals(order):
+    """
+    Refresh an unpaid order's stored totals and tax after its items changed,
+    with one SUM over the items.
+
+    :raises ValueError: If the order is no longer pending payment; its
+        amount is final.
+    """
+    if order.status != Order.Status.PENDING or order.payment_status == Order.PaymentStatus.SUCCESS:
+        raise ValueError("The totals of an order are final once it is paid.")
+    subtotal = order.get_total_cost_before_discount()
+    order.tax_amount = subtotal * TAX_RATE
+    order.calculate_total_payable(subtotal)
+    order.save(update_fields=['subtotal', 'discount_amount', 'tax_amount', 'total_payable', 'updated'])
+    return order
+
 
-@transaction.atomic
 def create_order(request, validated_data):
     serializer = OrderCreateSerializer(data=validated_data, context={'request': request})
     serializer.is_valid(raise_exception=True)
@@ -1,14 +1,20 @@
-from datetime import timedelta
-
 from celery import shared_task
 from celery.utils.log import get_task_logger
+from django.conf import settings
 from django.core.mail import send_mail
+from django.db import connection, transaction
 from django.utils import timezone
 
-from .models import Order
+from . import events, partitioning
+from .models import Order, OrderItem
+from .reservations import RESERVATION_TIMEOUT, release_stock
 
 logger = get_task_logger(__name__)
 
+# Pending orders cancelled per transaction by cancel_pending_orders.
+CANCEL_BATCH_SIZE = 500
+
+
 @shared_task(bind=True, autoretry_for=(Exception,), retry_kwargs={'max_retries': 3, 'countdown': 5})
 def send_order_confirmation_email(self, order_pk):
     """
@@ -33,14 +39,69 @@ def send_order_confirmation_email(self, order_pk):
 
 
 @shared_task
-def cancel_pending_orders():
+def cancel_pending_orders(batch_size=CANCEL_BATCH_SIZE):
     """
     Task to cancel pending orders that have not been paid for within a certain timeframe.
+    Cancelling releases the stock reserved for them at checkout.
+
+    Orders are cancelled in chunks, each in its own short transaction. Rows
+    locked by a concurrent payment or by another run are skipped, and every
+    chunk restores stock, updates statuses and logs the changes in one
+    statement each.
     """
-    time_threshold = timezone.now() - timedelta(minutes=20)
-    pending_orders = Order.objects.filter(status=Order.Status.PENDING, order_date__lte=time_threshold)
+    time_threshold = timezone.now() - RESERVATION_TIMEOUT
+    canceled = 0
+    while True:
+        with transaction.atomic():
+            orders = list(
+                Order.objects.select_for_update(skip_locked=True)
+                .filter(status=Order.Status.PENDING, order_date__lte=time_threshold)
+                .order_by('order_date')[:batch_size]
+            )
+            if not orders:
+                break
+            release_stock(
+                OrderItem.objects.filter(order__in=orders).values_list('product_id', 'quantity')
+            )
+            now = timezone.now()
+            Order.objects.filter(pk__in=[order.pk for order in orders]).update(
+                status=Order.Status.CANCELED, updated=now
+            )
+            events.record_events(
+                [(order.pk, {'status': [order.status, Order.Status.CANCELED]}) for order in orders]
+            )
+        canceled += len(orders)
+        logger.info(f"Canceled {len(orders)} pending orders")
+        if len(orders) < batch_size:
+            break
+    return canceled
 
-    for order in pending_orders:
-        order.status = Order.Status.CANCELED
-        order.save()
-        logger.info(f"Canceled pending order {order.order_id}")
+
+@shared_task
+def flush_order_events():
+    """
+    Insert the order events buffered in Redis since the last run, batch by
+    batch until none are left.
+    """
+    if not settings.ORDER_EVENTS_BUFFERED:
+        return 0
+    flushed = 0
+    while True:
+        count = events.flush_events()
+        flushed += count
+        if count < events.FLUSH_BATCH_SIZE:
+            return flushed
+
+
+@shared_task
+def create_order_partitions():
+    """
+    Keep ``ORDER_PARTITIONS_AHEAD`` months of order partitions ready, once
+    the order tables are partitioned.
+    """
+    if connection.vendor != 'postgresql':
+        return 0
+    created = partitioning.create_partitions()
+    if created:
+        logger.info(f"Created order partitions: {', '.join(created)}")
+    return len(created)
@@ -0,0 +1,130 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from fakeredis import FakeRedis
+from rest_framework.test import APITestCase
+
+from account.factories import UserFactory
+from orders import events
+from orders.models import Order, OrderEvent
+from orders.tasks import flush_order_events
+
+
+class OrderEventLogTests(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+
+    def test_save_logs_only_changed_fields(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            order.payment_track_id = 'track-1'
+            order.save()
+            order.save()
+
+        created, changed = OrderEvent.objects.filter(order=order)
+        self.assertEqual(created.kind, OrderEvent.Kind.CREATED)
+        self.assertEqual(created.changes['status'], [None, 'pending'])
+        self.assertNotIn('updated', created.changes)
+        self.assertEqual(changed.kind, OrderEvent.Kind.CHANGED)
+        self.assertEqual(changed.changes, {'payment_track_id': ['', 'track-1']})
+
+    def test_rolled_back_changes_are_not_logged(self):
+        order = Order.objects.create(user=self.user)
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            order.status = Order.Status.PAID
+            order.save()
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(OrderEvent.objects.exists())
+
+    def test_deferred_fields_are_not_loaded(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.create(user=self.user)
+        with self.assertNumQueries(1):
+            order = Order.objects.only('order_id', 'status').get()
+            self.assertEqual(order.get_changes(), {})
+
+    def test_actor_is_the_request_user(self):
+        request = RequestFactory().get('/')
+        request.user = self.user
+
+        def view(request):
+            with self.captureOnCommitCallbacks(execute=True):
+                return Order.objects.create(user=self.user)
+
+        order = events.OrderEventMiddleware(view)(request)
+        self.assertEqual(OrderEvent.objects.get(order=order).actor_id, self.user.pk)
+        self.assertIsNone(events.current_actor_id())
+
+    def test_timeline_replays_changes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(user=self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            order.status = Order.Status.PAID
+            order.save()
+        paid_at = OrderEvent.objects.latest('created').created
+        with self.captureOnCommitCallbacks(execute=True):
+            order.status = Order.Status.PROCESSING
+            order.shipping_status = 'registered'
+            order.save()
+
+        timeline = events.order_timeline(order.pk)
+
+        self.assertEqual([entry['kind'] for entry in timeline], ['created', 'changed', 'changed'])
+        self.assertEqual(timeline[-1]['state']['status'], 'processing')
+        self.assertEqual(timeline[-1]['state']['shipping_status'], 'registered')
+        self.assertEqual(events.order_state_at(order.pk, paid_at)['status'], 'paid')
+        self.assertIsNone(events.order_state_at(order.pk, paid_at - timedelta(days=1)))
+
+
+@override_settings(ORDER_EVENTS_BUFFERED=True)
+class BufferedOrderEventTests(TestCase):
+    def setUp(self):
+        self.redis = FakeRedis()
+        patcher = patch('orders.events.r', self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = UserFactory()
+
+    def test_events_are_buffered_until_flushed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(user=self.user)
+            order.status = Order.Status.PAID
+            order.save()
+
+        self.assertFalse(OrderEvent.objects.exists())
+        self.assertEqual(self.redis.llen(events.BUFFER_KEY), 2)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(flush_order_events(), 2)
+        self.assertEqual(self.redis.llen(events.BUFFER_KEY), 0)
+        self.assertEqual(
+            [event.kind for event in OrderEvent.objects.filter(order=order)],
+            [OrderEvent.Kind.CREATED, OrderEvent.Kind.CHANGED],
+        )
+
+    def test_failed_flush_keeps_the_buffer(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.create(user=self.user)
+        with patch.object(OrderEvent.objects, 'bulk_create', side_effect=Exception):
+            self.assertEqual(events.flush_events(), 0)
+        self.assertEqual(self.redis.llen(events.BUFFER_KEY), 1)
+        self.assertEqual(events.flush_events(), 1)
+
+
+class OrderTimelineAPITests(APITestCase):
+    def test_timeline_is_staff_only(self):
+        owner = UserFactory()
+        with self.captureOnCommitCallbacks(execute=True):
+            order = Order.objects.create(user=owner)
+        url = reverse('api-v1:order-timeline', kwargs={'pk': order.pk})
+
+        self.client.force_authenticate(owner)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+        self.client.force_authenticate(UserFactory(is_staff=True))
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['state']['status'], 'pending')
@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+
+from account.factories import UserFactory
+from orders.models import Order, OrderItem
+from shop.factories import ProductFactory
+
+
+class OrderListTest(APITestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.client.force_authenticate(user=self.user)
+        product = ProductFactory()
+        self.orders = []
+        for days in range(3):
+            order = Order.objects.create(user=self.user)
+            Order.objects.filter(pk=order.pk).update(order_date=timezone.now() - timedelta(days=days))
+            OrderItem.objects.create(order=order, product=product, product_name='p', price=10, quantity=days + 1)
+            self.orders.append(order)
+        Order.objects.create(user=UserFactory())
+        self.url = reverse('api-v1:order-list')
+
+    def test_orders_are_listed_newest_first_with_a_cursor(self):
+        response = self.client.get(self.url, {'page_size': 2})
+
+        self.assertEqual([order['order_id'] for order in response.data['data']],
+                         [str(order.order_id) for order in self.orders[:2]])
+        self.assertNotIn('items', response.data['data'][0])
+
+        response = self.client.get(response.data['meta']['pagination']['next'])
+        self.assertEqual([order['order_id'] for order in response.data['data']], [str(self.orders[2].order_id)])
+        self.assertIsNone(response.data['meta']['pagination']['next'])
+
+    def test_items_are_expanded_on_request(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {'expand': 'items'})
+
+        self.assertEqual([len(order['items']) for order in response.data['data']], [1, 1, 1])
+        self.assertEqual(response.data['data'][2]['items'][0]['quantity'], 3)
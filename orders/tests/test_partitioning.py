@@ -0,0 +1,143 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from django.utils import timezone
+
+from account.factories import UserFactory
+from orders import partitioning
+from orders.models import Order, OrderItem
+from orders.tasks import create_order_partitions
+from shop.factories import ProductFactory
+
+
+class PartitionMonthTests(TestCase):
+    def test_month_start_is_in_utc(self):
+        tehran = datetime.fromisoformat('2026-11-01T02:00:00+03:30')
+        self.assertEqual(partitioning.month_start(tehran), datetime(2026, 10, 1, tzinfo=dt_timezone.utc))
+
+    def test_add_months_crosses_years(self):
+        month = datetime(2026, 11, 1, tzinfo=dt_timezone.utc)
+        self.assertEqual(partitioning.add_months(month, 2), datetime(2027, 1, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(partitioning.add_months(month, -11), datetime(2025, 12, 1, tzinfo=dt_timezone.utc))
+
+    def test_partition_name(self):
+        month = datetime(2027, 1, 1, tzinfo=dt_timezone.utc)
+        self.assertEqual(partitioning.partition_name('orders_order', month), 'orders_order_p2027_01')
+
+
+class OrderPartitionTests(TestCase):
+    def test_items_carry_the_order_date(self):
+        order = Order.objects.create(user=UserFactory())
+        item = OrderItem.objects.create(
+            order=order, product=ProductFactory(), product_name='p', price=10, quantity=1
+        )
+        item.refresh_from_db()
+        self.assertEqual(item.order_date, order.order_date)
+
+    def test_command_requires_postgresql(self):
+        with self.assertRaisesMessage(CommandError, 'requires PostgreSQL'):
+            call_command('partition_orders', stdout=StringIO())
+
+    def test_command_rejects_bad_months(self):
+        with self.assertRaisesMessage(CommandError, 'YYYY-MM'):
+            call_command('partition_orders', '--detach-before', '2026-13', stdout=StringIO())
+
+    def test_task_skips_other_databases(self):
+        self.assertEqual(create_order_partitions(), 0)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Partitioning requires PostgreSQL.')
+class PostgresPartitioningTests(TestCase):
+    def setUp(self):
+        self.user = UserFactory()
+        self.product = ProductFactory()
+        self.now = timezone.now()
+        self.old_order = self.create_order(months_ago=3)
+        self.order = self.create_order()
+
+    def create_order(self, months_ago=0, **fields):
+        order = Order.objects.create(user=self.user, **fields)
+        order_date = partitioning.add_months(partitioning.month_start(self.now), -months_ago) + timedelta(days=1)
+        if months_ago:
+            Order.objects.filter(pk=order.pk).update(order_date=order_date)
+            order.refresh_from_db()
+        OrderItem.objects.create(order=order, product=self.product, product_name='p', price=10, quantity=1)
+        return order
+
+    def fetch(self, sql, params=()):
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+    def constraints(self, table):
+        return set(self.fetch(
+            "SELECT conname, contype FROM pg_constraint WHERE conrelid = %s::regclass AND contype <> 'p'", [table]
+        ))
+
+    def indexes(self, table):
+        return {row[0] for row in self.fetch("SELECT indexname FROM pg_indexes WHERE tablename = %s", [table])}
+
+    def test_conversion_keeps_rows_indexes_and_foreign_keys(self):
+        before = {table: (self.constraints(table), self.indexes(table)) for table in ('orders_order', 'orders_orderitem')}
+        referencing = set(self.fetch(
+            "SELECT conname, contype FROM pg_constraint WHERE confrelid = 'orders_order'::regclass"
+        ))
+        last_item_id = OrderItem.objects.latest('id').id
+
+        self.assertEqual(partitioning.convert_to_partitioned(months_ahead=2), ['orders_order', 'orders_orderitem'])
+
+        self.assertTrue(partitioning.is_partitioned('orders_order'))
+        self.assertEqual(set(Order.objects.values_list('pk', flat=True)), {self.old_order.pk, self.order.pk})
+        self.assertEqual(OrderItem.objects.count(), 2)
+        self.assertEqual(len(partitioning.partitions('orders_order')), 6)
+        self.assertEqual(len(partitioning.partitions('orders_orderitem')), 6)
+        for table, (constraints, indexes) in before.items():
+            self.assertEqual(self.indexes(table), indexes)
+            # Only foreign keys pointing at the orders are dropped.
+            self.assertEqual(self.constraints(table), constraints - referencing)
+        self.assertEqual(self.fetch("SELECT to_regclass('orders_order_legacy')"), [(None,)])
+
+        item = OrderItem.objects.create(order=self.order, product=self.product, product_name='p', price=10, quantity=1)
+        self.assertGreater(item.id, last_item_id)
+
+    def test_track_ids_stay_unique(self):
+        self.order.payment_track_id = 'track-1'
+        self.order.save()
+        partitioning.convert_to_partitioned()
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            self.create_order(months_ago=3, payment_track_id='track-1')
+        self.order.payment_track_id = 'track-2'
+        self.order.save()
+        self.create_order(payment_track_id='track-1')
+
+    def test_rows_without_a_partition_go_to_the_default_one(self):
+        partitioning.convert_to_partitioned(months_ahead=0)
+        future = partitioning.add_months(partitioning.month_start(self.now), 12)
+        order = self.create_order()
+        Order.objects.filter(pk=order.pk).update(order_date=future)
+        self.assertEqual(self.fetch('SELECT count(*) FROM orders_order_default'), [(1,)])
+
+        created = partitioning.create_partitions(months_ahead=0, start=future)
+
+        self.assertEqual(created, [partitioning.partition_name('orders_order', future),
+                                   partitioning.partition_name('orders_orderitem', future)])
+        self.assertEqual(self.fetch('SELECT count(*) FROM orders_order_default'), [(0,)])
+        self.assertTrue(Order.objects.filter(pk=order.pk, order_date=future).exists())
+
+    def test_old_partitions_are_detached_into_the_archive(self):
+        partitioning.convert_to_partitioned()
+        month = partitioning.month_start(self.old_order.order_date)
+
+        detached = partitioning.detach_partitions(partitioning.add_months(month, 1), archive_schema='orders_archive')
+
+        self.assertEqual(detached, [partitioning.partition_name('orders_order', month),
+                                    partitioning.partition_name('orders_orderitem', month)])
+        self.assertFalse(Order.objects.filter(pk=self.old_order.pk).exists())
+        self.assertTrue(Order.objects.filter(pk=self.order.pk).exists())
+        archived = f"orders_archive.{partitioning.partition_name('orders_order', month)}"
+        self.assertEqual(self.fetch(f'SELECT order_id FROM {archived}'), [(self.old_order.pk,)])
@@ -0,0 +1,78 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+
+from account.factories import UserFactory
+from orders.models import Order, OrderEvent, OrderItem
+from orders.reservations import InsufficientStock, release_stock, reserve_stock
+from orders.tasks import cancel_pending_orders
+from shop.factories import ProductFactory
+
+
+class StockReservationTest(TestCase):
+    def setUp(self):
+        self.first = ProductFactory(stock=5)
+        self.second = ProductFactory(stock=1)
+
+    def assertStock(self, product, expected):
+        product.refresh_from_db()
+        self.assertEqual(product.stock, expected)
+
+    def test_reserve_and_release(self):
+        reserved = reserve_stock([(self.first.product_id, 2), (self.second.product_id, 1), (self.first.product_id, 1)])
+        self.assertEqual(dict(reserved), {self.first.product_id: 3, self.second.product_id: 1})
+        self.assertStock(self.first, 2)
+        self.assertStock(self.second, 0)
+
+        release_stock(reserved)
+        self.assertStock(self.first, 5)
+        self.assertStock(self.second, 1)
+
+    def test_shortage_reserves_nothing(self):
+        with self.assertRaises(InsufficientStock) as raised:
+            reserve_stock([(self.first.product_id, 2), (self.second.product_id, 2)])
+        self.assertEqual(raised.exception.product_id, self.second.product_id)
+        self.assertStock(self.first, 5)
+        self.assertStock(self.second, 1)
+
+    def test_expired_reservations_are_released(self):
+        order = Order.objects.create(user=UserFactory())
+        OrderItem.objects.create(order=order, product=self.first, product_name='p', price=10, quantity=2)
+        reserve_stock([(self.first.product_id, 2)])
+        Order.objects.filter(pk=order.pk).update(order_date=timezone.now() - timedelta(minutes=21))
+
+        cancel_pending_orders()
+
+        order.refresh_from_db()
+        self.assertEqual(order.status, Order.Status.CANCELED)
+        self.assertStock(self.first, 5)
+
+    def test_expired_orders_are_cancelled_in_batches(self):
+        user = UserFactory()
+        orders = []
+        for _ in range(3):
+            order = Order.objects.create(user=user)
+            OrderItem.objects.create(order=order, product=self.first, product_name='p', price=10, quantity=1)
+            OrderItem.objects.create(order=order, product=self.second, product_name='p', price=10, quantity=1)
+            orders.append(order)
+        fresh = Order.objects.create(user=user)
+        Order.objects.filter(pk__in=[order.pk for order in orders]).update(
+            order_date=timezone.now() - timedelta(minutes=30)
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(cancel_pending_orders(batch_size=2), 3)
+
+        self.assertEqual(
+            set(Order.objects.filter(status=Order.Status.CANCELED).values_list('pk', flat=True)),
+            {order.pk for order in orders},
+        )
+        fresh.refresh_from_db()
+        self.assertEqual(fresh.status, Order.Status.PENDING)
+        self.assertStock(self.first, 8)
+        self.assertStock(self.second, 4)
+        self.assertEqual(
+            set(OrderEvent.objects.filter(changes__status=['pending', 'canceled']).values_list('order_id', flat=True)),
+            {order.pk for order in orders},
+        )
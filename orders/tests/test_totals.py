@@ -0,0 +1,55 @@
+from decimal import Decimal
+from unittest.mock import MagicMock, patch
+
+from django.contrib.admin.sites import site
+from django.test import RequestFactory, TestCase
+
+from account.factories import UserFactory
+from orders.models import Order, OrderItem
+from orders.services import recompute_order_totals
+from shop.factories import ProductFactory
+
+
+class OrderTotalsTest(TestCase):
+    def setUp(self):
+        self.order = Order.objects.create(user=UserFactory(), shipping_cost=Decimal('15.00'))
+        for price, quantity in ((Decimal('10.00'), 1), (Decimal('20.00'), 2)):
+            OrderItem.objects.create(
+                order=self.order, product=ProductFactory(), product_name='p', price=price, quantity=quantity
+            )
+        self.order.refresh_from_db()
+
+    def test_subtotal_is_summed_in_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(self.order.get_total_cost_before_discount(), Decimal('50.00'))
+
+    def test_in_memory_items_need_no_query(self):
+        items = list(self.order.items.all())
+        with self.assertNumQueries(0):
+            self.assertEqual(self.order.calculate_total_payable(self.order.get_total_cost_before_discount(items)),
+                             Decimal('65.00'))
+
+    def test_recompute_stores_the_totals(self):
+        recompute_order_totals(self.order)
+
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.subtotal, Decimal('50.00'))
+        self.assertEqual(self.order.tax_amount, Decimal('4.50'))
+        self.assertEqual(self.order.total_payable, Decimal('69.50'))
+
+    def test_paid_orders_keep_their_totals(self):
+        Order.objects.filter(pk=self.order.pk).update(status=Order.Status.PAID)
+        self.order.refresh_from_db()
+
+        with self.assertRaises(ValueError):
+            recompute_order_totals(self.order)
+
+    def test_admin_recomputes_only_when_items_changed(self):
+        model_admin = site._registry[Order]
+        form = MagicMock(instance=self.order)
+        request = RequestFactory().post('/')
+        with patch('orders.admin.recompute_order_totals') as recompute:
+            model_admin.save_related(request, form, [MagicMock(**{'has_changed.return_value': False})], True)
+            recompute.assert_not_called()
+            model_admin.save_related(request, form, [MagicMock(**{'has_changed.return_value': True})], True)
+            recompute.assert_called_once_with(self.order)
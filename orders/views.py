@@ -1,18 +1,28 @@
-from drf_spectacular.utils import extend_schema, OpenApiResponse, extend_schema_view
+from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiResponse, extend_schema_view
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
 
+from ecommerce_api.utils.pagination import KeysetCursorPagination
 from .permissions import IsAdminOrOwner
-from .serializers import OrderSerializer, OrderCreateSerializer
+from .serializers import OrderSerializer, OrderCreateSerializer, OrderSummarySerializer
 from . import services
+from .events import order_timeline
 
 
 @extend_schema_view(
     list=extend_schema(
         operation_id="order_list",
-        description="List orders. Non-staff users see only their orders.",
+        description=(
+            "List orders, newest first, with keyset cursor pagination. Non-staff users see only their orders. "
+            "Items are included only with ?expand=items."
+        ),
         tags=["Orders"],
+        parameters=[
+            OpenApiParameter(name="expand", description="Pass 'items' to include the order items.", required=False, type=str),
+        ],
+        responses={200: OrderSummarySerializer(many=True)},
     ),
     retrieve=extend_schema(
         operation_id="order_retrieve",
@@ -32,6 +42,15 @@ from . import services
     update=extend_schema(operation_id="order_update", description="Update an order. Admin access required.", tags=["Orders"]),
     partial_update=extend_schema(operation_id="order_partial_update", description="Partially update an order. Admin access required.", tags=["Orders"]),
     destroy=extend_schema(operation_id="order_destroy", description="Delete an order. Admin access required.", tags=["Orders"]),
+    timeline=extend_schema(
+        operation_id="order_timeline",
+        description=(
+            "The order's change log, oldest first: the fields each change touched, who made it "
+            "and the order's state after it. Admin access required."
+        ),
+        tags=["Orders"],
+        responses={200: OpenApiResponse(description="A list of order events.")},
+    ),
 )
 class OrderViewSet(viewsets.ModelViewSet):
     """
@@ -39,6 +58,8 @@ class OrderViewSet(viewsets.ModelViewSet):
     - Users can create, list, and retrieve their own orders.
     - Staff users have full CRUD permissions.
     """
+    # Seeks on (order_date, order_id), so deep pages cost the same as the first.
+    pagination_class = KeysetCursorPagination
 
     def get_serializer_class(self):
         """
@@ -46,15 +67,26 @@ class OrderViewSet(viewsets.ModelViewSet):
         """
         if self.action == 'create':
             return OrderCreateSerializer
+        if self.action == 'list':
+            return OrderSummarySerializer
         return OrderSerializer
 
+    @property
+    def expand_items(self):
+        return 'items' in self.request.query_params.get('expand', '').split(',')
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['expand_items'] = self.action == 'list' and self.expand_items
+        return context
+
     def get_permissions(self):
         """
         Instantiates and returns the list of permissions that this view requires.
         - 'create', 'list', 'retrieve': Must be authenticated and either owner or admin.
-        - 'update', 'partial_update', 'destroy': Must be an admin user.
+        - 'update', 'partial_update', 'destroy', 'timeline': Must be an admin user.
         """
-        if self.action in ['update', 'partial_update', 'destroy']:
+        if self.action in ['update', 'partial_update', 'destroy', 'timeline']:
             permission_classes = [IsAdminUser]
         else:
             permission_classes = [IsAuthenticated, IsAdminOrOwner]
@@ -64,6 +96,8 @@ class OrderViewSet(viewsets.ModelViewSet):
         """
         Filter orders to only show the user's own orders unless they are staff.
         """
+        if self.action == 'list':
+            return services.get_order_summaries(self.request.user, expand_items=self.expand_items)
         return services.get_user_orders(self.request.user)
 
     def create(self, request, *args, **kwargs):
@@ -75,3 +109,11 @@ class OrderViewSet(viewsets.ModelViewSet):
         response_serializer = OrderSerializer(order, context={'request': request})
         headers = self.get_success_headers(response_serializer.data)
         return Response(response_serializer.data, status=status.HTTP_201_CREATED, headers=headers)
+
+    @action(detail=True, methods=['get'])
+    def timeline(self, request, pk=None):
+        """
+        Replay the order's event log.
+        """
+        order = self.get_object()
+        return Response(order_timeline(order.pk))
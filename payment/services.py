@@ -1,12 +1,17 @@
+from django.core.cache import cache
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from django.urls import reverse
 from orders.models import Order
-from .gateways import ZibalGateway
 from shipping.tasks import create_postex_shipment_task
 
 
 from .gateways import ZibalGateway, ZibalGatewayError
 
+# How long a queued verification suppresses further enqueues for the same
+# trackId (callback reloads, reconciliation sweeps).
+VERIFY_ENQUEUE_LOCK_TIMEOUT = 60
+
 
 def process_payment(request, order_id):
     order = get_object_or_404(Order, order_id=order_id, user=request.user)
@@ -41,12 +46,25 @@ def process_payment(request, order_id):
         raise ValueError(f"Failed to create payment request: {e}")
 
 
+def get_order_by_track_id(track_id, queryset=None):
+    """
+    Fetch the order a gateway trackId was issued for, through the partial
+    index on ``payment_track_id``. TrackIds are unique: by that index, or on
+    partitioned order tables by ``orders_order_track_id`` (see
+    ``orders.partitioning``).
+
+    :raises Order.DoesNotExist: If no order carries the trackId. A blank
+        trackId never matches, even though unpaid orders store one.
+    """
+    if not track_id:
+        raise Order.DoesNotExist("A trackId is required.")
+    queryset = Order.objects.all() if queryset is None else queryset
+    return queryset.exclude(payment_track_id='').get(payment_track_id=track_id)
+
+
 def verify_payment(track_id):
-    try:
-        order = Order.objects.get(payment_track_id=track_id)
-    except Order.DoesNotExist:
-        # This will be caught by the view and result in a 404.
-        raise
+    # Order.DoesNotExist is caught by the view and results in a 404.
+    order = get_order_by_track_id(track_id)
 
     # Idempotency Check: If already successful, do nothing more.
     if order.payment_status == Order.PaymentStatus.SUCCESS:
@@ -63,32 +81,73 @@ def verify_payment(track_id):
         expected_amount = int(order.total_payable * 10)  # Assuming Toman to Rials conversion
 
         if amount_from_gateway != expected_amount:
-            order.payment_status = Order.PaymentStatus.FAILED
-            order.save()
+            _settle(order, Order.PaymentStatus.FAILED)
             raise ValueError(
                 f"Amount mismatch. Expected {expected_amount}, but gateway reported {amount_from_gateway}."
             )
 
         order_id_from_gateway = response.get('orderId')
         if order_id_from_gateway != str(order.order_id):
-            order.payment_status = Order.PaymentStatus.FAILED
-            order.save()
+            _settle(order, Order.PaymentStatus.FAILED)
             raise ValueError(
                 f"OrderId mismatch. Expected {order.order_id}, but gateway reported {order_id_from_gateway}."
             )
 
         # All checks passed, update the order.
-        order.payment_status = Order.PaymentStatus.SUCCESS
-        order.payment_ref_id = response.get('refNumber', '')
-        order.status = Order.Status.PAID
-        order.save()
+        if not _settle(order, Order.PaymentStatus.SUCCESS, payment_ref_id=response.get('refNumber', ''),
+                       status=Order.Status.PAID):
+            return "This payment has already been successfully verified."
 
         # Trigger asynchronous post-payment tasks.
         create_postex_shipment_task.delay(order.order_id)
         return "Payment verified successfully. Shipment creation is in progress."
     else:
         # Verification failed at the gateway.
-        order.payment_status = Order.PaymentStatus.FAILED
-        order.save()
+        _settle(order, Order.PaymentStatus.FAILED)
         error_message = response.get('message', 'Unknown error.')
         raise ValueError(f"Payment verification failed: {error_message} (Result code: {result})")
+
+
+def _settle(order, payment_status, **fields):
+    """
+    Record the outcome of a verification on the order.
+
+    The row is re-read under a lock so that concurrent verifications of the
+    same trackId (the callback, a retried task and the reconciliation sweep)
+    settle it once: a payment that has already succeeded is left untouched.
+
+    :return: False if the payment had already succeeded.
+    """
+    with transaction.atomic():
+        locked = Order.objects.select_for_update().get(pk=order.pk)
+        if locked.payment_status == Order.PaymentStatus.SUCCESS:
+            return False
+        locked.payment_status = payment_status
+        for name, value in fields.items():
+            setattr(locked, name, value)
+        locked.save()
+    return True
+
+
+def request_verification(track_id):
+    """
+    Queue the server-side verification of a Zibal callback and return the
+    order straight away; the client polls the payment status resource.
+
+    :raises Order.DoesNotExist: If no order carries the trackId.
+    """
+    order = get_order_by_track_id(track_id)
+    if order.payment_status == Order.PaymentStatus.PENDING:
+        enqueue_verification(track_id)
+    return order
+
+
+def enqueue_verification(track_id):
+    """
+    Queue ``verify_payment_task`` for the trackId unless one was queued in the
+    last ``VERIFY_ENQUEUE_LOCK_TIMEOUT`` seconds.
+    """
+    from .tasks import verify_payment_task
+
+    if cache.add(f"payment:verify:{track_id}", 1, VERIFY_ENQUEUE_LOCK_TIMEOUT):
+        verify_payment_task.delay(track_id)
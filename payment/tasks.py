@@ -0,0 +1,54 @@
+import logging
+from datetime import timedelta
+
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+
+from orders.models import Order
+from . import services
+from .gateways import ZibalGatewayError
+
+logger = logging.getLogger(__name__)
+
+RECONCILE_BATCH_SIZE = 200
+
+
+@shared_task(autoretry_for=(ZibalGatewayError,), retry_backoff=True, retry_kwargs={'max_retries': 5})
+def verify_payment_task(track_id):
+    """
+    Verify a Zibal payment off the request thread. Safe to run any number of
+    times for the same trackId: ``services.verify_payment`` settles an order
+    only once. Network errors against Zibal are retried with backoff.
+    """
+    try:
+        message = services.verify_payment(track_id)
+        logger.info(f"Payment verification for trackId {track_id}: {message}")
+        return message
+    except Order.DoesNotExist:
+        logger.error(f"Verification failed: No order found for trackId {track_id}.")
+    except ValueError as e:
+        logger.error(f"Payment verification error for trackId {track_id}: {e}")
+
+
+@shared_task
+def reconcile_pending_payments(batch_size=RECONCILE_BATCH_SIZE):
+    """
+    Queue verification for payments still pending a while after the user was
+    sent to the gateway, e.g. because the callback never reached us or the
+    verification task was lost. Runs before ``cancel_pending_orders`` would
+    cancel the order.
+    """
+    cutoff = timezone.now() - timedelta(minutes=settings.PAYMENT_RECONCILE_AFTER_MINUTES)
+    track_ids = list(
+        Order.objects.filter(
+            status=Order.Status.PENDING,
+            payment_status=Order.PaymentStatus.PENDING,
+            updated__lt=cutoff,
+        ).exclude(payment_track_id='').order_by('updated').values_list('payment_track_id', flat=True)[:batch_size]
+    )
+    for track_id in track_ids:
+        services.enqueue_verification(track_id)
+    if track_ids:
+        logger.info(f"Queued verification for {len(track_ids)} pending payments.")
+    return len(track_ids)
@@ -1,30 +1,31 @@
 from decimal import Decimal
 from unittest.mock import patch
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from orders.models import Order
 from account.models import Address
+from ecommerce_api.core.tests.stub_server import stub_provider
 
 User = get_user_model()
 
 
 class PaymentGatewayTests(TestCase):
-    @patch('payment.gateways.requests.post')
-    def test_zibal_create_payment_request(self, mock_post):
-        mock_post.return_value.status_code = 200
-        mock_post.return_value.json.return_value = {'result': 100, 'trackId': '12345'}
+    def setUp(self):
+        self.server = stub_provider(self, 'zibal')
+
+    def test_zibal_create_payment_request(self):
+        self.server.respond('POST', '/request', json={'result': 100, 'trackId': '12345'})
         from payment.gateways import ZibalGateway
         gateway = ZibalGateway()
         response = gateway.create_payment_request(1000, 'test-order', 'http://test.com/callback')
         self.assertEqual(response['result'], 100)
+        self.assertEqual(self.server.requests[-1]['json']['orderId'], 'test-order')
 
-    @patch('payment.gateways.requests.post')
-    def test_zibal_verify_payment(self, mock_post):
-        mock_post.return_value.status_code = 200
-        mock_post.return_value.json.return_value = {'result': 100}
+    def test_zibal_verify_payment(self):
+        self.server.respond('POST', '/verify', json={'result': 100})
         from payment.gateways import ZibalGateway
         gateway = ZibalGateway()
         response = gateway.verify_payment('12345')
@@ -122,3 +123,98 @@ class PaymentWebhookAPIViewTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['message'], 'Webhook already processed.')
         mock_task.assert_not_called()
+
+
+@override_settings(
+    PAYMENT_VERIFY_ASYNC=True,
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'payment-tests'}},
+)
+class AsyncPaymentVerificationTests(APITestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.server = stub_provider(self, 'zibal')
+        self.user = User.objects.create_user(
+            phone_number='+989123456719',
+            email='testasync@example.com',
+            username='testasyncuser',
+            password='password'
+        )
+        self.order = Order.objects.create(user=self.user, total_payable=Decimal('100.00'), payment_track_id='track456')
+
+    @patch('payment.tasks.verify_payment_task.delay')
+    def test_callback_queues_verification_once(self, mock_task):
+        url = reverse('payment:verify') + '?trackId=track456&success=1'
+        response = self.client.get(url)
+        self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertTrue(response.data['data']['status_url'].endswith(reverse('payment:status', args=['track456'])))
+        mock_task.assert_called_once_with('track456')
+
+    @patch('payment.services.create_postex_shipment_task.delay')
+    def test_verification_task_is_idempotent(self, mock_create_shipment):
+        from payment.tasks import verify_payment_task
+        self.server.respond('POST', '/verify', json={
+            'result': 100, 'amount': 1000, 'orderId': str(self.order.order_id), 'refNumber': 'ref-1',
+        })
+
+        verify_payment_task('track456')
+        verify_payment_task('track456')
+
+        mock_create_shipment.assert_called_once_with(self.order.order_id)
+        self.client.force_authenticate(self.user)
+        response = self.client.get(reverse('payment:status', args=['track456']))
+        self.assertEqual(response.data['data']['payment_status'], Order.PaymentStatus.SUCCESS)
+        self.assertEqual(response.data['data']['order_status'], Order.Status.PAID)
+
+    def test_status_is_private_to_the_order_owner(self):
+        url = reverse('payment:status', args=['track456'])
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+
+        other = User.objects.create_user(
+            phone_number='+989123456720', email='other@example.com', username='otheruser', password='password'
+        )
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    @patch('payment.tasks.verify_payment_task.delay')
+    def test_reconciliation_sweeps_stale_pending_payments(self, mock_task):
+        from datetime import timedelta
+        from django.utils import timezone
+        from payment.tasks import reconcile_pending_payments
+        Order.objects.create(user=self.user, payment_track_id='fresh')
+        Order.objects.filter(pk=self.order.pk).update(updated=timezone.now() - timedelta(minutes=30))
+
+        self.assertEqual(reconcile_pending_payments(), 1)
+        mock_task.assert_called_once_with('track456')
+
+
+class OrderTrackIdLookupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            phone_number='+989123456720',
+            email='testlookup@example.com',
+            username='testlookupuser',
+            password='password'
+        )
+
+    def test_track_ids_are_unique_but_blank_ones_are_not(self):
+        from django.db import IntegrityError, transaction
+        Order.objects.create(user=self.user)
+        Order.objects.create(user=self.user)
+        Order.objects.create(user=self.user, payment_track_id='track789')
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Order.objects.create(user=self.user, payment_track_id='track789')
+
+    def test_lookup_by_track_id(self):
+        from payment.services import get_order_by_track_id
+        order = Order.objects.create(user=self.user, payment_track_id='track789')
+        Order.objects.create(user=self.user)
+
+        self.assertEqual(get_order_by_track_id('track789'), order)
+        with self.assertRaises(Order.DoesNotExist):
+            get_order_by_track_id('')
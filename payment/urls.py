@@ -1,10 +1,11 @@
 from django.urls import path
 
-from payment.views import PaymentProcessAPIView, PaymentVerifyAPIView
+from payment.views import PaymentProcessAPIView, PaymentStatusAPIView, PaymentVerifyAPIView
 
 app_name = 'payment'
 
 urlpatterns = [
     path('process/<uuid:order_id>/', PaymentProcessAPIView.as_view(), name='process'),
     path('verify/', PaymentVerifyAPIView.as_view(), name='verify'),
+    path('status/<str:track_id>/', PaymentStatusAPIView.as_view(), name='status'),
 ]
@@ -9,9 +9,9 @@ from ecommerce_api.core.api_standard_response import ApiResponse
 from orders.models import Order
 from . import services
 import hmac
-from .tasks import process_successful_payment
 from ecommerce_api.core.utils import get_client_ip
 from django.conf import settings
+from django.urls import reverse
 from rest_framework.permissions import AllowAny
 
 logger = getLogger(__name__)
@@ -61,6 +61,7 @@ from .gateways import ZibalGatewayError
         tags=["Payments"],
         responses={
             200: OpenApiResponse(description="Payment verified successfully."),
+            202: OpenApiResponse(description="Verification queued; poll the status URL (PAYMENT_VERIFY_ASYNC)."),
             400: OpenApiResponse(description="Invalid callback request or verification failed."),
             404: OpenApiResponse(description="Order not found for the given trackId."),
         },
@@ -72,6 +73,9 @@ class PaymentVerifyAPIView(APIView):
     It receives the trackId and success status from Zibal via query parameters.
     It then immediately calls the verification service to confirm the payment
     with Zibal's server, ensuring a secure verification process.
+
+    With ``PAYMENT_VERIFY_ASYNC`` enabled the verification runs in a Celery task
+    instead and the response points to the payment status resource.
     """
     permission_classes = [AllowAny]
 
@@ -94,6 +98,9 @@ class PaymentVerifyAPIView(APIView):
                 status_code=status.HTTP_400_BAD_REQUEST
             )
 
+        if settings.PAYMENT_VERIFY_ASYNC:
+            return self.queue_verification(request, track_id)
+
         try:
             message = services.verify_payment(track_id)
             # In a real frontend application, you would redirect the user to a success page.
@@ -115,3 +122,60 @@ class PaymentVerifyAPIView(APIView):
                 message=str(e),
                 status_code=status.HTTP_400_BAD_REQUEST
             )
+
+    def queue_verification(self, request, track_id):
+        try:
+            order = services.request_verification(track_id)
+        except Order.DoesNotExist:
+            logger.error(f"Verification failed: No order found for trackId {track_id}.")
+            return ApiResponse.error(
+                message="Order not found.",
+                status_code=status.HTTP_404_NOT_FOUND
+            )
+        return ApiResponse.success(
+            message="Payment verification is in progress.",
+            data={
+                "payment_status": order.payment_status,
+                "status_url": request.build_absolute_uri(
+                    reverse("payment:status", kwargs={"track_id": track_id})
+                ),
+            },
+            status_code=status.HTTP_202_ACCEPTED
+        )
+
+
+@extend_schema_view(
+    get=extend_schema(
+        operation_id="payment_status",
+        description="Current payment and order status for one of the user's Zibal trackIds, polled after an asynchronous verification.",
+        tags=["Payments"],
+        responses={
+            200: OpenApiResponse(description="Payment status."),
+            404: OpenApiResponse(description="Order not found for the given trackId."),
+        },
+    )
+)
+class PaymentStatusAPIView(APIView):
+    # TrackIds can be guessed, so only the order's owner (or staff) may
+    # look one up.
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, track_id, *args, **kwargs):
+        orders = Order.objects.values("order_id", "status", "payment_status")
+        if not request.user.is_staff:
+            orders = orders.filter(user=request.user)
+        try:
+            order = services.get_order_by_track_id(track_id, orders)
+        except Order.DoesNotExist:
+            return ApiResponse.error(
+                message="Order not found.",
+                status_code=status.HTTP_404_NOT_FOUND
+            )
+        return ApiResponse.success(
+            data={
+                "order_id": order["order_id"],
+                "order_status": order["status"],
+                "payment_status": order["payment_status"],
+            },
+            status_code=status.HTTP_200_OK
+        )
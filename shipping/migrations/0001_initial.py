@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostexCity',
+            fields=[
+                ('code', models.IntegerField(primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=100)),
+                ('data', models.JSONField(help_text='The city entry as returned by Postex.')),
+                ('updated', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Postex City',
+                'verbose_name_plural': 'Postex Cities',
+                'ordering': ['name'],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.2 on 2026-10-18 12:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0006_order_unique_order_payment_track_id'),
+        ('shipping', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Shipment',
+            fields=[
+                ('parcel_no', models.CharField(max_length=100, primary_key=True, serialize=False)),
+                ('status', models.CharField(blank=True, max_length=50)),
+                ('is_final', models.BooleanField(default=False)),
+                ('last_event_at', models.DateTimeField(blank=True, null=True)),
+                ('last_checked_at', models.DateTimeField(blank=True, null=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shipments', to='orders.order')),
+            ],
+            options={
+                'verbose_name': 'Shipment',
+                'verbose_name_plural': 'Shipments',
+                'ordering': ['-created'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ShipmentEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=50)),
+                ('description', models.CharField(blank=True, max_length=255)),
+                ('occurred_at', models.DateTimeField()),
+                ('source', models.CharField(choices=[('webhook', 'Webhook'), ('poll', 'Poll')], max_length=10)),
+                ('data', models.JSONField(help_text='The event as reported by Postex.')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('shipment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='events', to='shipping.shipment')),
+            ],
+            options={
+                'verbose_name': 'Shipment Event',
+                'verbose_name_plural': 'Shipment Events',
+                'ordering': ['occurred_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='shipment',
+            index=models.Index(condition=models.Q(('is_final', False)), fields=['last_checked_at'], name='shipment_in_flight_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='shipmentevent',
+            constraint=models.UniqueConstraint(fields=('shipment', 'status', 'occurred_at'), name='unique_shipment_event'),
+        ),
+    ]
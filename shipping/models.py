@@ -1,2 +1,72 @@
+from django.db import models
 
-# Create your models here.
+
+class PostexCity(models.Model):
+    """
+    Local copy of the Postex city list, refreshed daily by
+    ``shipping.tasks.refresh_postex_cities``.
+    """
+    code = models.IntegerField(primary_key=True)
+    name = models.CharField(max_length=100)
+    data = models.JSONField(help_text="The city entry as returned by Postex.")
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Postex City"
+        verbose_name_plural = "Postex Cities"
+        ordering = ["name"]
+
+    def __str__(self):
+        return f"{self.name} ({self.code})"
+
+
+class Shipment(models.Model):
+    """
+    Local mirror of one Postex parcel's tracking state, kept up to date by
+    the Postex webhook and by ``shipping.tasks.poll_shipments``.
+    """
+    parcel_no = models.CharField(max_length=100, primary_key=True)
+    order = models.ForeignKey('orders.Order', related_name='shipments', on_delete=models.CASCADE)
+    status = models.CharField(max_length=50, blank=True)
+    is_final = models.BooleanField(default=False)
+    last_event_at = models.DateTimeField(null=True, blank=True)
+    last_checked_at = models.DateTimeField(null=True, blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Shipment"
+        verbose_name_plural = "Shipments"
+        indexes = [
+            # The poller's scan of parcels still in flight.
+            models.Index(fields=['last_checked_at'], condition=models.Q(is_final=False), name='shipment_in_flight_idx'),
+        ]
+        ordering = ["-created"]
+
+    def __str__(self):
+        return f"Shipment {self.parcel_no} ({self.status or 'registered'})"
+
+
+class ShipmentEvent(models.Model):
+    class Source(models.TextChoices):
+        WEBHOOK = 'webhook', 'Webhook'
+        POLL = 'poll', 'Poll'
+
+    shipment = models.ForeignKey(Shipment, related_name='events', on_delete=models.CASCADE)
+    status = models.CharField(max_length=50)
+    description = models.CharField(max_length=255, blank=True)
+    occurred_at = models.DateTimeField()
+    source = models.CharField(max_length=10, choices=Source.choices)
+    data = models.JSONField(help_text="The event as reported by Postex.")
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Shipment Event"
+        verbose_name_plural = "Shipment Events"
+        constraints = [
+            # The same event may arrive by webhook and by polling.
+            models.UniqueConstraint(fields=['shipment', 'status', 'occurred_at'], name='unique_shipment_event'),
+        ]
+        ordering = ["occurred_at"]
+
+    def __str__(self):
+        return f"{self.shipment_id}: {self.status} at {self.occurred_at}"
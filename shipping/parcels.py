@@ -0,0 +1,227 @@
+"""
+Parcel planning for Postex shipments.
+
+An order's items and products are loaded in one query and split into
+parcels within the carrier's size and weight limits
+(``settings.POSTEX_PARCEL_LIMITS``) using a first-fit-decreasing 3D
+bin-packing heuristic. Each unit is placed at the "extreme point" (a corner
+left free by the boxes already in the parcel) and in the orientation that
+keep the packed volume smallest. The resulting parcels feed both the quote
+and the shipment payloads, so a quoted price matches the parcels that are
+later registered.
+
+Dimensions and weights are taken as stored on the product (cm and grams).
+Products without dimensions take no space, and products without a weight
+weigh nothing.
+"""
+import math
+from decimal import Decimal
+from itertools import permutations
+
+from django.conf import settings
+
+
+class Box:
+    """
+    One unit of an order item, or a stack of identical units handled as a
+    single rigid box.
+    """
+
+    def __init__(self, item, count, dims, weight):
+        self.item = item
+        self.count = count
+        self.dims = dims
+        self.weight = weight
+
+    @property
+    def volume(self):
+        length, width, height = self.dims
+        return length * width * height
+
+
+class Parcel:
+    """
+    A carrier box being filled. ``place`` puts a box at the free extreme
+    point and in the orientation that fit without overlapping the boxes
+    already placed and grow the packed volume the least.
+    """
+
+    def __init__(self, limits):
+        self.size = sorted((limits['length'], limits['width'], limits['height']), reverse=True)
+        self.max_weight = limits['weight']
+        self.placements = []  # (x, y, z, length, width, height)
+        self.points = [(0, 0, 0)]
+        self.weight = Decimal(0)
+        self.counts = {}
+
+    def place(self, box):
+        if self.placements and self.weight + box.weight > self.max_weight:
+            return False
+        candidates = [
+            (point, dims)
+            for point in self.points
+            for dims in set(permutations(box.dims))
+            if self._fits(point, dims)
+        ]
+        if not candidates:
+            if self.placements:
+                return False
+            # An empty parcel takes any box, so that an item over the limits
+            # still ships on its own.
+            candidates = [((0, 0, 0), tuple(sorted(box.dims, reverse=True)))]
+        # Keep the parcel as compact as possible, filling it bottom-up and
+        # along its longest side first.
+        point, dims = min(candidates, key=lambda candidate: (
+            self._bounding_volume(*candidate), candidate[0][::-1], candidate[1],
+        ))
+        self._add(box, point, dims)
+        return True
+
+    def _bounding_volume(self, point, dims):
+        volume = 1
+        for axis, extent in enumerate(self.dimensions):
+            volume *= max(extent, point[axis] + dims[axis])
+        return volume
+
+    def _fits(self, point, dims):
+        if any(p + d > limit for p, d, limit in zip(point, dims, self.size)):
+            return False
+        return not any(
+            all(p < q + e and q < p + d for p, d, q, e in zip(point, dims, placed[:3], placed[3:]))
+            for placed in self.placements
+        )
+
+    def _add(self, box, point, dims):
+        x, y, z = point
+        length, width, height = dims
+        self.placements.append((x, y, z, length, width, height))
+        if point in self.points:
+            self.points.remove(point)
+        self.points.extend([(x + length, y, z), (x, y + width, z), (x, y, z + height)])
+        self.weight += box.weight
+        item, count = self.counts.get(box.item.pk, (box.item, 0))
+        self.counts[box.item.pk] = (item, count + box.count)
+
+    @property
+    def items(self):
+        """``(order_item, count)`` pairs packed into this parcel."""
+        return list(self.counts.values())
+
+    @property
+    def dimensions(self):
+        """Bounding ``(length, width, height)`` of the packed boxes."""
+        return tuple(
+            max((placed[axis] + placed[axis + 3] for placed in self.placements), default=0)
+            for axis in range(3)
+        )
+
+    @property
+    def value(self):
+        return sum((item.price * count for item, count in self.items), Decimal(0))
+
+    def properties(self):
+        length, width, height = sorted(self.dimensions, reverse=True)
+        return {
+            "total_weight": math.ceil(self.weight),
+            "total_value": int(self.value),
+            "length": math.ceil(length),
+            "width": math.ceil(width),
+            "height": math.ceil(height),
+        }
+
+    def handling_flags(self):
+        # Products carry no handling attributes yet; the flags default to off.
+        products = [item.product for item, _ in self.items]
+        return {
+            "is_fragile": any(getattr(product, 'is_fragile', False) for product in products),
+            "is_liquid": any(getattr(product, 'is_liquid', False) for product in products),
+        }
+
+
+def _stack_size(dims, weight, quantity, size, max_weight):
+    """
+    How many identical units can be stacked along their thinnest side and
+    still fit one parcel.
+    """
+    length, width, height = dims
+    count = quantity
+    if length > size[1] or width > size[2]:
+        return 1
+    if height:
+        count = min(count, int(size[0] // height))
+    if weight:
+        count = min(count, int(max_weight // weight))
+    return max(count, 1)
+
+
+def _boxes(items, limits):
+    size = sorted((limits['length'], limits['width'], limits['height']), reverse=True)
+    boxes = []
+    for item in items:
+        product = item.product
+        dims = sorted((product.length or 0, product.width or 0, product.height or 0), reverse=True)
+        weight = product.weight or 0
+        stack = _stack_size(dims, weight, item.quantity, size, limits['weight'])
+        remaining = item.quantity
+        while remaining:
+            count = min(stack, remaining)
+            boxes.append(Box(item, count, (dims[0], dims[1], dims[2] * count), weight * count))
+            remaining -= count
+    boxes.sort(key=lambda box: (box.volume, box.weight), reverse=True)
+    return boxes
+
+
+def plan_parcels(order, limits=None):
+    """
+    Split the order's items into parcels within the carrier limits.
+
+    :param limits: Overrides ``settings.POSTEX_PARCEL_LIMITS``.
+    :return: A list of ``Parcel``; empty for an order without items.
+    """
+    limits = {key: Decimal(value) for key, value in (limits or settings.POSTEX_PARCEL_LIMITS).items()}
+    parcels = []
+    for box in _boxes(order.items.select_related('product'), limits):
+        for parcel in parcels:
+            if parcel.place(box):
+                break
+        else:
+            parcel = Parcel(limits)
+            parcel.place(box)
+            parcels.append(parcel)
+    return parcels
+
+
+def shipment_payload(order, parcels):
+    """
+    The ``parcels`` list of a Postex bulk parcel registration.
+    """
+    address = order.address
+    destination = {
+        "contact": {
+            "name": address.receiver_name,
+            "mobile": address.receiver_phone,
+        },
+        "location": {
+            "address": address.full_address,
+            "city_code": address.city_code,
+            "postal_code": address.postal_code,
+        }
+    }
+    return [{
+        "to": destination,
+        "parcel_items": [
+            {"name": item.product_name, "count": count, "amount": int(item.price)}
+            for item, count in parcel.items
+        ],
+        "parcel_properties": {**parcel.properties(), **parcel.handling_flags()},
+    } for parcel in parcels]
+
+
+def quote_payload(order, parcels):
+    """
+    The ``parcels`` list of a Postex shipping quote request.
+    """
+    return [
+        {"to_city_code": order.address.city_code, **parcel.properties()}
+        for parcel in parcels
+    ]
@@ -3,8 +3,14 @@ from abc import ABC, abstractmethod
 from django.conf import settings
 import logging
 
+from ecommerce_api.core.http import get_client
+from .parcels import plan_parcels, quote_payload, shipment_payload
+
 logger = logging.getLogger(__name__)
 
+# Parcel registration is slower than the other Postex calls.
+CREATE_SHIPMENT_TIMEOUT = (3.05, 15)
+
 
 class ShippingProviderError(Exception):
     """Custom exception for shipping provider errors."""
@@ -32,7 +38,7 @@ class PostexShippingProvider(ShippingProvider):
         self.api_key = getattr(settings, 'POSTEX_API_KEY', None)
         if not self.api_key:
             raise ValueError("POSTEX_API_KEY is not configured in settings.")
-        self.api_url = 'https://api.postex.ir'
+        self.client = get_client('postex')
 
     def _get_headers(self):
         return {
@@ -52,119 +58,99 @@ class PostexShippingProvider(ShippingProvider):
         logger.error(f"{context_message} | Status: {response.status_code}, Response: {error_data}")
         raise ShippingProviderError(f"{context_message}: {error_data}", status_code=response.status_code)
 
-    def create_shipment(self, order):
-        # Assuming each product has dimensions and properties. Aggregating them is complex.
-        # For simplicity, we'll use the dimensions of the largest item and sum the weights.
-        # A more advanced implementation would use a packing algorithm.
-        total_weight = int(sum(item.product.weight * item.quantity for item in order.items.all()))
-        max_length = max(item.product.length for item in order.items.all())
-        max_width = max(item.product.width for item in order.items.all())
-        max_height = max(item.product.height for item in order.items.all())
-        is_fragile = any(item.product.is_fragile for item in order.items.all())
-        is_liquid = any(item.product.is_liquid for item in order.items.all())
-
-        parcels = [{
-            "to": {
-                "contact": {
-                    "name": order.address.receiver_name,
-                    "mobile": order.address.receiver_phone,
-                },
-                "location": {
-                    "address": order.address.full_address,
-                    "city_code": order.address.city_code,
-                    "postal_code": order.address.postal_code,
-                }
-            },
-            "parcel_items": [{"name": item.product.name, "count": item.quantity, "amount": int(item.product.price)} for item in order.items.all()],
-            "parcel_properties": {
-                "total_weight": total_weight,
-                "total_value": int(order.total_payable),
-                "length": int(max_length),
-                "width": int(max_width),
-                "height": int(max_height),
-                "is_fragile": is_fragile,
-                "is_liquid": is_liquid,
-            }
-        }]
+    def plan(self, order):
+        parcels = plan_parcels(order)
+        if not parcels:
+            raise ShippingProviderError(f"Order {order.order_id} has no items to ship.")
+        return parcels
+
+    def create_shipment(self, order, parcels=None):
+        parcels = shipment_payload(order, parcels or self.plan(order))
         data = {
             "collection_type": "pick_up",
             "parcels": parcels
         }
 
-        url = f'{self.api_url}/api/v1/parcels/bulk'
+        path = '/api/v1/parcels/bulk'
         context = f"Error creating Postex shipment for order {order.order_id}"
         logger.info(f"Creating Postex shipment for order {order.order_id} with data: {data}")
 
         try:
-            response = requests.post(url, json=data, headers=self._get_headers(), timeout=15)
+            response = self.client.post(path, json=data, headers=self._get_headers(), timeout=CREATE_SHIPMENT_TIMEOUT)
             return self._handle_response(response, context)
         except requests.exceptions.RequestException as e:
             logger.error(f"{context}: {e}")
             raise ShippingProviderError(f"{context}: {e}")
 
     def get_shipment_tracking(self, parcel_no):
-        url = f'{self.api_url}/api/v1/tracking/events/{parcel_no}'
+        path = f'/api/v1/tracking/events/{parcel_no}'
         context = f"Error getting Postex tracking for parcel_no {parcel_no}"
         logger.info(f"Getting Postex shipment tracking for parcel_no {parcel_no}")
 
         try:
-            response = requests.get(url, headers=self._get_headers(), timeout=10)
+            response = self.client.get(path, headers=self._get_headers())
             return self._handle_response(response, context)
         except requests.exceptions.RequestException as e:
             logger.error(f"{context}: {e}")
             raise ShippingProviderError(f"{context}: {e}")
 
-    def get_shipping_quote(self, order):
-        total_weight = int(sum(item.product.weight * item.quantity for item in order.items.all()))
-        max_length = max(item.product.length for item in order.items.all())
-        max_width = max(item.product.width for item in order.items.all())
-        max_height = max(item.product.height for item in order.items.all())
-
-        parcels = [{
-            "to_city_code": order.address.city_code,
-            "total_weight": total_weight,
-            "total_value": int(order.total_payable),
-            "length": int(max_length),
-            "width": int(max_width),
-            "height": int(max_height),
-        }]
+    def get_shipping_quote(self, order, parcels=None):
+        return self.request_quote(
+            quote_payload(order, parcels or self.plan(order)), reference=f"order {order.order_id}"
+        )
+
+    def request_quote(self, parcels, reference="parcels"):
         data = {
             "collection_type": "pick_up",
             "from_city_code": settings.POSTEX_FROM_CITY_CODE,
             "parcels": parcels,
         }
 
-        url = f'{self.api_url}/api/v1/shipping/quotes'
-        context = f"Error getting Postex shipping quote for order {order.order_id}"
-        logger.info(f"Getting Postex shipping quote for order {order.order_id} with data: {data}")
+        path = '/api/v1/shipping/quotes'
+        context = f"Error getting Postex shipping quote for {reference}"
+        logger.info(f"Getting Postex shipping quote for {reference} with data: {data}")
 
         try:
-            response = requests.post(url, json=data, headers=self._get_headers(), timeout=10)
+            response = self.client.post(path, json=data, headers=self._get_headers())
             return self._handle_response(response, context)
         except requests.exceptions.RequestException as e:
             logger.error(f"{context}: {e}")
             raise ShippingProviderError(f"{context}: {e}")
 
     def cancel_shipment(self, parcel_no):
-        url = f'{self.api_url}/api/v1/parcels/{parcel_no}'
+        path = f'/api/v1/parcels/{parcel_no}'
         context = f"Error canceling Postex shipment for parcel_no {parcel_no}"
         logger.info(f"Canceling Postex shipment for parcel_no {parcel_no}")
 
         try:
-            response = requests.delete(url, headers=self._get_headers(), timeout=10)
+            response = self.client.delete(path, headers=self._get_headers())
             return self._handle_response(response, context)
         except requests.exceptions.RequestException as e:
             logger.error(f"{context}: {e}")
             raise ShippingProviderError(f"{context}: {e}")
 
     def get_cities(self):
-        url = f'{self.api_url}/api/v1/locality/cities/all'
+        return self.fetch_cities()[0]
+
+    def fetch_cities(self, etag=None):
+        """
+        Conditional variant of ``get_cities``.
+
+        :return: ``(cities, etag)``; ``cities`` is None if the list has not
+            changed since ``etag``.
+        """
+        path = '/api/v1/locality/cities/all'
         context = "Error getting Postex city list"
+        headers = self._get_headers()
+        if etag:
+            headers['If-None-Match'] = etag
         logger.info("Getting Postex city list")
 
         try:
-            response = requests.get(url, headers=self._get_headers(), timeout=10)
-            return self._handle_response(response, context)
+            response = self.client.get(path, headers=headers)
         except requests.exceptions.RequestException as e:
             logger.error(f"{context}: {e}")
             raise ShippingProviderError(f"{context}: {e}")
+        if response.status_code == 304:
+            return None, etag
+        return self._handle_response(response, context), response.headers.get('ETag')
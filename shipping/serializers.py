@@ -0,0 +1,17 @@
+from rest_framework import serializers
+
+from .models import Shipment, ShipmentEvent
+
+
+class ShipmentEventSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = ShipmentEvent
+        fields = ['status', 'description', 'occurred_at']
+
+
+class ShipmentSerializer(serializers.ModelSerializer):
+    events = ShipmentEventSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Shipment
+        fields = ['parcel_no', 'status', 'is_final', 'last_event_at', 'events']
@@ -0,0 +1,313 @@
+"""
+Local Postex state: the city list, shipping quotes and parcel tracking.
+
+The city list lives in the ``PostexCity`` table, refreshed daily with a
+conditional request to Postex, and is served with an ETag derived from the
+table. Quotes are cached per route and per bucketed parcel, so orders of a
+similar size to the same city share one Postex call. A quote stays fresh for
+``QUOTE_FRESH_FOR`` seconds. After that it is still served for up to
+``QUOTE_STALE_FOR`` more seconds while a Celery task fetches a new one.
+
+Tracking events are stored as ``ShipmentEvent`` rows as they arrive by
+webhook or by polling, and each ``Shipment`` mirrors its parcel's latest
+status, so order pages never call Postex.
+"""
+import hashlib
+import json
+import logging
+import math
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Max, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from orders.models import Order
+from .models import PostexCity, Shipment, ShipmentEvent
+from .parcels import quote_payload
+from .providers import PostexShippingProvider, ShippingProviderError
+
+logger = logging.getLogger(__name__)
+
+CITIES_ETAG_KEY = "shipping:cities:upstream-etag"
+
+QUOTE_FRESH_FOR = 60 * 60
+QUOTE_STALE_FOR = 24 * 60 * 60
+QUOTE_REFRESH_LOCK_TIMEOUT = 60
+# Quotes are requested for the upper bound of each bucket, so a cached price
+# never undercharges an order that falls in the same bucket.
+QUOTE_BUCKETS = {
+    "total_weight": 500,  # grams
+    "length": 5,  # cm
+    "width": 5,
+    "height": 5,
+    "total_value": 500000,
+}
+
+# Carrier statuses after which a parcel no longer changes.
+FINAL_SHIPMENT_STATUSES = {"delivered", "returned", "canceled"}
+DELIVERED_SHIPMENT_STATUS = "delivered"
+# (changed within, poll every): parcels that moved recently are polled more
+# often than ones that have been sitting still.
+POLL_BUCKETS = [
+    (timedelta(days=1), timedelta(minutes=30)),
+    (timedelta(days=3), timedelta(hours=2)),
+]
+POLL_IDLE_INTERVAL = timedelta(hours=12)
+POLL_BATCH_SIZE = 100
+
+
+def refresh_cities():
+    """
+    Sync ``PostexCity`` with the Postex city list. Only rows that changed
+    are written, so the served ETag changes only when the list does.
+
+    :return: The number of cities added, changed or removed.
+    """
+    etag = cache.get(CITIES_ETAG_KEY) if PostexCity.objects.exists() else None
+    cities, etag = PostexShippingProvider().fetch_cities(etag)
+    if cities is None:
+        return 0
+
+    entries = cities.get('data', []) if isinstance(cities, dict) else cities
+    incoming = {}
+    for entry in entries:
+        code = entry.get('code', entry.get('city_code'))
+        if code is None:
+            logger.warning(f"Skipping Postex city without a code: {entry}")
+            continue
+        incoming[int(code)] = entry
+    if not incoming:
+        # Never wipe the table because of an empty or malformed response.
+        logger.error("Postex returned an empty city list; keeping the cached one.")
+        return 0
+
+    with transaction.atomic():
+        existing = dict(PostexCity.objects.values_list('code', 'data'))
+        removed = existing.keys() - incoming.keys()
+        changed = [
+            PostexCity(code=code, name=entry.get('name', entry.get('city_name', '')), data=entry)
+            for code, entry in incoming.items()
+            if existing.get(code) != entry
+        ]
+        PostexCity.objects.filter(code__in=removed).delete()
+        PostexCity.objects.bulk_create(
+            changed, update_conflicts=True, unique_fields=['code'], update_fields=['name', 'data', 'updated']
+        )
+
+    if etag:
+        cache.set(CITIES_ETAG_KEY, etag, None)
+    logger.info(f"Postex city list refreshed: {len(changed)} changed, {len(removed)} removed.")
+    return len(changed) + len(removed)
+
+
+def city_list_etag(request=None, *args, **kwargs):
+    """
+    ETag of the city list, for ``django.views.decorators.http.etag``.
+    """
+    state = PostexCity.objects.aggregate(count=Count('code'), updated=Max('updated'))
+    if not state['count']:
+        return None
+    return hashlib.md5(f"{state['count']}:{state['updated'].isoformat()}".encode(), usedforsecurity=False).hexdigest()
+
+
+def get_city_list():
+    """
+    The cached Postex city list, fetched once if the table is still empty.
+    """
+    cities = list(PostexCity.objects.values_list('data', flat=True))
+    if not cities:
+        refresh_cities()
+        cities = list(PostexCity.objects.values_list('data', flat=True))
+    return cities
+
+
+def _bucket(value, size):
+    return math.ceil(value / size) * size
+
+
+def _bucketed(parcel):
+    parcel = {**parcel}
+    for field, size in QUOTE_BUCKETS.items():
+        parcel[field] = _bucket(parcel[field], size)
+    return parcel
+
+
+def _quote_key(parcels):
+    route = [settings.POSTEX_FROM_CITY_CODE, parcels]
+    return "shipping:quote:" + hashlib.md5(json.dumps(route, sort_keys=True).encode(), usedforsecurity=False).hexdigest()
+
+
+def _store_quote(key, quote):
+    cache.set(key, {"quote": quote, "fresh_until": time.time() + QUOTE_FRESH_FOR}, QUOTE_FRESH_FOR + QUOTE_STALE_FOR)
+    return quote
+
+
+def get_shipping_quote(order):
+    """
+    The Postex quote for the order's parcels, served from the quote cache
+    when a similar shipment to the same city was quoted recently.
+
+    :raises ShippingProviderError: If there is nothing cached and Postex
+        fails.
+    """
+    from .tasks import refresh_shipping_quote
+
+    provider = PostexShippingProvider()
+    parcels = [_bucketed(parcel) for parcel in quote_payload(order, provider.plan(order))]
+    key = _quote_key(parcels)
+    cached = cache.get(key)
+    if cached is None:
+        return _store_quote(key, provider.request_quote(parcels, reference=f"order {order.order_id}"))
+    if cached["fresh_until"] < time.time() and cache.add(f"{key}:refreshing", 1, QUOTE_REFRESH_LOCK_TIMEOUT):
+        refresh_shipping_quote.delay(parcels)
+    return cached["quote"]
+
+
+def refresh_quote(parcels):
+    """
+    Fetch and cache the quote for bucketed quote ``parcels``.
+    """
+    key = _quote_key(parcels)
+    quote = _store_quote(key, PostexShippingProvider().request_quote(parcels))
+    cache.delete(f"{key}:refreshing")
+    return quote
+
+
+def parse_tracking_events(payload):
+    """
+    Normalise the events of a Postex tracking response or webhook body to
+    ``ShipmentEvent`` fields. Entries without a status or a time are skipped.
+    """
+    events = payload.get('data', payload) if isinstance(payload, dict) else payload
+    if isinstance(events, dict):
+        events = events.get('events', [events])
+    parsed = []
+    for entry in events or []:
+        status = entry.get('status') or entry.get('code')
+        occurred_at = parse_datetime(str(entry.get('date') or entry.get('created_at') or ''))
+        if not status or occurred_at is None:
+            logger.warning(f"Skipping malformed Postex tracking event: {entry}")
+            continue
+        if timezone.is_naive(occurred_at):
+            occurred_at = timezone.make_aware(occurred_at)
+        parsed.append({
+            "status": str(status).lower(),
+            "description": str(entry.get('description') or entry.get('title') or '')[:255],
+            "occurred_at": occurred_at,
+            "data": entry,
+        })
+    return parsed
+
+
+def _apply_events(shipment, events, source):
+    """
+    Move ``shipment`` to its latest event, in memory, and return the
+    unsaved ``ShipmentEvent`` rows.
+    """
+    latest = max(events, key=lambda event: event["occurred_at"], default=None)
+    if latest and (shipment.last_event_at is None or latest["occurred_at"] >= shipment.last_event_at):
+        shipment.status = latest["status"]
+        shipment.last_event_at = latest["occurred_at"]
+        shipment.is_final = latest["status"] in FINAL_SHIPMENT_STATUSES
+    return [ShipmentEvent(shipment=shipment, source=source, **event) for event in events]
+
+
+def _sync_order(order, parcels):
+    order.shipping_status = max(parcels, key=lambda shipment: shipment.last_event_at or shipment.created).status
+    if order.status == Order.Status.PROCESSING and any(shipment.last_event_at for shipment in parcels):
+        order.status = Order.Status.SHIPPED
+        # Saved on its own: orders may only reach DELIVERED from SHIPPED.
+        order.save(update_fields=['status', 'shipping_status', 'updated'])
+    if order.status == Order.Status.SHIPPED and all(
+        shipment.status == DELIVERED_SHIPMENT_STATUS for shipment in parcels
+    ):
+        order.status = Order.Status.DELIVERED
+    order.save(update_fields=['status', 'shipping_status', 'updated'])
+
+
+def _sync_orders(order_ids):
+    """
+    Mirror the shipments' state onto their orders: the latest carrier
+    status, SHIPPED once a parcel moves and DELIVERED once all are delivered.
+    An order that cannot be updated is logged and left as it is.
+    """
+    shipments = {}
+    for shipment in Shipment.objects.filter(order_id__in=order_ids):
+        shipments.setdefault(shipment.order_id, []).append(shipment)
+    for order in Order.objects.filter(order_id__in=order_ids):
+        try:
+            with transaction.atomic():
+                _sync_order(order, shipments.get(order.order_id, []))
+        except Exception:
+            logger.exception(f"Could not update order {order.order_id} from its shipments.")
+
+
+def record_webhook_events(payload):
+    """
+    Store the tracking events of a Postex webhook call.
+
+    :raises Shipment.DoesNotExist: If the parcel is not one of ours.
+    """
+    shipment = Shipment.objects.get(parcel_no=str(payload.get('parcel_no', '')))
+    records = _apply_events(shipment, parse_tracking_events(payload), ShipmentEvent.Source.WEBHOOK)
+    with transaction.atomic():
+        ShipmentEvent.objects.bulk_create(records, ignore_conflicts=True)
+        shipment.save(update_fields=['status', 'is_final', 'last_event_at'])
+        _sync_orders([shipment.order_id])
+    return shipment
+
+
+def due_shipments(now=None):
+    """
+    Parcels still in flight whose polling interval, picked by how recently
+    they last changed, has passed; least recently checked first.
+    """
+    now = now or timezone.now()
+    due = Q(last_checked_at__isnull=True) | Q(last_checked_at__lt=now - POLL_IDLE_INTERVAL)
+    for changed_within, interval in POLL_BUCKETS:
+        due |= Q(changed_at__gte=now - changed_within, last_checked_at__lt=now - interval)
+    return Shipment.objects.filter(is_final=False).annotate(
+        changed_at=Coalesce('last_event_at', 'created')
+    ).filter(due).order_by(F('last_checked_at').asc(nulls_first=True))
+
+
+def poll_shipments(batch_size=POLL_BATCH_SIZE):
+    """
+    Refresh one batch of due parcels from Postex, storing the batch's events
+    and state with bulk writes.
+
+    :return: The number of parcels checked.
+    """
+    now = timezone.now()
+    provider = PostexShippingProvider()
+    checked, records, changed = [], [], set()
+    for shipment in due_shipments(now)[:batch_size]:
+        try:
+            payload = provider.get_shipment_tracking(shipment.parcel_no)
+        except ShippingProviderError as e:
+            # Left unchecked, so it is picked up again on the next run.
+            logger.warning(f"Failed to poll Postex tracking for parcel {shipment.parcel_no}: {e}")
+            continue
+        state = (shipment.status, shipment.last_event_at)
+        try:
+            records += _apply_events(shipment, parse_tracking_events(payload), ShipmentEvent.Source.POLL)
+        except Exception:
+            # Checked anyway, so one bad response cannot hold up the queue.
+            logger.exception(f"Could not read Postex tracking for parcel {shipment.parcel_no}.")
+        if (shipment.status, shipment.last_event_at) != state:
+            changed.add(shipment.order_id)
+        shipment.last_checked_at = now
+        checked.append(shipment)
+
+    with transaction.atomic():
+        ShipmentEvent.objects.bulk_create(records, ignore_conflicts=True)
+        Shipment.objects.bulk_update(checked, ['status', 'is_final', 'last_event_at', 'last_checked_at'])
+        if changed:
+            _sync_orders(changed)
+    return len(checked)
@@ -1,4 +1,7 @@
 from celery import shared_task
+from django.db import transaction
+from . import services
+from .models import Shipment
 from .providers import PostexShippingProvider, ShippingProviderError
 from orders.models import Order
 import logging
@@ -15,16 +18,21 @@ def create_postex_shipment_task(order_id):
         shipping_response = shipping_provider.create_shipment(order)
 
         orders_data = shipping_response.get('data', {}).get('orders', [])
-        if orders_data and orders_data[0].get('parcels'):
-            parcel_data = orders_data[0]['parcels'][0]
-
+        parcels = [parcel for entry in orders_data for parcel in entry.get('parcels', []) if parcel.get('parcel_no')]
+        if parcels:
             order.shipping_provider = 'postex'
-            order.postex_parcel_no = parcel_data.get('parcel_no')
-            order.postex_order_no = orders_data[0].get('order_no')
+            order.postex_shipment_id = orders_data[0].get('order_no') or ''
+            order.shipping_tracking_code = str(parcels[0]['parcel_no'])
             order.status = Order.Status.PROCESSING
-            order.save(update_fields=['shipping_provider', 'postex_parcel_no', 'postex_order_no', 'status'])
+            with transaction.atomic():
+                order.save(update_fields=['shipping_provider', 'postex_shipment_id', 'shipping_tracking_code', 'status'])
+                # Tracking state is mirrored locally from here on; see poll_shipments.
+                Shipment.objects.bulk_create(
+                    [Shipment(parcel_no=str(parcel['parcel_no']), order=order) for parcel in parcels],
+                    ignore_conflicts=True,
+                )
 
-            logger.info(f"Successfully created shipment for order: {order_id} with parcel_no: {order.postex_parcel_no}")
+            logger.info(f"Successfully created shipment for order: {order_id} with parcel_no: {order.shipping_tracking_code}")
         else:
             logger.error(f"Postex response for order {order_id} was successful but lacked expected data: {shipping_response}")
             # Potentially raise an error to trigger a retry if the data format is unexpectedly wrong
@@ -42,3 +50,22 @@ def create_postex_shipment_task(order_id):
         logger.exception(f"An unexpected error occurred in create_postex_shipment_task for order {order_id}.")
         # Depending on the policy, you might want to retry this too.
         # For now, we let it fail.
+
+
+@shared_task(autoretry_for=(ShippingProviderError,), retry_kwargs={'max_retries': 3, 'countdown': 300})
+def refresh_postex_cities():
+    return services.refresh_cities()
+
+
+@shared_task
+def refresh_shipping_quote(parcels):
+    try:
+        services.refresh_quote(parcels)
+    except ShippingProviderError as e:
+        # The stale quote keeps being served until it expires.
+        logger.warning(f"Failed to refresh Postex shipping quote: {e}")
+
+
+@shared_task
+def poll_shipments():
+    return services.poll_shipments()
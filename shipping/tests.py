@@ -1,63 +1,72 @@
 from decimal import Decimal
 from unittest.mock import patch
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APITestCase
 from orders.models import Order
 from account.models import Address
+from ecommerce_api.core.tests.stub_server import stub_provider
 
 User = get_user_model()
 
 
+@override_settings(POSTEX_API_KEY='test-api-key')
 class ShippingProviderTests(TestCase):
-    @patch('shipping.providers.requests.post')
-    def test_postex_create_shipment(self, mock_post):
-        mock_post.return_value.status_code = 200
-        mock_post.return_value.json.return_value = {'status': 'success'}
-        from shipping.providers import PostexShippingProvider
-        provider = PostexShippingProvider()
+    def setUp(self):
+        self.server = stub_provider(self, 'postex')
+
+    def create_order(self, items=1):
+        from orders.models import OrderItem
+        from shop.factories import ProductFactory
         user = User.objects.create(username='testuser')
         address = Address.objects.create(user=user, city_code=1)
         order = Order.objects.create(user=user, address=address, total_payable=Decimal('100.00'))
+        for _ in range(items):
+            product = ProductFactory(length=10, width=10, height=10, weight=500)
+            OrderItem.objects.create(order=order, product=product, product_name=product.name, price=Decimal('100.00'))
+        return order
+
+    def test_postex_create_shipment(self):
+        self.server.respond('POST', '/api/v1/parcels/bulk', json={'status': 'success'})
+        from shipping.providers import PostexShippingProvider
+        provider = PostexShippingProvider()
+        order = self.create_order()
         response = provider.create_shipment(order)
         self.assertEqual(response['status'], 'success')
 
-    @patch('shipping.providers.requests.get')
-    def test_postex_get_shipment_tracking(self, mock_get):
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = {'status': 'success'}
+    def test_postex_get_shipment_tracking(self):
+        self.server.respond('GET', '/api/v1/tracking/events/12345', json={'status': 'success'})
         from shipping.providers import PostexShippingProvider
         provider = PostexShippingProvider()
         response = provider.get_shipment_tracking('12345')
         self.assertEqual(response['status'], 'success')
 
-    @patch('shipping.providers.requests.post')
-    def test_postex_get_shipping_quote(self, mock_post):
-        mock_post.return_value.status_code = 200
-        mock_post.return_value.json.return_value = {'data': [{'price': 15000}]}
+    def test_postex_get_shipping_quote(self):
+        self.server.respond('POST', '/api/v1/shipping/quotes', json={'data': [{'price': 15000}]})
         from shipping.providers import PostexShippingProvider
         provider = PostexShippingProvider()
-        user = User.objects.create(username='testuser')
-        address = Address.objects.create(user=user, city_code=1)
-        order = Order.objects.create(user=user, address=address, total_payable=Decimal('100.00'))
+        order = self.create_order()
         response = provider.get_shipping_quote(order)
         self.assertEqual(response['data'][0]['price'], 15000)
 
-    @patch('shipping.providers.requests.delete')
-    def test_postex_cancel_shipment(self, mock_delete):
-        mock_delete.return_value.status_code = 200
-        mock_delete.return_value.json.return_value = {'status': 'success'}
+    def test_postex_rejects_orders_without_items(self):
+        from shipping.providers import PostexShippingProvider, ShippingProviderError
+        order = self.create_order(items=0)
+        with self.assertRaisesMessage(ShippingProviderError, 'has no items to ship'):
+            PostexShippingProvider().create_shipment(order)
+        self.assertEqual(self.server.requests, [])
+
+    def test_postex_cancel_shipment(self):
+        self.server.respond('DELETE', '/api/v1/parcels/12345', json={'status': 'success'})
         from shipping.providers import PostexShippingProvider
         provider = PostexShippingProvider()
         response = provider.cancel_shipment('12345')
         self.assertEqual(response['status'], 'success')
 
-    @patch('shipping.providers.requests.get')
-    def test_postex_get_cities(self, mock_get):
-        mock_get.return_value.status_code = 200
-        mock_get.return_value.json.return_value = [{'name': 'Tehran'}]
+    def test_postex_get_cities(self):
+        self.server.respond('GET', '/api/v1/locality/cities/all', json=[{'name': 'Tehran'}])
         from shipping.providers import PostexShippingProvider
         provider = PostexShippingProvider()
         response = provider.get_cities()
@@ -97,3 +106,232 @@ class ShippingAPIViewTests(APITestCase):
         data = {'order_id': str(self.order.order_id)}
         response = self.client.post(self.calculate_shipping_url, data)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class ParcelPlanningTests(TestCase):
+    limits = {'length': 100, 'width': 60, 'height': 60, 'weight': 30000}
+
+    def setUp(self):
+        from account.factories import UserFactory
+        user = UserFactory()
+        address = Address.objects.create(user=user, city_code=1, receiver_name='r', receiver_phone='09120000000')
+        self.order = Order.objects.create(user=user, address=address)
+
+    def add_item(self, quantity, length, width, height, weight, price=Decimal('10.00')):
+        from orders.models import OrderItem
+        from shop.factories import ProductFactory
+        product = ProductFactory(length=length, width=width, height=height, weight=weight)
+        return OrderItem.objects.create(
+            order=self.order, product=product, product_name=product.name, price=price, quantity=quantity
+        )
+
+    def plan(self):
+        from shipping.parcels import plan_parcels
+        return plan_parcels(self.order, self.limits)
+
+    def test_items_are_packed_side_by_side(self):
+        self.add_item(2, 50, 60, 30, 1000)
+        self.add_item(1, 50, 60, 60, 2000)
+
+        with self.assertNumQueries(1):
+            parcels = self.plan()
+
+        self.assertEqual(len(parcels), 1)
+        self.assertEqual(parcels[0].properties(), {
+            'total_weight': 4000, 'total_value': 30, 'length': 100, 'width': 60, 'height': 60,
+        })
+
+    def test_parcels_respect_the_weight_limit(self):
+        item = self.add_item(5, 10, 10, 10, 12000)
+
+        parcels = self.plan()
+
+        self.assertEqual([parcel.items for parcel in parcels], [[(item, 2)], [(item, 2)], [(item, 1)]])
+        self.assertTrue(all(parcel.weight <= 30000 for parcel in parcels))
+
+    def test_parcels_respect_the_size_limit(self):
+        self.add_item(3, 100, 60, 40, 500)
+
+        parcels = self.plan()
+
+        self.assertEqual(len(parcels), 3)
+        self.assertEqual(
+            [parcels[0].properties()[key] for key in ('length', 'width', 'height')], [100, 60, 40]
+        )
+
+    def test_small_units_are_stacked(self):
+        self.add_item(500, 10, 10, 1, 10)
+
+        parcels = self.plan()
+
+        self.assertEqual(len(parcels), 1)
+        self.assertEqual(sum(count for _, count in parcels[0].items), 500)
+
+    @override_settings(POSTEX_API_KEY='test-api-key', POSTEX_PARCEL_LIMITS=limits)
+    def test_quote_sends_one_entry_per_parcel(self):
+        from shipping.providers import PostexShippingProvider
+        server = stub_provider(self, 'postex')
+        server.respond('POST', '/api/v1/shipping/quotes', json={'data': {'quotes': []}})
+        self.add_item(2, 100, 60, 60, 1000)
+
+        PostexShippingProvider().get_shipping_quote(self.order)
+
+        parcels = server.requests[-1]['json']['parcels']
+        self.assertEqual(len(parcels), 2)
+        self.assertEqual(parcels[0]['to_city_code'], 1)
+
+
+@override_settings(
+    POSTEX_API_KEY='test-api-key',
+    CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'shipping-tests'}},
+)
+class ShippingDataCacheTests(APITestCase):
+    def setUp(self):
+        from django.core.cache import cache
+        cache.clear()
+        self.server = stub_provider(self, 'postex')
+        self.user = User.objects.create_user(
+            phone_number='+989123456713',
+            email='testcache@example.com',
+            username='testcacheuser',
+            password='password'
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def test_city_list_is_served_from_the_table_with_an_etag(self):
+        from shipping.models import PostexCity
+        from shipping.services import refresh_cities
+        self.server.respond('GET', '/api/v1/locality/cities/all', json={'data': [
+            {'code': 1, 'name': 'Tehran'}, {'code': 2, 'name': 'Shiraz'},
+        ]}, headers={'ETag': '"v1"'})
+        url = reverse('shipping:city-list')
+
+        # The first request fills the table.
+        self.client.get(url)
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([city['name'] for city in response.data['data']], ['Shiraz', 'Tehran'])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(len(self.server.requests), 1)
+
+        self.server.respond('GET', '/api/v1/locality/cities/all', status=304)
+        self.assertEqual(refresh_cities(), 0)
+        self.assertEqual(self.server.requests[-1]['headers']['If-None-Match'], '"v1"')
+        self.assertEqual(PostexCity.objects.count(), 2)
+
+    def make_order(self, quantity):
+        from orders.models import OrderItem
+        from shop.factories import ProductFactory
+        address = Address.objects.create(user=self.user, city_code=5)
+        order = Order.objects.create(user=self.user, address=address)
+        product = ProductFactory(length=10, width=10, height=1, weight=100)
+        OrderItem.objects.create(order=order, product=product, product_name='p', price=Decimal('10.00'), quantity=quantity)
+        return order
+
+    @patch('shipping.tasks.refresh_shipping_quote.delay')
+    def test_similar_quotes_share_the_cache(self, mock_refresh):
+        import time
+        from shipping import services
+        self.server.respond('POST', '/api/v1/shipping/quotes', json={'data': {'quotes': [{'price': 15000}]}})
+        url = reverse('shipping:calculate-cost')
+
+        for quantity in (1, 2):
+            response = self.client.post(url, {'order_id': str(self.make_order(quantity).order_id)})
+            self.assertEqual(response.data['data']['shipping_cost'], 15000)
+        self.assertEqual(len(self.server.requests), 1)
+
+        with patch.object(services.time, 'time', return_value=time.time() + services.QUOTE_FRESH_FOR + 1):
+            response = self.client.post(url, {'order_id': str(self.make_order(3).order_id)})
+        self.assertEqual(response.data['data']['shipping_cost'], 15000)
+        self.assertEqual(len(self.server.requests), 1)
+        mock_refresh.assert_called_once()
+
+
+@override_settings(POSTEX_API_KEY='test-api-key', POSTEX_WEBHOOK_SECRET='postex-secret')
+class ShipmentTrackingTests(APITestCase):
+    def setUp(self):
+        from shipping.models import Shipment
+        self.server = stub_provider(self, 'postex')
+        self.user = User.objects.create_user(
+            phone_number='+989123456714',
+            email='testtracking@example.com',
+            username='testtrackinguser',
+            password='password'
+        )
+        self.order = Order.objects.create(user=self.user, status=Order.Status.PROCESSING)
+        self.shipment = Shipment.objects.create(parcel_no='P1', order=self.order)
+        self.webhook_url = reverse('shipping:webhook')
+
+    def post_webhook(self, payload, secret='postex-secret'):
+        return self.client.post(self.webhook_url, payload, format='json', HTTP_X_POSTEX_SECRET=secret)
+
+    def test_webhook_rejects_an_invalid_secret(self):
+        response = self.post_webhook({'parcel_no': 'P1', 'status': 'picked_up'}, secret='wrong')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_webhook_events_update_the_local_state(self):
+        event = {'parcel_no': 'P1', 'status': 'picked_up', 'date': '2026-01-01T10:00:00Z'}
+        self.assertEqual(self.post_webhook(event).status_code, status.HTTP_200_OK)
+        self.post_webhook(event)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.Status.SHIPPED)
+        self.assertEqual(self.shipment.events.count(), 1)
+
+        self.post_webhook({'parcel_no': 'P1', 'status': 'Delivered', 'date': '2026-01-02T10:00:00Z'})
+        self.order.refresh_from_db()
+        self.shipment.refresh_from_db()
+        self.assertEqual(self.order.status, Order.Status.DELIVERED)
+        self.assertEqual(self.order.shipping_status, 'delivered')
+        self.assertTrue(self.shipment.is_final)
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(reverse('shipping:tracking', args=[self.order.order_id]))
+        self.assertEqual(
+            [event['status'] for event in response.data['data']['shipments'][0]['events']],
+            ['picked_up', 'delivered'],
+        )
+        self.assertEqual(len(self.server.requests), 0)
+
+    def test_poller_checks_only_due_parcels(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from shipping.models import Shipment
+        from shipping.services import poll_shipments
+        Shipment.objects.create(parcel_no='P2', order=self.order, last_checked_at=timezone.now())
+        Shipment.objects.create(parcel_no='P3', order=self.order, is_final=True)
+        Shipment.objects.filter(parcel_no='P1').update(last_checked_at=timezone.now() - timedelta(hours=1))
+        self.server.respond('GET', '/api/v1/tracking/events/P1', json={'data': {'events': [
+            {'status': 'picked_up', 'date': '2026-01-01T10:00:00Z'},
+            {'status': 'in_transit', 'date': '2026-01-01T12:00:00Z'},
+        ]}})
+
+        self.assertEqual(poll_shipments(), 1)
+
+        self.assertEqual([request['path'] for request in self.server.requests], ['/api/v1/tracking/events/P1'])
+        self.shipment.refresh_from_db()
+        self.assertEqual(self.shipment.status, 'in_transit')
+        self.assertEqual(self.shipment.events.count(), 2)
+        self.assertEqual(poll_shipments(), 0)
+
+    def test_first_event_already_delivered(self):
+        response = self.post_webhook({'parcel_no': 'P1', 'status': 'delivered', 'date': '2026-01-02T10:00:00Z'})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.order.refresh_from_db()
+        self.assertEqual(self.order.status, Order.Status.DELIVERED)
+
+    def test_poller_moves_on_when_an_order_cannot_be_updated(self):
+        from django.core.exceptions import ValidationError
+        from shipping.services import poll_shipments
+        self.server.respond('GET', '/api/v1/tracking/events/P1', json={'data': {'events': [
+            {'status': 'delivered', 'date': '2026-01-02T10:00:00Z'},
+        ]}})
+
+        with patch('shipping.services._sync_order', side_effect=ValidationError('invalid')):
+            self.assertEqual(poll_shipments(), 1)
+
+        self.shipment.refresh_from_db()
+        self.assertIsNotNone(self.shipment.last_checked_at)
+        self.assertEqual(self.shipment.status, 'delivered')
+        self.assertEqual(poll_shipments(), 0)
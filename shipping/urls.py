@@ -1,10 +1,12 @@
 from django.urls import path
 
-from .views import CalculateShippingCostAPIView, CityListAPIView
+from .views import CalculateShippingCostAPIView, CityListAPIView, PostexWebhookAPIView, ShipmentTrackingAPIView
 
 app_name = 'shipping'
 
 urlpatterns = [
     path('calculate-cost/', CalculateShippingCostAPIView.as_view(), name='calculate-cost'),
     path('cities/', CityListAPIView.as_view(), name='city-list'),
+    path('webhook/', PostexWebhookAPIView.as_view(), name='webhook'),
+    path('tracking/<uuid:order_id>/', ShipmentTrackingAPIView.as_view(), name='tracking'),
 ]
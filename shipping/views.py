@@ -1,18 +1,31 @@
+import hmac
+
 from rest_framework.views import APIView
 from rest_framework import status
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from django.conf import settings
 from django.shortcuts import get_object_or_404
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import etag
 from orders.models import Order
-from .providers import PostexShippingProvider, ShippingProviderError
+from . import services
+from .models import Shipment
+from .providers import ShippingProviderError
+from .serializers import ShipmentSerializer
 from ecommerce_api.core.api_standard_response import ApiResponse
 import logging
 
 logger = logging.getLogger(__name__)
 
 class CityListAPIView(APIView):
+    """
+    Serves the Postex city list from the local copy, with an ETag so that
+    clients can revalidate it cheaply.
+    """
+    @method_decorator(etag(services.city_list_etag))
     def get(self, request, *args, **kwargs):
         try:
-            provider = PostexShippingProvider()
-            response = provider.get_cities()
+            response = services.get_city_list()
             return ApiResponse.success(data=response, status_code=status.HTTP_200_OK)
         except ShippingProviderError as e:
             logger.error(f"Failed to get city list from Postex: {e}")
@@ -34,8 +47,7 @@ class CalculateShippingCostAPIView(APIView):
             return ApiResponse.error(message='Order address is not set', status_code=status.HTTP_400_BAD_REQUEST)
 
         try:
-            provider = PostexShippingProvider()
-            response = provider.get_shipping_quote(order)
+            response = services.get_shipping_quote(order)
 
             quotes = response.get('data', {}).get('quotes', [])
             if not quotes:
@@ -56,3 +68,44 @@ class CalculateShippingCostAPIView(APIView):
         except Exception as e:
             logger.exception(f"An unexpected error occurred while calculating shipping cost for order {order_id}.")
             return ApiResponse.error(message="An unexpected error occurred.", status_code=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+class PostexWebhookAPIView(APIView):
+    """
+    Receives Postex tracking updates and stores them as shipment events.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def post(self, request, *args, **kwargs):
+        secret = request.headers.get('X-Postex-Secret', '')
+        if not settings.POSTEX_WEBHOOK_SECRET or not hmac.compare_digest(secret, settings.POSTEX_WEBHOOK_SECRET):
+            return ApiResponse.error(message='Invalid webhook secret.', status_code=status.HTTP_403_FORBIDDEN)
+
+        try:
+            services.record_webhook_events(request.data)
+        except Shipment.DoesNotExist:
+            # Acknowledge, so that Postex does not keep retrying.
+            logger.warning(f"Postex webhook for unknown parcel: {request.data.get('parcel_no')}")
+            return ApiResponse.success(message='Unknown parcel; ignored.', status_code=status.HTTP_200_OK)
+        return ApiResponse.success(message='Webhook processed.', status_code=status.HTTP_200_OK)
+
+
+class ShipmentTrackingAPIView(APIView):
+    """
+    Tracking history of an order's parcels, read from the local mirror.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, order_id, *args, **kwargs):
+        orders = Order.objects.all() if request.user.is_staff else Order.objects.filter(user=request.user)
+        order = get_object_or_404(orders, order_id=order_id)
+        shipments = order.shipments.prefetch_related('events')
+        return ApiResponse.success(
+            data={
+                'order_status': order.status,
+                'shipping_status': order.shipping_status,
+                'shipments': ShipmentSerializer(shipments, many=True).data,
+            },
+            status_code=status.HTTP_200_OK
+        )
@@ -0,0 +1,205 @@
+import bisect
+import heapq
+import json
+import logging
+import threading
+import time
+
+import redis
+from django.conf import settings
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+
+logger = logging.getLogger(__name__)
+
+# Redis pub/sub channel carrying incremental index changes between processes.
+CHANNEL = "catalog:autocomplete"
+# Full rebuilds pick up popularity changes and anything missed while a
+# subscriber was disconnected.
+RELOAD_INTERVAL = 60 * 15  # 15 minutes
+# Upper bound on index keys inspected per lookup, so one-letter prefixes on a
+# large catalog stay cheap. Ranking is exact whenever fewer keys match.
+MAX_SCAN = 2000
+
+
+def normalize(text):
+    return " ".join(text.casefold().split())
+
+
+class AutocompleteIndex:
+    """
+    In-memory prefix index over product names, ranked by popularity.
+
+    Every word suffix of a name ("the pragmatic programmer", "pragmatic
+    programmer", "programmer") is kept in one sorted array, so a prefix of any
+    word is found with a binary search. Writers build a new array and swap it
+    in, so lookups never take the lock and never see a half-applied change.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []  # sorted (key, product_id) pairs
+        self._entries = {}  # product_id -> (name, weight)
+        self.loaded_at = None
+
+    @staticmethod
+    def _keys_for(product_id, name):
+        words = normalize(name).split(" ")
+        return [(" ".join(words[i:]), product_id) for i in range(len(words)) if words[i]]
+
+    def is_stale(self):
+        return self.loaded_at is None or time.monotonic() - self.loaded_at > RELOAD_INTERVAL
+
+    def invalidate(self):
+        self.loaded_at = None
+
+    def load(self, rows):
+        """
+        Replace the index with ``(product_id, name, weight)`` rows.
+        """
+        entries = {}
+        keys = []
+        for product_id, name, weight in rows:
+            product_id = str(product_id)
+            entries[product_id] = (name, weight)
+            keys.extend(self._keys_for(product_id, name))
+        keys.sort()
+        with self._lock:
+            self._keys, self._entries = keys, entries
+            self.loaded_at = time.monotonic()
+
+    def upsert(self, product_id, name):
+        """
+        Add a product or rename it, keeping its popularity weight.
+        """
+        product_id = str(product_id)
+        with self._lock:
+            entries = dict(self._entries)
+            keys = self._keys
+            previous = entries.get(product_id)
+            if previous is not None:
+                if previous[0] == name:
+                    return
+                stale = set(self._keys_for(product_id, previous[0]))
+                keys = [key for key in keys if key not in stale]
+            else:
+                keys = list(keys)
+            entries[product_id] = (name, previous[1] if previous else 0)
+            for key in self._keys_for(product_id, name):
+                bisect.insort(keys, key)
+            self._keys, self._entries = keys, entries
+
+    def remove(self, product_id):
+        product_id = str(product_id)
+        with self._lock:
+            if product_id not in self._entries:
+                return
+            entries = dict(self._entries)
+            name, _ = entries.pop(product_id)
+            stale = set(self._keys_for(product_id, name))
+            self._keys = [key for key in self._keys if key not in stale]
+            self._entries = entries
+
+    def suggest(self, prefix, limit=5):
+        """
+        Return up to ``limit`` product names with a word starting with ``prefix``,
+        most popular first.
+        """
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+        keys, entries = self._keys, self._entries
+        weights = {}
+        position = bisect.bisect_left(keys, (prefix,))
+        end = min(len(keys), position + MAX_SCAN)
+        while position < end and keys[position][0].startswith(prefix):
+            product_id = keys[position][1]
+            weights[product_id] = entries[product_id][1]
+            position += 1
+        best = heapq.nsmallest(
+            limit,
+            weights,
+            key=lambda product_id: (-weights[product_id], entries[product_id][0]),
+        )
+        return [entries[product_id][0] for product_id in best]
+
+
+index = AutocompleteIndex()
+_client = None
+_listener = None
+
+
+def _redis():
+    global _client
+    if _client is None:
+        _client = redis.from_url(settings.REDIS_URL)
+    return _client
+
+
+def load_index():
+    """
+    Rebuild the process-wide index from the database. Popularity is the
+    number of units sold.
+    """
+    from .models import Product
+
+    rows = Product.objects.order_by().annotate(
+        sold=Coalesce(Sum("order_items__quantity"), 0)
+    ).values_list("product_id", "name", "sold")
+    index.load(rows)
+
+
+def ensure_loaded():
+    """
+    Load the index on first use in this process (and when it is due for a
+    rebuild), and subscribe to incremental changes. Blocking: call it through
+    ``database_sync_to_async`` from consumers.
+    """
+    if index.is_stale():
+        load_index()
+    _start_listener()
+
+
+def apply_change(change):
+    if change["op"] == "remove":
+        index.remove(change["id"])
+    else:
+        index.upsert(change["id"], change["name"])
+
+
+def publish_change(change):
+    """
+    Apply a change to this process's index and broadcast it to the others.
+    """
+    if index.loaded_at is not None:
+        apply_change(change)
+    if not settings.AUTOCOMPLETE_PUBSUB_ENABLED:
+        return
+    try:
+        _redis().publish(CHANNEL, json.dumps(change))
+    except redis.RedisError:
+        logger.warning("Could not publish autocomplete change.", exc_info=True)
+
+
+def _start_listener():
+    global _listener
+    if not settings.AUTOCOMPLETE_PUBSUB_ENABLED:
+        return
+    if _listener is not None and _listener.is_alive():
+        return
+    _listener = threading.Thread(target=_listen, name="autocomplete-listener", daemon=True)
+    _listener.start()
+
+
+def _listen():
+    while True:
+        try:
+            pubsub = _redis().pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(CHANNEL)
+            for message in pubsub.listen():
+                apply_change(json.loads(message["data"]))
+        except redis.RedisError:
+            logger.warning("Autocomplete subscription lost, retrying.", exc_info=True)
+            # Changes may have been missed: rebuild on the next connection.
+            index.invalidate()
+            time.sleep(5)
@@ -0,0 +1,96 @@
+import time
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+
+PRODUCT_LIST_TIMEOUT = 60 * 5  # 5 minutes
+PRODUCT_DETAIL_TIMEOUT = 60 * 60  # 1 hour
+
+CATALOG_VERSION_KEY = "catalog:version"
+
+
+def _category_version_key(category_slug):
+    return f"catalog:category:{category_slug}:version"
+
+
+def _product_version_key(product_slug):
+    return f"catalog:product:{product_slug}:version"
+
+
+def _new_version():
+    """
+    Seed generations from the clock so a counter evicted from Redis never
+    restarts at a value that older cache entries were written under, other
+    than the unbumped 0.
+    """
+    return int(time.time() * 1000)
+
+
+def _get_version(key):
+    # Read-only: slugs come from requests, including ones that 404, so a
+    # read must never create a key. Generations never bumped are 0.
+    return cache.get(key, 0)
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # The counter does not exist yet (or was evicted).
+        cache.set(key, _new_version(), timeout=None)
+
+
+def product_list_cache_key(query_params):
+    """
+    Build the cache key for a product list page.
+
+    Lists filtered to a single category embed that category's generation, so
+    writes in other categories leave them untouched. Every other list embeds
+    the global catalog generation.
+    """
+    params = sorted(
+        (key, value) for key in query_params for value in query_params.getlist(key)
+    )
+    encoded = urlencode(params)
+    category_slug = query_params.get("category__slug")
+    if category_slug:
+        version = _get_version(_category_version_key(category_slug))
+        return f"product_list:category:{category_slug}:{version}:{encoded}"
+    return f"product_list:{_get_version(CATALOG_VERSION_KEY)}:{encoded}"
+
+
+def product_detail_cache_key(slug, suffix="detail"):
+    """
+    Build a cache key for data derived from a single product.
+    """
+    return f"product:{slug}:{_get_version(_product_version_key(slug))}:{suffix}"
+
+
+def invalidate_product(product, previous_slug=None, previous_category_slug=None):
+    """
+    Retire every cached list and detail entry that can contain the product by
+    bumping the relevant generations. Stale entries are never read again and
+    simply expire, so the cost is O(1) regardless of how many keys exist.
+    """
+    _bump(CATALOG_VERSION_KEY)
+    category_slugs = {product.category.slug, previous_category_slug}
+    product_slugs = {product.slug, previous_slug}
+    for category_slug in filter(None, category_slugs):
+        _bump(_category_version_key(category_slug))
+    for product_slug in filter(None, product_slugs):
+        _bump(_product_version_key(product_slug))
+
+
+def invalidate_product_detail(slug):
+    """
+    Retire the cached detail entries of a single product, leaving lists alone.
+    """
+    _bump(_product_version_key(slug))
+
+
+def invalidate_category(category):
+    """
+    Retire cached lists that can contain products of the category.
+    """
+    _bump(CATALOG_VERSION_KEY)
+    _bump(_category_version_key(category.slug))
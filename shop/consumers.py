@@ -1,12 +1,15 @@
 import json
-import time
 
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
-from django.core.cache import cache
 
+from ecommerce_api.core.throttling import AsyncTokenBucketThrottle
 from shop.models import Product
-from shop.utils import search_products
+from shop import autocomplete
+from shop.search import MODE_TRIGRAM, search_products
+
+# Shorter queries without a prefix match are not worth a fuzzy database search.
+FUZZY_MIN_LENGTH = 3
 
 
 class SearchConsumer(AsyncWebsocketConsumer):
@@ -14,6 +17,9 @@ class SearchConsumer(AsyncWebsocketConsumer):
     WebSocket consumer for handling real-time product search queries.
     """
 
+    # Two queries per second per socket, with bursts of two.
+    throttle = AsyncTokenBucketThrottle("search", rate=2, capacity=2)
+
     def __init__(self, *args, **kwargs):
         super().__init__(args, kwargs)
         self.throttle_id = None
@@ -21,20 +27,13 @@ class SearchConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         """
         Handles the WebSocket connection event.
-        Initializes a throttle ID for rate-limiting and accepts the connection.
+        Initializes a throttle ID for rate-limiting, makes sure this worker's
+        autocomplete index is loaded and accepts the connection.
         """
         self.throttle_id = self.channel_name
+        await database_sync_to_async(autocomplete.ensure_loaded)()
         await self.accept()
 
-    async def disconnect(self, close_code):
-        """
-        Handles the WebSocket disconnection event.
-        Removes any cached data related to the throttle ID.
-        """
-        cache.delete(f"search_suggestions_{self.throttle_id}")
-        cache.delete(f"last_query_{self.throttle_id}")
-        cache.delete(f"throttle_ws_{self.throttle_id}")
-
     async def receive(self, text_data=None, bytes_data=None):
         """
         Handles incoming WebSocket messages.
@@ -58,40 +57,26 @@ class SearchConsumer(AsyncWebsocketConsumer):
         # Send the search results back to the client.
         await self.send(text_data=json.dumps({"results": results}))
 
-    @database_sync_to_async
-    def get_search_suggestions(self, query):
+    async def get_search_suggestions(self, query):
         """
         Fetches search suggestions for the given query.
 
+        Prefix matches are served from the in-process autocomplete index
+        without touching the database. Only queries with no prefix match (most
+        likely typos) fall back to the typo-tolerant database search.
+
         :param query: The search term provided by the client.
         :return: A list of up to 5 product names matching the query.
         """
-        key = f"search_suggestions_{self.throttle_id}"
-        past_results = cache.get(key)
-
-        if past_results and query.startswith(
-            cache.get(f"last_query_{self.throttle_id}", "")
-        ):
-            # Filter cached results if the new query starts with the previous query
-            filtered_results = [
-                product
-                for product in past_results
-                if query.lower() in product[0].lower()
-            ]
-        else:
-            # Fetch results from the database and cache them
-            products = Product.objects.all()
-            filtered_products = search_products(products, query)[:20]
-            filtered_results = list(
-                filtered_products.values_list("name", "description")
-            )
-            cache.set(key, filtered_results, timeout=1)  # Cache results for 1 second
-            cache.set(
-                f"last_query_{self.throttle_id}", query, timeout=1
-            )  # Cache the last query
-
-        # Return only the titles, limited to 5 results
-        return [product[0] for product in filtered_results[:5]]
+        results = autocomplete.index.suggest(query, limit=5)
+        if results or len(query.strip()) < FUZZY_MIN_LENGTH:
+            return results
+        return await self.get_fuzzy_suggestions(query)
+
+    @database_sync_to_async
+    def get_fuzzy_suggestions(self, query):
+        products = search_products(Product.objects.all(), query, mode=MODE_TRIGRAM)
+        return list(products.values_list("name", flat=True)[:5])
 
     async def is_throttled(self):
         """
@@ -99,15 +84,4 @@ class SearchConsumer(AsyncWebsocketConsumer):
 
         :return: True if the client is throttled, False otherwise.
         """
-        key = f"throttle_ws_{self.throttle_id}"
-        now = time.time()
-        cooldown = 0.5  # Minimum time (in seconds) between requests.
-
-        # Retrieve the timestamp of the last request from the cache.
-        last_request = cache.get(key)
-        if last_request and now - last_request < cooldown:
-            return True
-
-        # Update the cache with the current timestamp.
-        cache.set(key, now, timeout=5)
-        return False
+        return not await self.throttle.allow(self.throttle_id)
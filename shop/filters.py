@@ -2,7 +2,7 @@ from django_filters import FilterSet
 from rest_framework.filters import BaseFilterBackend
 
 from .models import Product
-from .utils import search_products
+from .search import MODE_AUTO, SEARCH_MODES, search_products
 
 
 class ProductFilter(FilterSet):
@@ -36,9 +36,14 @@ class InStockFilterBackend(BaseFilterBackend):
 
 class ProductSearchFilterBackend(BaseFilterBackend):
     """
-    Custom filter to search products by name and description.
+    Custom filter to search products by name, tags, category and description.
+    `?search_mode=fulltext|trigram|auto` selects the matching strategy; unknown
+    values fall back to `auto`.
     """
 
     def filter_queryset(self, request, queryset, view):
         search = request.query_params.get("search", None)
-        return search_products(queryset, search)
+        mode = request.query_params.get("search_mode", MODE_AUTO)
+        if mode not in SEARCH_MODES:
+            mode = MODE_AUTO
+        return search_products(queryset, search, mode=mode)
@@ -0,0 +1,25 @@
+# Generated by Django 5.2 on 2026-10-18 10:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shop', '0010_merge_20241215_0001'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['name', 'product_id'], name='shop_produc_name_efec0a_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['price', 'product_id'], name='shop_produc_price_693a32_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(fields=['created', 'product_id'], name='shop_produc_created_862588_idx'),
+        ),
+    ]
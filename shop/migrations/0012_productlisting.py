@@ -0,0 +1,68 @@
+# Generated by Django 5.2 on 2026-10-18 11:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.urls import reverse
+
+
+def backfill_product_listings(apps, schema_editor):
+    """
+    Build a listing row for every existing product.
+    """
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    CustomTaggedItem = apps.get_model("shop", "CustomTaggedItem")
+    Product = apps.get_model("shop", "Product")
+    ProductListing = apps.get_model("shop", "ProductListing")
+
+    content_type = ContentType.objects.filter(app_label="shop", model="product").first()
+    tags = {}
+    if content_type is not None:
+        tagged = CustomTaggedItem.objects.filter(content_type=content_type).values_list(
+            "object_id", "tag__name"
+        )
+        for object_id, tag_name in tagged:
+            tags.setdefault(object_id, []).append(tag_name)
+
+    products = Product.objects.select_related("category").iterator(chunk_size=1000)
+    batch = []
+    for product in products:
+        batch.append(
+            ProductListing(
+                product_id=product.product_id,
+                category_slug=product.category.slug,
+                category_name=product.category.name,
+                tags=sorted(tags.get(product.product_id, [])),
+                detail_url=reverse("api-v1:product-detail", kwargs={"slug": product.slug}),
+            )
+        )
+        if len(batch) >= 1000:
+            ProductListing.objects.bulk_create(batch)
+            batch = []
+    ProductListing.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('shop', '0011_product_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductListing',
+            fields=[
+                ('product', models.OneToOneField(help_text='The product this listing row describes.', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='listing', serialize=False, to='shop.product')),
+                ('category_slug', models.SlugField(help_text="Denormalized slug of the product's category.", max_length=100)),
+                ('category_name', models.CharField(help_text="Denormalized name of the product's category.", max_length=100)),
+                ('tags', models.JSONField(blank=True, default=list, help_text='Denormalized list of tag names.')),
+                ('detail_url', models.CharField(help_text='Precomputed URL of the product detail endpoint.', max_length=255)),
+                ('refreshed_at', models.DateTimeField(auto_now=True, help_text='The date and time when the row was last refreshed.')),
+            ],
+            options={
+                'verbose_name': 'Product Listing',
+                'verbose_name_plural': 'Product Listings',
+            },
+        ),
+        migrations.RunPython(backfill_product_listings, migrations.RunPython.noop),
+    ]
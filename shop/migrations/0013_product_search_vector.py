@@ -0,0 +1,84 @@
+# Generated by Django 5.2 on 2026-10-18 14:05
+
+import django.contrib.postgres.search
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.operations import TrigramExtension
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import F, OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Coalesce
+
+SEARCH_INDEXES = [
+    GinIndex(fields=["search_vector"], name="shop_product_search_gin"),
+    GinIndex(OpClass(F("name"), name="gin_trgm_ops"), name="shop_product_name_trgm"),
+]
+
+
+def product_search_vector(apps, content_type):
+    tag_names = (
+        apps.get_model("shop", "CustomTaggedItem")
+        .objects.filter(content_type=content_type, object_id=OuterRef("pk"))
+        .values("object_id")
+        .annotate(names=StringAgg("tag__name", delimiter=" "))
+        .values("names")
+    )
+    category_name = (
+        apps.get_model("shop", "Category").objects.filter(pk=OuterRef("category_id")).values("name")
+    )
+    return (
+        SearchVector("name", weight="A", config="simple")
+        + SearchVector(
+            Coalesce(Subquery(tag_names), Value(""), output_field=TextField()), weight="B", config="simple"
+        )
+        + SearchVector(
+            Coalesce(Subquery(category_name), Value(""), output_field=TextField()), weight="C", config="simple"
+        )
+        + SearchVector("description", weight="D", config="simple")
+    )
+
+
+def create_search_indexes(apps, schema_editor):
+    """
+    Enable pg_trgm, build the GIN indexes and backfill the search documents.
+    Full-text search is PostgreSQL-only; other backends keep the plain column.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    TrigramExtension().database_forwards("shop", schema_editor, None, None)
+    Product = apps.get_model("shop", "Product")
+    for index in SEARCH_INDEXES:
+        schema_editor.add_index(Product, index)
+
+    ContentType = apps.get_model("contenttypes", "ContentType")
+    content_type = ContentType.objects.filter(app_label="shop", model="product").first()
+    Product.objects.update(search_vector=product_search_vector(apps, content_type))
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    Product = apps.get_model("shop", "Product")
+    for index in SEARCH_INDEXES:
+        schema_editor.remove_index(Product, index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("contenttypes", "0002_remove_content_type_name"),
+        ("shop", "0012_productlisting"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False,
+                help_text="Weighted full-text search document, maintained by shop.search.",
+                null=True,
+            ),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2 on 2026-10-18 15:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shop", "0013_product_search_vector"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RelatedProducts",
+            fields=[
+                (
+                    "product",
+                    models.OneToOneField(
+                        help_text="The product the recommendations are for.",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="related_products",
+                        serialize=False,
+                        to="shop.product",
+                    ),
+                ),
+                (
+                    "product_ids",
+                    models.JSONField(
+                        blank=True,
+                        default=list,
+                        help_text="Related product IDs, best first.",
+                    ),
+                ),
+                (
+                    "computed_at",
+                    models.DateTimeField(
+                        auto_now=True,
+                        help_text="The date and time when the ranking was computed.",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Related Products",
+                "verbose_name_plural": "Related Products",
+            },
+        ),
+    ]
@@ -1,6 +1,7 @@
 import uuid
 
 from django.conf import settings
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
 from django.urls import reverse
@@ -74,12 +75,12 @@ class SoftDeleteQuerySet(models.QuerySet):
 
 class SoftDeleteManager(models.Manager):
     def get_queryset(self):
-        return SoftDeleteQuerySet(self.model, self.using).filter(
+        return SoftDeleteQuerySet(self.model, using=self._db).filter(
             deleted_at__isnull=True
         )
 
     def all_with_deleted(self):
-        return SoftDeleteQuerySet(self.model, self.using)
+        return SoftDeleteQuerySet(self.model, using=self._db)
 
 
 class InStockManager(SoftDeleteManager):
@@ -204,6 +205,11 @@ class Product(SluggedModel):
     reviews_count = models.IntegerField(
         default=0, help_text="The number of reviews for the product."
     )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        help_text="Weighted full-text search document, maintained by shop.search.",
+    )
 
     class Meta:
         verbose_name = "Product"
@@ -212,9 +218,24 @@ class Product(SluggedModel):
             models.Index(fields=["slug"]),
             models.Index(fields=["name"]),
             models.Index(fields=["category"]),
+            # Composite (key, tiebreaker) indexes backing keyset pagination.
+            # 'stock' is deliberately left out: it changes on every checkout.
+            models.Index(fields=["name", "product_id"]),
+            models.Index(fields=["price", "product_id"]),
+            models.Index(fields=["created", "product_id"]),
+            # The GIN full-text and trigram indexes are PostgreSQL-only and are
+            # created by migration 0013 (see shop.search.SEARCH_INDEXES).
         ]
         ordering = ["name"]
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Remember the slug and category the catalog cache keys were built from,
+        # so a rename or move can retire the old entries (see shop.cache).
+        # Read from __dict__ to avoid loading deferred fields.
+        self._original_slug = self.__dict__.get("slug")
+        self._original_category_id = self.__dict__.get("category_id")
+
     def save(self, *args, **kwargs):
         """
         Overrides the default save method to auto-generate a unique slug.
@@ -244,6 +265,8 @@ class Product(SluggedModel):
             self.slug = f"{base_slug}-{get_random_string(6)}"
 
         super().save(*args, **kwargs)
+        self._original_slug = self.slug
+        self._original_category_id = self.category_id
 
     def get_absolute_url(self):
         """
@@ -287,6 +310,78 @@ class Product(SluggedModel):
         return f"Product: {self.name} (ID: {self.product_id})"
 
 
+class ProductListing(models.Model):
+    """
+    Denormalized read model backing the product list endpoint.
+
+    Holds the per-product data that would otherwise cost extra queries or work
+    per row (category, generic tags, reversed detail URL), so a list page is a
+    single join against this table. Rows are refreshed on write by the shop
+    signals and rebuilt periodically by `shop.tasks.rebuild_product_listings`.
+    """
+
+    product = models.OneToOneField(
+        Product,
+        primary_key=True,
+        related_name="listing",
+        on_delete=models.CASCADE,
+        help_text="The product this listing row describes.",
+    )
+    category_slug = models.SlugField(
+        max_length=100, help_text="Denormalized slug of the product's category."
+    )
+    category_name = models.CharField(
+        max_length=100, help_text="Denormalized name of the product's category."
+    )
+    tags = models.JSONField(
+        default=list, blank=True, help_text="Denormalized list of tag names."
+    )
+    detail_url = models.CharField(
+        max_length=255, help_text="Precomputed URL of the product detail endpoint."
+    )
+    refreshed_at = models.DateTimeField(
+        auto_now=True, help_text="The date and time when the row was last refreshed."
+    )
+
+    class Meta:
+        verbose_name = "Product Listing"
+        verbose_name_plural = "Product Listings"
+
+    def __str__(self):
+        return f"Listing for product {self.product_id}"
+
+
+class RelatedProducts(models.Model):
+    """
+    Precomputed, ranked "related products" of a product.
+
+    Blends co-purchase history, shared tags and category, and is rebuilt
+    periodically by `shop.tasks.rebuild_related_products`, so the detail
+    endpoint reads one row instead of ranking candidates per request.
+    """
+
+    product = models.OneToOneField(
+        Product,
+        primary_key=True,
+        related_name="related_products",
+        on_delete=models.CASCADE,
+        help_text="The product the recommendations are for.",
+    )
+    product_ids = models.JSONField(
+        default=list, blank=True, help_text="Related product IDs, best first."
+    )
+    computed_at = models.DateTimeField(
+        auto_now=True, help_text="The date and time when the ranking was computed."
+    )
+
+    class Meta:
+        verbose_name = "Related Products"
+        verbose_name_plural = "Related Products"
+
+    def __str__(self):
+        return f"Related products for {self.product_id}"
+
+
 class Review(models.Model):
     """
     Represents a review for a product.
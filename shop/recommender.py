@@ -1,6 +1,13 @@
-import redis
+import heapq
 import sys
+from collections import Counter
+from itertools import groupby
+from operator import itemgetter
+
+import redis
 from django.conf import settings
+from django.db.models import Count
+
 from .models import Product
 
 # connect to redis
@@ -13,48 +20,115 @@ else:
 
 
 class Recommender:
+    # Number of co-purchased neighbours kept per product.
+    top_k = 50
+    # Redis commands sent per pipeline round trip by rebuild().
+    write_chunk_size = 500
+
     def get_product_key(self, id):
         return f"product:{id}:purchased_with"
 
-    def products_bought(self, products):
-        product_ids = [p.id for p in products]
-        for product_id in product_ids:
-            for with_id in product_ids:
-                # get the other products bought with each product
-                if product_id != with_id:
-                    # increment score for product purchased together
-                    r.zincrby(self.get_product_key(product_id), 1, with_id)
+    def get_staging_key(self, id):
+        return f"rebuild:{self.get_product_key(id)}"
+
+    def rebuild(self):
+        """
+        Recompute every product's top-k co-purchased neighbours from order history.
+
+        The sparse co-occurrence counts (orders containing both products) are
+        produced by a single grouped self-join of the order items, streamed in
+        product order so only one product's neighbours are held at a time.
+        They are written in chunks through a non-transactional pipeline to
+        staging keys, which are then RENAMEd over the live ones, so readers
+        see either the old or the new list and Redis is never blocked for
+        the whole rebuild. Returns the number of products that have neighbours.
+        """
+        from orders.models import Order, OrderItem
+
+        purchased = [
+            Order.Status.PAID,
+            Order.Status.PROCESSING,
+            Order.Status.SHIPPED,
+            Order.Status.DELIVERED,
+        ]
+        pairs = (
+            OrderItem.objects.filter(order__status__in=purchased)
+            .values_list("product_id", "order__items__product_id")
+            .annotate(together=Count("order_id", distinct=True))
+            .order_by("product_id")
+        )
+        staged = set()
+        with r.pipeline(transaction=False) as pipe:
+            # drop what an interrupted rebuild left behind
+            for key in r.scan_iter(match=self.get_staging_key("*"), count=1000):
+                self._queue(pipe, "delete", key)
+            for product_id, rows in groupby(pairs.iterator(chunk_size=5000), key=itemgetter(0)):
+                scored = [(together, str(with_id)) for _, with_id, together in rows if with_id != product_id]
+                if scored:
+                    self._queue(
+                        pipe,
+                        "zadd",
+                        self.get_staging_key(product_id),
+                        {with_id: together for together, with_id in heapq.nlargest(self.top_k, scored)},
+                    )
+                    staged.add(str(product_id))
+            pipe.execute()
+
+            live_keys = {self.get_product_key(product_id) for product_id in staged}
+            for key in r.scan_iter(match=self.get_product_key("*"), count=1000):
+                if key.decode() not in live_keys:
+                    self._queue(pipe, "delete", key)
+            for product_id in staged:
+                self._queue(pipe, "rename", self.get_staging_key(product_id), self.get_product_key(product_id))
+            pipe.execute()
+        return len(staged)
+
+    def _queue(self, pipe, command, *args):
+        getattr(pipe, command)(*args)
+        if len(pipe) >= self.write_chunk_size:
+            pipe.execute()
+
+    def get_neighbours(self, product_ids):
+        """
+        Return ``{product_id: {with_id: score}}`` for the given products,
+        fetched in one pipelined round trip.
+        """
+        product_ids = [str(product_id) for product_id in product_ids]
+        with r.pipeline(transaction=False) as pipe:
+            for product_id in product_ids:
+                pipe.zrange(self.get_product_key(product_id), 0, -1, withscores=True)
+            rankings = pipe.execute()
+        return {
+            product_id: {with_id.decode(): score for with_id, score in ranking}
+            for product_id, ranking in zip(product_ids, rankings)
+        }
 
     def suggest_products_for(self, products, max_results=6):
+        """
+        Suggest products bought together with the given ones, best first.
+        The neighbour lists of all given products are fetched in one pipelined
+        round trip and their scores summed.
+        """
         product_ids = [str(p.product_id) for p in products]
-        if len(products) == 1:
-            # only 1 product
-            suggestions = r.zrange(
-                self.get_product_key(product_ids[0]), 0, -1, desc=True
-            )[:max_results]
-        else:
-            # generate a temporary key
-            flat_ids = "".join([str(id) for id in product_ids])
-            tmp_key = f"tmp_{flat_ids}"
-            # multiple products, combine scores of all products
-            # store the resulting sorted set in a temporary key
-            keys = [self.get_product_key(id) for id in product_ids]
-            r.zunionstore(tmp_key, keys)
-            # remove ids for the products the recommendation is for
-            r.zrem(tmp_key, *product_ids)
-            # get the product ids by their score, descendant sort
-            suggestions = r.zrange(tmp_key, 0, -1, desc=True)[:max_results]
-            # remove the temporary key
-            r.delete(tmp_key)
-        suggested_products_ids = [str(id) for id in suggestions]
-        # get suggested products and sort by order of appearance
-        suggested_products = list(
-            Product.objects.filter(product_id__in=suggested_products_ids)
-        )
-        suggested_products.sort(
-            key=lambda x: suggested_products_ids.index(x.product_id)
-        )
-        return suggested_products
+        scores = Counter()
+        for neighbours in self.get_neighbours(product_ids).values():
+            scores.update(neighbours)
+        # remove ids for the products the recommendation is for
+        for product_id in product_ids:
+            scores.pop(product_id, None)
+        suggested_products_ids = [
+            product_id for product_id, _ in heapq.nlargest(max_results, scores.items(), key=itemgetter(1))
+        ]
+        # get suggested products and keep them in score order
+        suggested_products = {
+            str(product.product_id): product
+            for product in Product.objects.filter(product_id__in=suggested_products_ids)
+        }
+        return [
+            suggested_products[product_id]
+            for product_id in suggested_products_ids
+            if product_id in suggested_products
+        ]
 
     #
     # def suggest_for_user(self, user, max_results=100):
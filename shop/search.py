@@ -0,0 +1,131 @@
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import (
+    SearchQuery,
+    SearchRank,
+    SearchVector,
+    TrigramSimilarity,
+)
+from django.db import connections
+from django.db.models import F, OuterRef, Q, Subquery, TextField, Value
+from django.db.models.functions import Coalesce
+
+# The catalog mixes Persian and English text, which no stemming dictionary
+# covers, so documents and queries are tokenized without stemming.
+SEARCH_CONFIG = "simple"
+
+MODE_AUTO = "auto"
+MODE_FULLTEXT = "fulltext"
+MODE_TRIGRAM = "trigram"
+SEARCH_MODES = (MODE_AUTO, MODE_FULLTEXT, MODE_TRIGRAM)
+
+# Created by migration 0013 on PostgreSQL only, so they are not declared in
+# Product.Meta where SQLite would try to build them as well. The migration
+# keeps its own copy; changing these needs a new migration.
+SEARCH_INDEXES = [
+    GinIndex(fields=["search_vector"], name="shop_product_search_gin"),
+    GinIndex(OpClass(F("name"), name="gin_trgm_ops"), name="shop_product_name_trgm"),
+]
+
+
+def supports_search(using="default"):
+    return connections[using].vendor == "postgresql"
+
+
+def product_search_vector(category_model, tagged_item_model, content_type):
+    """
+    Build the weighted document for a product row: name (A), tags (B),
+    category name (C) and description (D). Migration 0013 keeps its own copy
+    of this expression, so changes here only apply from the next update.
+    """
+    tag_names = (
+        tagged_item_model.objects.filter(
+            content_type=content_type, object_id=OuterRef("pk")
+        )
+        .values("object_id")
+        .annotate(names=StringAgg("tag__name", delimiter=" "))
+        .values("names")
+    )
+    category_name = (
+        category_model.objects.filter(pk=OuterRef("category_id")).values("name")
+    )
+    return (
+        SearchVector("name", weight="A", config=SEARCH_CONFIG)
+        + SearchVector(
+            Coalesce(
+                Subquery(tag_names), Value(""), output_field=TextField()
+            ),
+            weight="B",
+            config=SEARCH_CONFIG,
+        )
+        + SearchVector(
+            Coalesce(
+                Subquery(category_name), Value(""), output_field=TextField()
+            ),
+            weight="C",
+            config=SEARCH_CONFIG,
+        )
+        + SearchVector("description", weight="D", config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(queryset):
+    """
+    Recompute the stored search document of every product in the queryset with
+    a single UPDATE. A no-op on databases without full-text search.
+    """
+    if not supports_search(queryset.db):
+        return 0
+    from django.contrib.contenttypes.models import ContentType
+
+    from .custom_taggit import CustomTaggedItem
+    from .models import Category
+
+    content_type = ContentType.objects.get_for_model(queryset.model)
+    return queryset.update(
+        search_vector=product_search_vector(Category, CustomTaggedItem, content_type)
+    )
+
+
+def search_products(queryset, search_term, mode=MODE_AUTO):
+    """
+    Centralized product search.
+
+    On PostgreSQL the stored, weighted search document is matched with
+    ``websearch_to_tsquery`` and ranked with ``SearchRank``; trigram similarity
+    on the name catches typos. Both predicates are backed by GIN indexes.
+
+    - ``fulltext``: ranked full-text matches only.
+    - ``trigram``: name similarity only.
+    - ``auto``: either, full-text matches ranked first.
+
+    Other databases fall back to a case-insensitive substring match.
+    """
+    if not search_term:
+        return queryset
+    if not supports_search(queryset.db):
+        return queryset.filter(
+            Q(name__icontains=search_term) | Q(description__icontains=search_term)
+        )
+
+    query = SearchQuery(search_term, config=SEARCH_CONFIG, search_type="websearch")
+    rank = SearchRank(F("search_vector"), query)
+    similarity = TrigramSimilarity("name", search_term)
+
+    if mode == MODE_FULLTEXT:
+        return (
+            queryset.filter(search_vector=query)
+            .annotate(rank=rank)
+            .order_by("-rank")
+        )
+    if mode == MODE_TRIGRAM:
+        return (
+            queryset.filter(name__trigram_similar=search_term)
+            .annotate(similarity=similarity)
+            .order_by("-similarity")
+        )
+    return (
+        queryset.filter(Q(search_vector=query) | Q(name__trigram_similar=search_term))
+        .annotate(rank=rank, similarity=similarity)
+        .order_by("-rank", "-similarity")
+    )
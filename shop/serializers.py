@@ -1,10 +1,9 @@
-from django.core.cache import cache
-from django.db.models import Q
+from django.core.files.storage import default_storage
 from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
 from .models import Category, Product, Review
-from .recommender import Recommender
+from . import services
 
 
 class CategorySerializer(serializers.ModelSerializer):
@@ -43,8 +42,12 @@ class ProductSerializer(serializers.ModelSerializer):
     @extend_schema_field(serializers.DictField(child=serializers.FloatField()))
     def get_rating(self, obj):
         """
-        Calculate the average rating and count the number of users who rated the product.
-        Cache the result for 1 week. The cache is updated incrementally when a review is created or deleted.
+        Return the average rating and the number of reviews of the product.
+
+        Both values are stored on the product and kept current by
+        `Product.update_rating_and_reviews_count` whenever a review is saved or
+        deleted, so serializing a page of products costs no extra cache or
+        database round trips.
 
         Args:
             obj: The product instance.
@@ -52,38 +55,7 @@ class ProductSerializer(serializers.ModelSerializer):
         Returns:
             dict: A dictionary containing the average rating and the count of reviews.
         """
-        cache_key = f"product_{obj.product_id}_rating"
-        cached_data = cache.get(cache_key)
-
-        if cached_data is None:
-            # Initialize cache if not present
-            reviews = obj.reviews.all()
-            if not reviews:
-                return {
-                    "average": 0.0,
-                    "count": 0,
-                }  # No reviews, return 0.0 rating and count 0
-            total_rating = sum(review.rating for review in reviews)
-            count = len(reviews)
-            average_rating = total_rating / count
-            cached_data = {
-                "average": average_rating,
-                "count": count,
-                "total_rating": total_rating,
-            }
-            cache.set(
-                cache_key, cached_data, 604800
-            )  # Cache for 1 week (604800 seconds)
-        else:
-            # Update cache incrementally
-            if cached_data["count"] > 0:
-                cached_data["average"] = (
-                    cached_data["total_rating"] / cached_data["count"]
-                )
-            else:
-                cached_data["average"] = 0.0
-
-        return {"average": cached_data["average"], "count": cached_data["count"]}
+        return {"average": float(obj.rating), "count": obj.reviews_count}
 
     def to_internal_value(self, data):
         if self.instance is None and "category" not in data:
@@ -129,6 +101,59 @@ class ProductSerializer(serializers.ModelSerializer):
         ]
 
 
+class ProductCardSerializer(serializers.Serializer):
+    """
+    Read-only serializer for lightweight product cards, rendered from the dict
+    rows produced by `services.get_product_cards` without touching the
+    database or the cache per row.
+    """
+
+    product_id = serializers.UUIDField()
+    name = serializers.CharField()
+    slug = serializers.CharField()
+    price = serializers.DecimalField(max_digits=10, decimal_places=2)
+    thumbnail = serializers.SerializerMethodField()
+    detail_url = serializers.CharField(source="listing_detail_url", allow_null=True)
+    rating = serializers.SerializerMethodField()
+
+    @extend_schema_field(serializers.URLField(allow_null=True))
+    def get_thumbnail(self, row):
+        if not row["thumbnail"]:
+            return None
+        url = default_storage.url(row["thumbnail"])
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request is not None else url
+
+    @extend_schema_field(serializers.DictField(child=serializers.FloatField()))
+    def get_rating(self, row):
+        return {"average": float(row["rating"]), "count": row["reviews_count"]}
+
+
+class ProductListingSerializer(ProductCardSerializer):
+    """
+    Read-only serializer for the dict rows produced by
+    `services.get_product_listing_rows`. It renders the same fields as
+    `ProductSerializer` without touching the database or the cache per row.
+    """
+
+    description = serializers.CharField()
+    stock = serializers.IntegerField()
+    category_detail = serializers.SerializerMethodField()
+    tags = serializers.SerializerMethodField()
+    weight = serializers.DecimalField(max_digits=10, decimal_places=2, allow_null=True)
+    length = serializers.DecimalField(max_digits=10, decimal_places=2, allow_null=True)
+    width = serializers.DecimalField(max_digits=10, decimal_places=2, allow_null=True)
+    height = serializers.DecimalField(max_digits=10, decimal_places=2, allow_null=True)
+
+    @extend_schema_field(CategorySerializer)
+    def get_category_detail(self, row):
+        return {"name": row["listing_category_name"], "slug": row["listing_category_slug"]}
+
+    @extend_schema_field(serializers.ListField(child=serializers.CharField()))
+    def get_tags(self, row):
+        return row["listing_tags"] or []
+
+
 class ReviewSerializer(serializers.ModelSerializer):
     user = serializers.ReadOnlyField(source="user.username")
 
@@ -149,26 +174,13 @@ class ProductDetailSerializer(ProductSerializer):
         reviews = obj.reviews.all()
         return ReviewSerializer(reviews, many=True, context=self.context).data
 
+    @extend_schema_field(ProductCardSerializer(many=True))
     def get_recommended_products(self, obj):
         """
-        Fetch recommended products for the given product.
+        Render the product's precomputed related products as lightweight cards.
         """
-        recommender = Recommender()
-        recommended_products = [
-            product.product_id
-            for product in recommender.suggest_products_for([obj], max_results=5)
-        ]
-        suggested_products = (
-            Product.objects.filter(
-                Q(category=obj.category)
-                | Q(tags__in=obj.tags.all())
-                | Q(product_id__in=recommended_products)
-            )
-            .exclude(product_id=obj.product_id)
-            .distinct()[:10]
-        )
-        return ProductSerializer(
-            suggested_products, many=True, context=self.context
+        return ProductCardSerializer(
+            services.get_related_product_cards(obj), many=True, context=self.context
         ).data
 
     class Meta(ProductSerializer.Meta):
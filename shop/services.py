@@ -1,20 +1,41 @@
+import heapq
+from collections import Counter, defaultdict
+
+import redis
+from django.contrib.contenttypes.models import ContentType
 from django.core.cache import cache
 from django.db import IntegrityError
+from django.db.models import F
 from django.shortcuts import get_object_or_404
 from rest_framework.exceptions import PermissionDenied, ValidationError
 
 from orders.models import Order
-from .models import Product, Review, Category
+from . import cache as catalog_cache
+from . import search
+from .custom_taggit import CustomTaggedItem
+from .models import Product, ProductListing, RelatedProducts, Review, Category
+from .recommender import Recommender
+
+RELATED_PRODUCTS_LIMIT = 10
+# Blend weights for related products. Co-purchase scores are first scaled to
+# [0, 1] per product; every shared tag and a shared category add a flat score.
+RELATED_COPURCHASE_WEIGHT = 3.0
+RELATED_TAG_WEIGHT = 1.0
+RELATED_CATEGORY_WEIGHT = 0.5
+# Most-reviewed products of the same category considered as candidates.
+RELATED_CATEGORY_CANDIDATES = 20
+# How long a product's queued related-products ranking blocks queueing another.
+RELATED_REFRESH_LOCK_TIMEOUT = 60 * 5
 
 
 def get_product_detail(slug: str):
-    cache_key = f"product_detail_{slug}"
+    cache_key = catalog_cache.product_detail_cache_key(slug, suffix="instance")
     cached_data = cache.get(cache_key)
     if cached_data:
         return cached_data
 
     product = Product.objects.get(slug=slug)
-    cache.set(cache_key, product, 60 * 60)  # 1 hour
+    cache.set(cache_key, product, catalog_cache.PRODUCT_DETAIL_TIMEOUT)
     return product
 
 
@@ -56,3 +77,203 @@ def create_category(validated_data: dict):
         raise ValidationError(
             {"name": "A category with this name or slug already exists."}
         )
+
+
+def refresh_product_listings(product_ids):
+    """
+    Rebuild the denormalized listing rows for the given products with a single
+    upsert, and recompute their stored search documents with a single UPDATE.
+    """
+    products = list(
+        Product.all_objects.select_related("category").filter(product_id__in=product_ids)
+    )
+    if not products:
+        return 0
+
+    tags = {}
+    tagged_items = CustomTaggedItem.objects.filter(
+        content_type=ContentType.objects.get_for_model(Product),
+        object_id__in=[product.product_id for product in products],
+    ).values_list("object_id", "tag__name")
+    for object_id, tag_name in tagged_items:
+        tags.setdefault(object_id, []).append(tag_name)
+
+    listings = [
+        ProductListing(
+            product=product,
+            category_slug=product.category.slug,
+            category_name=product.category.name,
+            tags=sorted(tags.get(product.product_id, [])),
+            detail_url=product.get_absolute_url(),
+        )
+        for product in products
+    ]
+    ProductListing.objects.bulk_create(
+        listings,
+        update_conflicts=True,
+        unique_fields=["product"],
+        update_fields=["category_slug", "category_name", "tags", "detail_url", "refreshed_at"],
+    )
+    search.update_search_vectors(
+        Product.all_objects.filter(product_id__in=[product.product_id for product in products])
+    )
+    return len(listings)
+
+
+def refresh_category_listings(category):
+    """
+    Propagate a category rename to its products' listing rows and search
+    documents, one UPDATE each.
+    """
+    search.update_search_vectors(Product.all_objects.filter(category=category))
+    return ProductListing.objects.filter(product__category=category).update(
+        category_slug=category.slug, category_name=category.name
+    )
+
+
+def get_product_listing_rows(queryset):
+    """
+    Turn a filtered and ordered product queryset into plain dict rows joined
+    with the listing read model, so a list page costs a single query.
+    """
+    return queryset.prefetch_related(None).values(
+        "product_id",
+        "name",
+        "slug",
+        "description",
+        "price",
+        "stock",
+        "thumbnail",
+        "weight",
+        "length",
+        "width",
+        "height",
+        "rating",
+        "reviews_count",
+        "created",
+        *queryset.query.annotations,
+        listing_category_slug=F("listing__category_slug"),
+        listing_category_name=F("listing__category_name"),
+        listing_tags=F("listing__tags"),
+        listing_detail_url=F("listing__detail_url"),
+    )
+
+
+def refresh_related_products(product_ids):
+    """
+    Rank and store the related products of a batch of products, blending
+    co-purchase history, shared tags and category. Returns the number of
+    products refreshed.
+    """
+    products = list(
+        Product.objects.filter(product_id__in=product_ids).only("product_id", "category_id")
+    )
+    if not products:
+        return 0
+    ids = [str(product.product_id) for product in products]
+
+    try:
+        copurchased = Recommender().get_neighbours(ids)
+    except redis.RedisError:
+        # Rank on tags and category alone until co-purchase data is reachable.
+        copurchased = {}
+
+    content_type = ContentType.objects.get_for_model(Product)
+    own_tags = defaultdict(set)
+    for object_id, tag_id in CustomTaggedItem.objects.filter(
+        content_type=content_type, object_id__in=ids
+    ).values_list("object_id", "tag_id"):
+        own_tags[str(object_id)].add(tag_id)
+    tagged = defaultdict(set)
+    for object_id, tag_id in CustomTaggedItem.objects.filter(
+        content_type=content_type, tag_id__in=set().union(*own_tags.values())
+    ).values_list("object_id", "tag_id"):
+        tagged[tag_id].add(str(object_id))
+
+    in_category = {
+        category_id: [
+            str(product_id)
+            for product_id in Product.objects.filter(category_id=category_id)
+            .order_by("-reviews_count", "-rating")
+            .values_list("product_id", flat=True)[:RELATED_CATEGORY_CANDIDATES]
+        ]
+        for category_id in {product.category_id for product in products}
+    }
+
+    rankings = {}
+    for product in products:
+        product_id = str(product.product_id)
+        scores = Counter()
+        neighbours = copurchased.get(product_id, {})
+        top = max(neighbours.values(), default=0)
+        for with_id, score in neighbours.items():
+            scores[with_id] += RELATED_COPURCHASE_WEIGHT * score / top
+        for tag_id in own_tags[product_id]:
+            for with_id in tagged[tag_id]:
+                scores[with_id] += RELATED_TAG_WEIGHT
+        for with_id in in_category[product.category_id]:
+            scores[with_id] += RELATED_CATEGORY_WEIGHT
+        scores.pop(product_id, None)
+        rankings[product_id] = scores
+
+    # Co-purchase and tag candidates may have been deleted since.
+    candidates = set().union(*rankings.values())
+    live = {
+        str(product_id)
+        for product_id in Product.objects.filter(product_id__in=candidates).values_list(
+            "product_id", flat=True
+        )
+    }
+    related = []
+    for product in products:
+        scores = rankings[str(product.product_id)]
+        ranked = heapq.nsmallest(
+            RELATED_PRODUCTS_LIMIT,
+            (with_id for with_id in scores if with_id in live),
+            key=lambda with_id: (-scores[with_id], with_id),
+        )
+        related.append(RelatedProducts(product=product, product_ids=ranked))
+    RelatedProducts.objects.bulk_create(
+        related,
+        update_conflicts=True,
+        unique_fields=["product"],
+        update_fields=["product_ids", "computed_at"],
+    )
+    return len(related)
+
+
+def get_product_cards(product_ids):
+    """
+    Fetch lightweight product card rows for the given IDs in one query,
+    keeping the given order.
+    """
+    rows = Product.objects.filter(product_id__in=product_ids).values(
+        "product_id",
+        "name",
+        "slug",
+        "price",
+        "thumbnail",
+        "rating",
+        "reviews_count",
+        listing_detail_url=F("listing__detail_url"),
+    )
+    by_id = {str(row["product_id"]): row for row in rows}
+    return [by_id[str(product_id)] for product_id in product_ids if str(product_id) in by_id]
+
+
+def get_related_product_cards(product):
+    """
+    Return the card rows of a product's precomputed related products. Products
+    the periodic job has not reached yet have none; their ranking is queued
+    rather than computed in the request.
+    """
+    from .tasks import refresh_related_products as refresh_related_products_task
+
+    related = RelatedProducts.objects.filter(product=product).values_list(
+        "product_ids", flat=True
+    ).first()
+    if related is None:
+        if cache.add(f"related_products:{product.pk}:refreshing", 1, RELATED_REFRESH_LOCK_TIMEOUT):
+            refresh_related_products_task.delay([str(product.pk)])
+        return []
+    return get_product_cards(related)
@@ -1,25 +1,105 @@
 from django.core.cache import cache
+from django.db import transaction
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
+from . import autocomplete
+from . import cache as catalog_cache
+from . import services
+from .custom_taggit import CustomTaggedItem
 from .models import Category, Product, Review
 
+# Product fields copied into (or used to derive) the ProductListing read model
+# and the stored search document.
+LISTING_SOURCE_FIELDS = {"name", "slug", "description", "category", "category_id"}
+
+
+@receiver(post_save, sender=Category)
+def refresh_category_listing(sender, instance, **kwargs):
+    """
+    Propagate category name/slug changes to the products' listing rows.
+    Registered before the cache invalidation so new cache entries see fresh rows.
+    """
+    services.refresh_category_listings(instance)
+
 
 @receiver([post_save, post_delete], sender=Category)
 def invalidate_category_cache(sender, instance, **kwargs):
     """
-    Invalidate the category list cache when a category is saved or deleted.
+    Invalidate the category list cache and every product list that can contain
+    the category's products when a category is saved or deleted.
     """
     cache.delete("category_list")
+    catalog_cache.invalidate_category(instance)
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_listing(sender, instance, update_fields=None, **kwargs):
+    """
+    Keep the product's listing row and search document in sync. Saves limited
+    to fields neither uses (e.g. rating or stock updates) skip the refresh.
+    Registered before the cache invalidation so new cache entries see fresh rows.
+    """
+    if update_fields is not None and not LISTING_SOURCE_FIELDS.intersection(update_fields):
+        return
+    services.refresh_product_listings([instance.pk])
+
+
+@receiver(post_save, sender=Product)
+def update_autocomplete_on_product_save(sender, instance, update_fields=None, **kwargs):
+    """
+    Push name changes and soft deletes to the websocket autocomplete indexes
+    once the transaction commits, so rolled-back changes are never broadcast.
+    """
+    if update_fields is not None and not {"name", "deleted_at"}.intersection(update_fields):
+        return
+    if instance.deleted_at is not None:
+        change = {"op": "remove", "id": str(instance.pk)}
+    else:
+        change = {"op": "upsert", "id": str(instance.pk), "name": instance.name}
+    transaction.on_commit(lambda: autocomplete.publish_change(change))
+
+
+@receiver(post_delete, sender=Product)
+def update_autocomplete_on_product_delete(sender, instance, **kwargs):
+    change = {"op": "remove", "id": str(instance.pk)}
+    transaction.on_commit(lambda: autocomplete.publish_change(change))
 
 
 @receiver([post_save, post_delete], sender=Product)
 def invalidate_product_cache(sender, instance, **kwargs):
     """
-    Invalidate product-related caches when a product is saved or deleted.
+    Invalidate the list and detail caches that can contain the product when it
+    is saved or deleted, including those built under its previous slug or category.
+    """
+    previous_category_slug = None
+    if instance._original_category_id not in (None, instance.category_id):
+        previous_category_slug = (
+            Category.objects.filter(pk=instance._original_category_id)
+            .values_list("slug", flat=True)
+            .first()
+        )
+    catalog_cache.invalidate_product(
+        instance,
+        previous_slug=instance._original_slug,
+        previous_category_slug=previous_category_slug,
+    )
+
+
+@receiver([post_save, post_delete], sender=CustomTaggedItem)
+def invalidate_product_cache_on_tag_change(sender, instance, **kwargs):
+    """
+    Tags are written after the product itself, so tag changes refresh the
+    listing row and invalidate the caches separately.
     """
-    cache.delete("product_list")
-    cache.delete(f"product_{instance.slug}")
+    product = (
+        Product.all_objects.select_related("category")
+        .filter(pk=instance.object_id)
+        .first()
+    )
+    if product is not None:
+        services.refresh_product_listings([product.pk])
+        catalog_cache.invalidate_product(product)
 
 
 @receiver(post_save, sender=Review)
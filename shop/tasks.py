@@ -2,6 +2,8 @@ from celery import shared_task
 from django.core.cache import cache
 from .recommender import Recommender
 from .models import Product
+from . import cache as catalog_cache
+from . import services
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
@@ -44,3 +46,62 @@ def update_user_recommendations(user_id):
     except User.DoesNotExist:
         # Handle case where user is not found
         pass
+
+
+@shared_task
+def rebuild_product_listings(chunk_size=1000):
+    """
+    Rebuilds every ProductListing row and product search document in chunks.
+    Signals keep rows current on normal writes; this periodic sweep heals rows
+    changed by paths that bypass signals (queryset.update, bulk_update, raw SQL).
+    """
+    product_ids = Product.all_objects.order_by("pk").values_list("pk", flat=True)
+    refreshed = 0
+    batch = []
+    for product_id in product_ids.iterator(chunk_size=chunk_size):
+        batch.append(product_id)
+        if len(batch) >= chunk_size:
+            refreshed += services.refresh_product_listings(batch)
+            batch = []
+    if batch:
+        refreshed += services.refresh_product_listings(batch)
+    return refreshed
+
+
+@shared_task
+def rebuild_recommendations():
+    """
+    Recomputes the co-purchase neighbours used by the recommender from order history.
+    """
+    return Recommender().rebuild()
+
+
+@shared_task
+def refresh_related_products(product_ids):
+    """
+    Ranks the related products of products the periodic rebuild has not
+    reached yet, and retires their cached detail pages so the ranking shows.
+    """
+    refreshed = services.refresh_related_products(product_ids)
+    for slug in Product.objects.filter(pk__in=product_ids).values_list("slug", flat=True):
+        catalog_cache.invalidate_product_detail(slug)
+    return refreshed
+
+
+@shared_task
+def rebuild_related_products(chunk_size=500):
+    """
+    Re-ranks the related products of every product in chunks, picking up new
+    co-purchase data, tag changes and catalog additions.
+    """
+    product_ids = Product.objects.order_by("pk").values_list("pk", flat=True)
+    refreshed = 0
+    batch = []
+    for product_id in product_ids.iterator(chunk_size=chunk_size):
+        batch.append(product_id)
+        if len(batch) >= chunk_size:
+            refreshed += services.refresh_related_products(batch)
+            batch = []
+    if batch:
+        refreshed += services.refresh_related_products(batch)
+    return refreshed
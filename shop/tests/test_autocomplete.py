@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from shop import autocomplete
+from shop.autocomplete import AutocompleteIndex
+from shop.models import Category, Product
+
+User = get_user_model()
+
+
+class AutocompleteIndexTest(TestCase):
+    def setUp(self):
+        self.index = AutocompleteIndex()
+        self.index.load([
+            (1, 'The Pragmatic Programmer', 5),
+            (2, 'Python Crash Course', 40),
+            (3, 'Programming Pearls', 12),
+            (4, 'Laptop', 0),
+        ])
+
+    def test_matches_prefix_of_any_word_by_popularity(self):
+        self.assertEqual(
+            self.index.suggest('prog'),
+            ['Programming Pearls', 'The Pragmatic Programmer'],
+        )
+        self.assertEqual(self.index.suggest('  CRASH  co'), ['Python Crash Course'])
+
+    def test_limit_and_empty_query(self):
+        self.assertEqual(self.index.suggest('p', limit=2), ['Python Crash Course', 'Programming Pearls'])
+        self.assertEqual(self.index.suggest(''), [])
+
+    def test_upsert_renames_and_keeps_popularity(self):
+        self.index.upsert(4, 'Gaming Laptop')
+        self.index.upsert(5, 'Python Cookbook')
+        self.assertEqual(self.index.suggest('gam'), ['Gaming Laptop'])
+        self.assertEqual(self.index.suggest('lap'), ['Gaming Laptop'])
+        self.assertEqual(self.index.suggest('python'), ['Python Crash Course', 'Python Cookbook'])
+
+    def test_remove(self):
+        self.index.remove(2)
+        self.index.remove('missing')
+        self.assertEqual(self.index.suggest('py'), [])
+
+
+class AutocompleteSignalTest(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(phone_number='+989123456720', username='seller', email='seller@example.com', password='password')
+        category = Category.objects.create(name='Books')
+        self.product = Product.objects.create(
+            name='Clean Code', description='d', price='10.00', stock=1, category=category, user=user,
+            weight=1, length=1, width=1, height=1,
+        )
+        autocomplete.load_index()
+        self.addCleanup(autocomplete.index.invalidate)
+
+    def test_rename_and_soft_delete_update_loaded_index(self):
+        self.assertEqual(autocomplete.index.suggest('clean'), ['Clean Code'])
+
+        self.product.name = 'Clean Architecture'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        self.assertEqual(autocomplete.index.suggest('arch'), ['Clean Architecture'])
+        self.assertEqual(autocomplete.index.suggest('code'), [])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.delete()
+        self.assertEqual(autocomplete.index.suggest('clean'), [])
+
+    def test_rolled_back_changes_are_not_applied(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            self.product.name = 'Clean Architecture'
+            self.product.save()
+            self.product.delete()
+        self.assertEqual(autocomplete.index.suggest('clean'), ['Clean Code'])
@@ -0,0 +1,71 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.http import QueryDict
+from django.test import TestCase, override_settings
+
+from shop import cache as catalog_cache
+from shop.models import Category, Product
+
+User = get_user_model()
+
+LOCMEM_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCMEM_CACHE)
+class CatalogCacheVersioningTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(phone_number='+989123456787', username='cacheuser', email='cache@example.com', password='password')
+        self.books = Category.objects.create(name='Books')
+        self.toys = Category.objects.create(name='Toys')
+        self.product = Product.objects.create(
+            name='Novel', price=10, stock=5, category=self.books, user=self.user,
+            weight=1, length=1, width=1, height=1
+        )
+
+    def _list_key(self, query=''):
+        return catalog_cache.product_list_cache_key(QueryDict(query))
+
+    def test_product_save_retires_global_and_own_category_lists_only(self):
+        unfiltered = self._list_key('ordering=price')
+        books = self._list_key('category__slug=books')
+        toys = self._list_key('category__slug=toys')
+
+        self.product.price = 12
+        self.product.save()
+
+        self.assertNotEqual(self._list_key('ordering=price'), unfiltered)
+        self.assertNotEqual(self._list_key('category__slug=books'), books)
+        self.assertEqual(self._list_key('category__slug=toys'), toys)
+
+    def test_moving_category_retires_both_category_lists(self):
+        books = self._list_key('category__slug=books')
+        toys = self._list_key('category__slug=toys')
+
+        self.product.category = self.toys
+        self.product.save()
+
+        self.assertNotEqual(self._list_key('category__slug=books'), books)
+        self.assertNotEqual(self._list_key('category__slug=toys'), toys)
+
+    def test_rename_retires_detail_under_old_slug(self):
+        old_slug = self.product.slug
+        old_detail = catalog_cache.product_detail_cache_key(old_slug)
+
+        self.product.name = 'Renamed Novel'
+        self.product.save()
+
+        self.assertNotEqual(catalog_cache.product_detail_cache_key(old_slug), old_detail)
+
+    def test_query_param_order_does_not_change_key(self):
+        self.assertEqual(self._list_key('a=1&b=2'), self._list_key('b=2&a=1'))
+
+    def test_escaped_values_do_not_share_a_key(self):
+        self.assertNotEqual(self._list_key('search=a%26b%3D1'), self._list_key('search=a&b=1'))
+
+    def test_reads_do_not_create_version_keys(self):
+        self._list_key('category__slug=no-such-category')
+        catalog_cache.product_detail_cache_key('no-such-product')
+
+        self.assertIsNone(cache.get('catalog:category:no-such-category:version'))
+        self.assertIsNone(cache.get('catalog:product:no-such-product:version'))
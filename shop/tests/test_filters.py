@@ -93,6 +93,13 @@ class FilterTests(APITestCase):
         names = {item['name'] for item in response.data['data']}
         self.assertEqual(names, {'Laptop', 'The Pragmatic Programmer'})
 
+    def test_product_search_filter_backend_accepts_search_mode(self):
+        for mode in ('auto', 'fulltext', 'trigram', 'bogus'):
+            with self.subTest(mode=mode):
+                response = self.client.get(self.url, {'search': 'laptop', 'search_mode': mode})
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual([item['name'] for item in response.data['data']], ['Laptop'])
+
     def test_product_search_filter_backend_no_results(self):
         response = self.client.get(self.url, {'search': 'nonexistent'})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
@@ -0,0 +1,79 @@
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from fakeredis import FakeRedis
+
+from orders.models import Order, OrderItem
+from shop.models import Category, Product
+from shop.recommender import Recommender
+
+User = get_user_model()
+
+
+class RecommenderTest(TestCase):
+    def setUp(self):
+        user = User.objects.create_user(phone_number='+989123456730', username='seller', email='seller@example.com', password='password')
+        category = Category.objects.create(name='Books')
+        self.products = [
+            Product.objects.create(
+                name=f'Book {i}', description='d', price='10.00', stock=1, category=category, user=user,
+                weight=1, length=1, width=1, height=1,
+            )
+            for i in range(4)
+        ]
+        self.buyer = User.objects.create_user(phone_number='+989123456731', username='buyer', email='buyer@example.com', password='password')
+        self.redis = FakeRedis()
+        patcher = patch('shop.recommender.r', self.redis)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.recommender = Recommender()
+
+    def buy(self, products, status=Order.Status.PAID):
+        order = Order.objects.create(user=self.buyer, status=status)
+        for product in products:
+            OrderItem.objects.create(order=order, product=product, product_name=product.name, price=10, quantity=1)
+
+    def neighbours(self, product):
+        return self.recommender.get_neighbours([product.product_id])[str(product.product_id)]
+
+    def test_suggestions_merge_scores_and_exclude_inputs(self):
+        a, b, c, d = self.products
+        self.buy([a, b])
+        self.buy([a, c])
+        self.buy([a, c])
+        self.buy([b, d])
+        self.recommender.rebuild()
+
+        self.assertEqual(self.recommender.suggest_products_for([a]), [c, b])
+        # b scores 1 (with a) + 1 (with d) and c scores 2 (with a).
+        self.assertEqual(set(self.recommender.suggest_products_for([a, d])), {b, c})
+        self.assertEqual(self.recommender.suggest_products_for([a, b, c]), [d])
+
+    def test_no_history(self):
+        self.assertEqual(self.recommender.suggest_products_for([self.products[0]]), [])
+
+    def test_rebuild_replaces_neighbours_from_order_history(self):
+        a, b, c, d = self.products
+        self.buy([a, b, c])
+        self.buy([a, b])
+        self.buy([c, d], status=Order.Status.PENDING)
+        stale = self.recommender.get_product_key(d.product_id)
+        leftover = self.recommender.get_staging_key(d.product_id)
+        self.redis.zadd(stale, {str(a.product_id): 5})
+        self.redis.zadd(leftover, {str(a.product_id): 5})
+        self.recommender.top_k = 1
+        self.recommender.write_chunk_size = 2
+
+        self.assertEqual(self.recommender.rebuild(), 3)
+
+        self.assertEqual(self.neighbours(a), {str(b.product_id): 2})
+        self.assertEqual(self.neighbours(b), {str(a.product_id): 2})
+        self.assertEqual(len(self.neighbours(c)), 1)
+        # Unpaid orders don't count and keys of products without neighbours are dropped.
+        self.assertEqual(self.neighbours(d), {})
+        self.assertEqual(self.redis.keys('rebuild:*'), [])
+
+        # Running it again over the live keys gives the same result.
+        self.assertEqual(self.recommender.rebuild(), 3)
+        self.assertEqual(self.neighbours(a), {str(b.product_id): 2})
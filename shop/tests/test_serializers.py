@@ -1,7 +1,7 @@
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-from shop.models import Category
+from shop.models import Category, Product
 from shop.serializers import ProductSerializer
 
 User = get_user_model()
@@ -64,3 +64,21 @@ class ProductSerializerTest(TestCase):
                 serializer = ProductSerializer(data=data)
                 self.assertFalse(serializer.is_valid())
                 self.assertIn(field, serializer.errors)
+
+
+class ProductSerializerRatingTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(phone_number='+989123456706', username='rater', email='rater@example.com', password='password')
+        self.category = Category.objects.create(name='Rated Category', slug='rated-category')
+        for i in range(3):
+            Product.objects.create(
+                name=f'Rated {i}', description='d', price='10.00', stock=1, category=self.category, user=self.user,
+                weight=1, length=1, width=1, height=1, rating=4.5, reviews_count=2,
+            )
+
+    def test_rating_is_read_from_stored_columns(self):
+        products = list(Product.objects.all())
+        serializer = ProductSerializer()
+        with self.assertNumQueries(0):
+            ratings = [serializer.get_rating(product) for product in products]
+        self.assertEqual(ratings, [{'average': 4.5, 'count': 2}] * 3)
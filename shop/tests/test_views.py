@@ -1,10 +1,13 @@
 from unittest.mock import patch
 from django.contrib.auth import get_user_model
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient, APITestCase
 
-from shop.models import Category, Product, Review
+from shop import services
+from shop.tasks import refresh_related_products
+from shop.models import Category, Product, RelatedProducts, Review
 from orders.models import Order, OrderItem
 
 User = get_user_model()
@@ -141,3 +144,156 @@ class ReviewViewSetTest(APITestCase):
         response = self.client.post(self.list_url, data)
         # The view checks if a user has a COMPLETED order. Let's make sure that check works.
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+class ProductCursorPaginationTest(APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(phone_number='+989123456786', username='cursoruser', email='cursor@example.com', password='password')
+        self.category = Category.objects.create(name='Cursor Category')
+        # Two products share each price so the product_id tiebreaker is exercised.
+        for i in range(7):
+            Product.objects.create(
+                name=f'Product {i}', price=10 + (i // 2), stock=5, category=self.category, user=self.user,
+                weight=1, length=1, width=1, height=1
+            )
+        self.list_url = reverse('api-v1:product-list')
+
+    def _walk(self, params):
+        names, cursor = [], None
+        while True:
+            query = dict(params, pagination='cursor', page_size=3)
+            if cursor:
+                query['cursor'] = cursor
+            response = self.client.get(self.list_url, query)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            names.extend(item['name'] for item in response.data['data'])
+            cursor = response.data['meta']['pagination']['next_cursor']
+            if not cursor:
+                return names, response
+
+    def test_cursor_walk_matches_page_number_ordering(self):
+        for ordering in ['price', '-price', 'name', '-created']:
+            with self.subTest(ordering=ordering):
+                expected = [
+                    item['name'] for item in
+                    self.client.get(self.list_url, {'ordering': ordering, 'page_size': 100}).data['data']
+                ]
+                names, _ = self._walk({'ordering': ordering})
+                self.assertEqual(names, expected)
+
+    def test_previous_cursor_returns_prior_page(self):
+        first = self.client.get(self.list_url, {'pagination': 'cursor', 'page_size': 3, 'ordering': 'price'})
+        pagination = first.data['meta']['pagination']
+        self.assertIsNone(pagination['previous_cursor'])
+        self.assertIsNone(pagination['count'])
+
+        second = self.client.get(self.list_url, {'cursor': pagination['next_cursor'], 'page_size': 3, 'ordering': 'price'})
+        back = self.client.get(self.list_url, {
+            'cursor': second.data['meta']['pagination']['previous_cursor'], 'page_size': 3, 'ordering': 'price'
+        })
+        self.assertEqual(back.data['data'], first.data['data'])
+        self.assertIsNotNone(back.data['meta']['pagination']['next_cursor'])
+        self.assertIsNone(back.data['meta']['pagination']['previous_cursor'])
+
+    def test_exact_count_is_optional(self):
+        response = self.client.get(self.list_url, {'pagination': 'cursor', 'count': 'exact'})
+        self.assertEqual(response.data['meta']['pagination']['count'], 7)
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(self.list_url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ProductListingReadModelTest(APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(phone_number='+989123456788', username='listinguser', email='listing@example.com', password='password')
+        self.category = Category.objects.create(name='Listing Category')
+        self.products = []
+        for i in range(3):
+            product = Product.objects.create(
+                name=f'Listed {i}', price=10 + i, stock=5, category=self.category, user=self.user,
+                weight=1, length=1, width=1, height=1
+            )
+            product.tags.add('sale', f'tag-{i}')
+            self.products.append(product)
+        self.list_url = reverse('api-v1:product-list')
+
+    def test_list_renders_denormalized_fields(self):
+        response = self.client.get(self.list_url, {'ordering': 'price'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        first = response.data['data'][0]
+        self.assertEqual(first['category_detail'], {'name': 'Listing Category', 'slug': 'listing-category'})
+        self.assertEqual(first['tags'], ['sale', 'tag-0'])
+        self.assertEqual(first['detail_url'], self.products[0].get_absolute_url())
+        self.assertEqual(first['rating'], {'average': 0.0, 'count': 0})
+
+    def test_category_rename_propagates_to_listing(self):
+        self.category.name = 'Renamed Category'
+        self.category.save()
+        response = self.client.get(self.list_url)
+        self.assertEqual(response.data['data'][0]['category_detail']['name'], 'Renamed Category')
+
+    def test_cursor_page_is_a_single_query(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(self.list_url, {'pagination': 'cursor'})
+        self.assertEqual(len(response.data['data']), 3)
+
+
+class RelatedProductsTest(APITestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(phone_number='+989123456789', username='relateduser', email='related@example.com', password='password')
+        books = Category.objects.create(name='Books')
+        music = Category.objects.create(name='Music')
+
+        def create(name, category):
+            return Product.objects.create(
+                name=name, price=10, stock=5, category=category, user=self.user,
+                weight=1, length=1, width=1, height=1
+            )
+
+        self.product = create('Dune', books)
+        self.same_category = create('Foundation', books)
+        self.shared_tag = create('Dune Soundtrack', music)
+        self.copurchased = create('Headphones', music)
+        self.unrelated = create('Guitar', music)
+        self.product.tags.add('dune')
+        self.shared_tag.tags.add('dune')
+        self.detail_url = reverse('api-v1:product-detail', kwargs={'slug': self.product.slug})
+
+    @patch('shop.recommender.Recommender.get_neighbours')
+    def test_detail_renders_blended_related_product_cards(self, mock_neighbours):
+        mock_neighbours.return_value = {str(self.product.product_id): {str(self.copurchased.product_id): 4.0}}
+        services.refresh_related_products([self.product.product_id])
+
+        response = self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        related = response.data['recommended_products']
+        self.assertEqual([card['name'] for card in related], ['Headphones', 'Dune Soundtrack', 'Foundation'])
+        self.assertEqual(
+            set(related[0]),
+            {'product_id', 'name', 'slug', 'price', 'thumbnail', 'detail_url', 'rating'},
+        )
+        self.assertEqual(related[0]['detail_url'], self.copurchased.get_absolute_url())
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'related-products-tests'}})
+    @patch('shop.recommender.Recommender.get_neighbours', return_value={})
+    def test_missing_ranking_is_queued_on_first_request(self, mock_neighbours):
+        from django.core.cache import cache
+        self.addCleanup(cache.clear)
+        with patch('shop.tasks.refresh_related_products.delay') as mock_delay:
+            response = self.client.get(self.detail_url)
+            self.client.get(self.detail_url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['recommended_products'], [])
+        self.assertFalse(RelatedProducts.objects.filter(product=self.product).exists())
+        mock_delay.assert_called_once_with([str(self.product.product_id)])
+
+        refresh_related_products(*mock_delay.call_args.args)
+        response = self.client.get(self.detail_url)
+        self.assertEqual(
+            [card['name'] for card in response.data['recommended_products']],
+            ['Dune Soundtrack', 'Foundation'],
+        )
@@ -1,9 +1,3 @@
-from django.conf import settings
-from django.db.models import Q
-
-if settings.DATABASES["default"]["ENGINE"] == "django.db.backends.postgresql":
-    from django.contrib.postgres.search import TrigramSimilarity
-
 from ecommerce_api.utils.file_handling import upload_to_unique
 
 
@@ -16,25 +10,3 @@ def product_upload_to_unique(instance, filename):
     """
     return upload_to_unique(instance, filename, directory="products/")
 
-
-def search_products(queryset, search_term):
-    """
-    Centralized search function to filter products by name and description similarity.
-    """
-    if search_term:
-        if settings.DATABASES["default"]["ENGINE"] == "django.db.backends.postgresql":
-            return (
-                queryset.annotate(
-                    name_similarity=TrigramSimilarity("name", search_term),
-                    description_similarity=TrigramSimilarity(
-                        "description", search_term
-                    ),
-                )
-                .filter(name_similarity__gt=0.1)
-                .order_by("-name_similarity")
-            )
-        else:
-            return queryset.filter(
-                Q(name__icontains=search_term) | Q(description__icontains=search_term)
-            )
-    return queryset
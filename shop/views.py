@@ -19,12 +19,18 @@ from rest_framework.filters import OrderingFilter
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
 
-from ecommerce_api.core.mixins import PaginationMixin
+from ecommerce_api.core.mixins import CursorPaginationMixin, PaginationMixin
 from ecommerce_api.core.permissions import IsOwnerOrStaff
 from shop.filters import ProductFilter, InStockFilterBackend, ProductSearchFilterBackend
 from .models import Product, Category
-from .serializers import ProductSerializer, CategorySerializer, ProductDetailSerializer
+from .serializers import (
+    ProductSerializer,
+    CategorySerializer,
+    ProductDetailSerializer,
+    ProductListingSerializer,
+)
 from .serializers import ReviewSerializer
+from . import cache as catalog_cache
 from . import services
 
 logger = getLogger(__name__)
@@ -191,6 +197,33 @@ class ReviewViewSet(viewsets.ModelViewSet):
                 required=False,
                 type=str,
             ),
+            OpenApiParameter(
+                name=r"search_mode",
+                description=r"Search strategy: ranked 'fulltext', typo-tolerant 'trigram', or 'auto' (both, full-text matches first).",
+                required=False,
+                type=str,
+                enum=[r"auto", r"fulltext", r"trigram"],
+            ),
+            OpenApiParameter(
+                name=r"pagination",
+                description=r"Set to 'cursor' for keyset pagination with opaque next/previous cursors.",
+                required=False,
+                type=str,
+                enum=[r"cursor"],
+            ),
+            OpenApiParameter(
+                name=r"cursor",
+                description=r"Opaque cursor taken from 'meta.pagination.next_cursor' or 'previous_cursor'.",
+                required=False,
+                type=str,
+            ),
+            OpenApiParameter(
+                name=r"count",
+                description=r"Cursor mode only: include a total count, 'exact' or 'estimate'.",
+                required=False,
+                type=str,
+                enum=[r"exact", r"estimate"],
+            ),
         ],
         examples=[
             OpenApiExample(
@@ -295,7 +328,7 @@ class ReviewViewSet(viewsets.ModelViewSet):
         },
     ),
 )
-class ProductViewSet(PaginationMixin, viewsets.ModelViewSet):
+class ProductViewSet(CursorPaginationMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing products.
     - **Authentication:** Read-only for anonymous users, while authenticated users can perform all actions.
@@ -304,6 +337,7 @@ class ProductViewSet(PaginationMixin, viewsets.ModelViewSet):
     - **Features:**
         - Supports filtering by category, tags, and stock status.
         - Supports ordering by name, price, stock, and creation date.
+        - Supports keyset cursor pagination on the list endpoint (`?pagination=cursor`).
         - Includes a product recommendation feature.
     """
 
@@ -320,6 +354,7 @@ class ProductViewSet(PaginationMixin, viewsets.ModelViewSet):
         ProductSearchFilterBackend,
     ]
     ordering_fields = [r"name", r"price", r"stock", r"created"]
+    cursor_tiebreaker = r"product_id"
     lookup_field = r"slug"
 
     def get_permissions(self):
@@ -335,18 +370,30 @@ class ProductViewSet(PaginationMixin, viewsets.ModelViewSet):
         """
         Returns the serializer class to be used for the current action.
         - For the 'retrieve' action, it uses the `ProductDetailSerializer` to include more details.
+        - For the 'list' action, it uses the `ProductListingSerializer` over read-model rows.
         """
         if self.action == "retrieve":
             return ProductDetailSerializer
+        if self.action == "list":
+            return ProductListingSerializer
         return super().get_serializer_class()
 
+    def filter_queryset(self, queryset):
+        """
+        Applies the filter backends, then, for the 'list' action, projects the
+        products onto dict rows joined with the `ProductListing` read model.
+        """
+        queryset = super().filter_queryset(queryset)
+        if self.action == "list":
+            return services.get_product_listing_rows(queryset)
+        return queryset
+
     def perform_create(self, serializer):
         """
         Handles the creation of a new product, associating it with the authenticated user.
         """
         try:
             serializer.save(user=self.request.user)
-            cache.delete("product_list")
             logger.info("Product created by user id: %s", self.request.user.id)
         except ValidationError as e:
             return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
@@ -365,34 +412,31 @@ class ProductViewSet(PaginationMixin, viewsets.ModelViewSet):
     def perform_update(self, serializer):
         """
         Handles the update of a product.
+        Cached lists and details are invalidated by the product signals.
         """
         serializer.save()
-        cache.delete(f"product_{serializer.instance.slug}")
-        cache.delete("product_list")
 
     def perform_destroy(self, instance):
         """
         Handles the deletion of a product.
+        Cached lists and details are invalidated by the product signals.
         """
-        cache.delete(f"product_{instance.slug}")
-        cache.delete("product_list")
         instance.delete()
 
     def list(self, request, *args, **kwargs):
         """
         Lists all products with caching.
-        - Caches the entire product list for 5 minutes.
-        - **Note:** This caching strategy will be improved to be more granular.
+        - Caches each list page for 5 minutes under a versioned key (see `shop.cache`),
+          so product and category writes retire affected pages immediately.
+        - Cursor pagination is used when `?pagination=cursor` or `?cursor=` is passed.
         """
-        # A more granular caching strategy will be implemented in the caching step.
-        query_params = request.query_params.urlencode()
-        cache_key = f"product_list_{query_params}"
+        cache_key = catalog_cache.product_list_cache_key(request.query_params)
         cached_data = cache.get(cache_key)
         if cached_data:
             return Response(cached_data)
 
         response = super().list(request, *args, **kwargs)
-        cache.set(cache_key, response.data, 60 * 5)  # 5 minutes
+        cache.set(cache_key, response.data, catalog_cache.PRODUCT_LIST_TIMEOUT)
         return response
 
     def retrieve(self, request, *args, **kwargs):
@@ -401,13 +445,13 @@ class ProductViewSet(PaginationMixin, viewsets.ModelViewSet):
         - Delegates the retrieval logic to the `services.get_product_detail` function.
         """
         slug = kwargs.get("slug")
-        cache_key = f"product_{slug}"
+        cache_key = catalog_cache.product_detail_cache_key(slug)
         cached_data = cache.get(cache_key)
         if cached_data:
             return Response(cached_data)
         product = services.get_product_detail(slug)
         serializer = self.get_serializer(product)
-        cache.set(cache_key, serializer.data, 60 * 60)  # 1 hour
+        cache.set(cache_key, serializer.data, catalog_cache.PRODUCT_DETAIL_TIMEOUT)
         return Response(serializer.data)
 
     @action(
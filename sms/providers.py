@@ -3,6 +3,8 @@ from abc import ABC, abstractmethod
 from django.conf import settings
 import logging
 
+from ecommerce_api.core.http import get_client
+
 logger = logging.getLogger(__name__)
 
 
@@ -28,7 +30,7 @@ class SmsIrProvider(SmsProvider):
     def __init__(self):
         self.api_key = getattr(settings, "SMS_IR_API_KEY", None)
         self.line_number = getattr(settings, "SMS_IR_LINE_NUMBER", None)
-        self.api_url = "https://api.sms.ir/v1"
+        self.client = get_client("sms_ir")
 
     def _normalize_phone(self, phone: str) -> str:
         """
@@ -78,9 +80,7 @@ class SmsIrProvider(SmsProvider):
             f"and parameters: {log_params}"
         )
         try:
-            response = requests.post(
-                f"{self.api_url}/send/verify", json=data, headers=headers, timeout=10
-            )
+            response = self.client.post("/send/verify", json=data, headers=headers)
             response.raise_for_status()
             response_data = response.json()
 
@@ -111,11 +111,10 @@ class SmsIrProvider(SmsProvider):
         }
         logger.info(f"Sending text message to {normalized_phone} via sms.ir")
         try:
-            response = requests.post(
-                f"{self.api_url}/send/bulk",
+            response = self.client.post(
+                "/send/bulk",
                 json=data,
                 headers=self._get_headers(),
-                timeout=10,
             )
             response.raise_for_status()
             response_data = response.json()
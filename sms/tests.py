@@ -1,11 +1,13 @@
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch
 from django.test import TestCase
+from ecommerce_api.core.tests.stub_server import stub_provider
 from .providers import SmsIrProvider, SmsProviderError
-import requests
 
 
 class SmsProviderTests(TestCase):
     def setUp(self):
+        self.server = stub_provider(self, "sms_ir")
+
         # Patch settings to avoid dependency on actual Django settings
         with patch("sms.providers.settings") as mock_settings:
             mock_settings.SMS_IR_API_KEY = "test_api_key"
@@ -32,46 +34,35 @@ class SmsProviderTests(TestCase):
         with self.assertRaises(SmsProviderError):
             self.provider._normalize_phone("not-a-number")
 
-    @patch("sms.providers.requests.post")
-    def test_send_otp_success(self, mock_post):
+    def test_send_otp_success(self):
         """Tests successful OTP sending."""
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
+        self.server.respond("POST", "/send/verify", json={
             "status": 1,
             "message": "موفق",
             "data": {"messageId": 12345, "cost": 1.0},
-        }
-        mock_post.return_value = mock_response
+        })
 
         response = self.provider.send_otp("09123456789", "12345", 101)
         self.assertEqual(response["messageId"], 12345)
         # Check if the number was normalized before sending
-        sent_data = mock_post.call_args.kwargs["json"]
+        sent_data = self.server.requests[-1]["json"]
         self.assertEqual(sent_data["mobile"], "09123456789")
 
-    @patch("sms.providers.requests.post")
-    def test_send_otp_api_error(self, mock_post):
+    def test_send_otp_api_error(self):
         """Tests API error during OTP sending."""
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
+        self.server.respond("POST", "/send/verify", json={
             "status": 113,
             "message": "قالب یافت نشد",
             "data": None,
-        }
-        mock_post.return_value = mock_response
+        })
 
         with self.assertRaisesRegex(SmsProviderError, "قالب یافت نشد") as cm:
             self.provider.send_otp("09123456789", "12345", 999)
         self.assertEqual(cm.exception.status_code, 113)
 
-    @patch("sms.providers.requests.post")
-    def test_send_text_success(self, mock_post):
+    def test_send_text_success(self):
         """Tests successful text message sending."""
-        mock_response = MagicMock()
-        mock_response.status_code = 200
-        mock_response.json.return_value = {
+        self.server.respond("POST", "/send/bulk", json={
             "status": 1,
             "message": "موفق",
             "data": {
@@ -79,16 +70,14 @@ class SmsProviderTests(TestCase):
                 "messageIds": [12345],
                 "cost": 1.0,
             },
-        }
-        mock_post.return_value = mock_response
+        })
 
         response = self.provider.send_text("09123456789", "Hello World")
         self.assertEqual(response["packId"], "some-uuid")
 
-    @patch("sms.providers.requests.post")
-    def test_network_error_raises_sms_provider_error(self, mock_post):
+    def test_network_error_raises_sms_provider_error(self):
         """Tests if a network error is wrapped in SmsProviderError."""
-        mock_post.side_effect = requests.exceptions.Timeout("Connection timed out")
+        self.server.stop()
 
         with self.assertRaisesRegex(SmsProviderError, "Network error"):
             self.provider.send_otp("09123456789", "12345", 101)